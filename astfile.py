@@ -0,0 +1,296 @@
+import mmap
+import os
+import struct
+import zlib
+
+import tree
+
+
+MAGIC = b"MWAT"
+
+HEADER = struct.Struct("<4sIIII")
+ITEM = struct.Struct("<BI")
+COUNT = struct.Struct("<I")
+OFFSET = struct.Struct("<I")
+
+NONE, NODE, SCALAR, LIST, PAIR = range(5)
+
+LIST_TAG = 0xFF
+PAIR_TAG = 0xFE
+
+NODE_TYPES = [
+    tree.Program,
+    tree.Block,
+    tree.InstructionBlock,
+    tree.UMinus,
+    tree.If,
+    tree.While,
+    tree.For,
+    tree.Relation,
+    tree.Operator,
+    tree.Print,
+    tree.Assign,
+    tree.TypeDeclare,
+    tree.AssignWithType,
+    tree.Cast,
+    tree.Args,
+    tree.ArgsVal,
+    tree.Function,
+    tree.Call,
+    tree.MathFunction,
+    tree.FloatVal,
+    tree.IntVal,
+    tree.StringVal,
+    tree.NameVal,
+    tree.KeyVal,
+    tree.TypeVal,
+    tree.BoolVal,
+    tree.Pi,
+    tree.Comment,
+    tree.CommonStore,
+    tree.CommonLoad,
+    tree.UnrolledFor,
+]
+
+TAGS = {node_type: tag for tag, node_type in enumerate(NODE_TYPES)}
+
+TRANSIENT = {
+    "optimized": lambda: None,
+    "backedges": lambda: 0,
+    "compiled": lambda: None,
+    "scoped": lambda: None,
+    "target": lambda: None,
+    "variant": lambda: None,
+    "plan": lambda: None,
+}
+
+ATTRIBUTES = [
+    [name for name in node_type.__slots__ if name not in TRANSIENT]
+    for node_type in NODE_TYPES
+]
+
+DEFAULTS = [
+    [(name, TRANSIENT[name]) for name in node_type.__slots__ if name in TRANSIENT]
+    for node_type in NODE_TYPES
+]
+
+RECORDS = [struct.Struct("<" + "BI" * len(names)) for names in ATTRIBUTES]
+
+SCHEMA = zlib.crc32(
+    repr([(node_type.__name__, names) for node_type, names in zip(NODE_TYPES, ATTRIBUTES)]).encode()
+)
+
+
+class FormatError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+class Writer:
+    def __init__(self):
+        super().__init__()
+
+        self.records = bytearray()
+        self.strings = {}
+        self.offsets = {}
+
+    def scalar(self, value):
+        if value is None:
+            key = "n"
+        elif type(value) is bool:
+            key = "b1" if value else "b0"
+        elif type(value) is int:
+            key = f"i{value}"
+        elif type(value) is float:
+            key = f"f{value!r}"
+        else:
+            key = f"s{value}"
+
+        return self.strings.setdefault(key, len(self.strings))
+
+    def item(self, value):
+        if value is None:
+            return NONE, 0
+        elif isinstance(value, tree.Node):
+            return NODE, self.node(value)
+        elif isinstance(value, list):
+            return LIST, self.sequence(LIST_TAG, value)
+        elif isinstance(value, tuple):
+            return PAIR, self.sequence(PAIR_TAG, value)
+        else:
+            return SCALAR, self.scalar(value)
+
+    def sequence(self, tag, values):
+        items = [self.item(value) for value in values]
+
+        offset = HEADER.size + len(self.records)
+        self.records.append(tag)
+        self.records += COUNT.pack(len(items))
+        for kind, value in items:
+            self.records += ITEM.pack(kind, value)
+
+        return offset
+
+    def node(self, node):
+        if node in self.offsets:
+            return self.offsets[node]
+
+        tag = TAGS[type(node)]
+        items = [self.item(getattr(node, name)) for name in ATTRIBUTES[tag]]
+
+        offset = HEADER.size + len(self.records)
+        self.records.append(tag)
+        for kind, value in items:
+            self.records += ITEM.pack(kind, value)
+
+        self.offsets[node] = offset
+        return offset
+
+    def string_table(self):
+        blobs = [key.encode("utf-8") for key in self.strings]
+
+        table = bytearray()
+        position = 0
+        for blob in blobs:
+            table += OFFSET.pack(position)
+            position += len(blob)
+        table += OFFSET.pack(position)
+
+        return table + b"".join(blobs)
+
+
+def encode(program):
+    writer = Writer()
+    root = writer.node(program)
+    strings_offset = HEADER.size + len(writer.records)
+
+    header = HEADER.pack(MAGIC, SCHEMA, strings_offset, len(writer.strings), root)
+    return header + bytes(writer.records) + bytes(writer.string_table())
+
+
+def dump(program, path):
+    with open(path, "wb") as f:
+        f.write(encode(program))
+
+
+class LazyBlock(tree.Block):
+    __slots__ = ("loader", "offset")
+
+    @property
+    def statements(self):
+        if self.loader is not None:
+            tree.Block.statements.__set__(self, self.loader.sequence(self.offset))
+            self.loader = None
+
+        return tree.Block.statements.__get__(self)
+
+    @statements.setter
+    def statements(self, statements):
+        self.loader = None
+        tree.Block.statements.__set__(self, statements)
+
+
+TAGS[LazyBlock] = TAGS[tree.Block]
+
+
+# Blocks are read on first use, unless the loader is eager and reads the whole
+# tree up front.
+class Loader:
+    def __init__(self, data, eager=False):
+        super().__init__()
+
+        self.data = data
+        self.eager = eager
+        if len(data) < HEADER.size:
+            raise FormatError("Not a compiled AST file.")
+
+        magic, schema, self.strings_offset, self.strings_count, self.root = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise FormatError("Not a compiled AST file.")
+        if schema != SCHEMA:
+            raise FormatError("Compiled AST was written by a different interpreter version.")
+
+        self.blob_offset = self.strings_offset + OFFSET.size * (self.strings_count + 1)
+        self.scalars = {}
+        self.nodes = {}
+
+    def scalar(self, index):
+        if index in self.scalars:
+            return self.scalars[index]
+
+        start, = OFFSET.unpack_from(self.data, self.strings_offset + OFFSET.size * index)
+        end, = OFFSET.unpack_from(self.data, self.strings_offset + OFFSET.size * (index + 1))
+        key = bytes(self.data[self.blob_offset + start : self.blob_offset + end]).decode("utf-8")
+
+        kind, text = key[0], key[1:]
+        if kind == "n":
+            value = None
+        elif kind == "b":
+            value = text == "1"
+        elif kind == "i":
+            value = int(text)
+        elif kind == "f":
+            value = float(text)
+        else:
+            value = text
+
+        self.scalars[index] = value
+        return value
+
+    def item(self, kind, value):
+        if kind == NONE:
+            return None
+        elif kind == NODE:
+            return self.node(value)
+        elif kind == SCALAR:
+            return self.scalar(value)
+        elif kind == LIST:
+            return self.sequence(value)
+        else:
+            return tuple(self.sequence(value))
+
+    def sequence(self, offset):
+        count, = COUNT.unpack_from(self.data, offset + 1)
+        start = offset + 1 + COUNT.size
+        items = self.data[start : start + ITEM.size * count]
+        return [self.item(kind, value) for kind, value in ITEM.iter_unpack(items)]
+
+    def node(self, offset):
+        if offset in self.nodes:
+            return self.nodes[offset]
+
+        tag = self.data[offset]
+        node_type = NODE_TYPES[tag]
+        if node_type is tree.Block and not self.eager:
+            node_type = LazyBlock
+        node = node_type.__new__(node_type)
+        self.nodes[offset] = node
+
+        for name, default in DEFAULTS[tag]:
+            setattr(node, name, default())
+
+        items = RECORDS[tag].unpack_from(self.data, offset + 1)
+        if node_type is LazyBlock:
+            node.loader = self
+            node.offset = items[1]
+            return node
+
+        item = self.item
+        for i, name in enumerate(ATTRIBUTES[tag]):
+            setattr(node, name, item(items[2 * i], items[2 * i + 1]))
+
+        return node
+
+
+def load(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise FormatError("Not a compiled AST file.")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return decode(data)
+
+
+def decode(data, eager=False):
+    loader = Loader(data, eager)
+    return loader.node(loader.root)
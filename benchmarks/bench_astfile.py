@@ -0,0 +1,63 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import astfile
+import ply_parser
+import tree
+
+from generator import programs
+
+
+def best_of(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def compile_quietly(content, front_end):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ply_parser.compile_program(content, False, None, front_end)
+
+
+def materialize(ast):
+    return sum(1 for _ in tree.walk(ast))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=5, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--parser", default="ply", choices=["ply", "rd"], help="parser front end")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, content in programs(args.scale).items():
+            if name.startswith("lab_"):
+                continue
+
+            path = os.path.join(directory, f"{name}.mwat")
+            ast = compile_quietly(content, args.parser)
+            astfile.dump(ast, path)
+
+            parse_time = best_of(lambda: compile_quietly(content, args.parser), args.repeat)
+            lazy_time = best_of(lambda: astfile.load(path), args.repeat)
+            full_time = best_of(lambda: materialize(astfile.load(path)), args.repeat)
+            print(
+                f"{name:<14}{os.path.getsize(path) // 1024:>8} KiB  parse {parse_time * 1000:>9.2f} ms"
+                f"  load {lazy_time * 1000:>8.2f} ms  load+walk {full_time * 1000:>9.2f} ms"
+                f"  ({parse_time / full_time:.1f}x)"
+            )
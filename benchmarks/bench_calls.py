@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codegen
+import machine
+import optimizer
+import rd_parser
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+def tight_loop(calls):
+    return (
+        "function add(a : int, b : int) = {\n"
+        "    a + b\n"
+        "}\n"
+        "total := 0\n"
+        f"for(i := 0; i < {calls}; i = i + 1){{\n"
+        "    total = add(total, i)\n"
+        "}\n"
+        "print(total)\n"
+    )
+
+
+def no_arguments(calls):
+    return (
+        "count := 0\n"
+        "function tick() = {\n"
+        "    count = count + 1\n"
+        "}\n"
+        f"for(i := 0; i < {calls}; i = i + 1){{\n"
+        "    tick()\n"
+        "}\n"
+        "print(count)\n"
+    )
+
+
+def measure(content, calls, repeat):
+    program = optimizer.optimize(rd_parser.parse(tokenize(content)))
+
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            machine.run(program) if machine.ENABLED else program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best / calls, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000, help="calls per program")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    threshold = codegen.THRESHOLD
+    modes = [("tree", None, False), ("tiered", threshold, False), ("stack", None, True)]
+    for name, make in (("two arguments", tight_loop), ("no arguments", no_arguments)):
+        for mode, tier, stack in modes:
+            codegen.configure(tier or 0)
+            machine.configure(stack, machine.LIMIT)
+            per_call, lines = measure(make(args.calls), args.calls, args.repeat)
+            print(f"{name:<15}{mode:<8}{per_call * 1e9:>9.0f} ns/call  {lines[-1]}")
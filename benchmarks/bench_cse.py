@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cse
+import liveness
+import rd_parser
+import rewrite
+import tree
+
+from generator import programs
+from lexer import tokenize
+from output import capture
+
+
+def numeric(iterations):
+    return (
+        "x := 1.5\n"
+        "y := 2.5\n"
+        "acc := 0.0\n"
+        "r := 0.0\n"
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    r = static_cast(i, float) * 0.001\n"
+        "    acc = acc + x * y + sqrt(x * y + static_cast(i, float) * r) * sqrt(x * y + static_cast(i, float) * r)\n"
+        "    acc = acc - sqrt(x * y + static_cast(i, float) * r) * static_cast(i, float)\n"
+        "}\n"
+        "print(acc)\n"
+    )
+
+
+def compile(content, common):
+    program = rd_parser.parse(tokenize(content)).optimize()
+    rewrite.rewrite(program)
+    liveness.eliminate(program)
+    reused = cse.eliminate(program) if common else 0
+    return program, reused
+
+
+def serve(program, repeat):
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=5, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    sources = {"numeric": numeric(2000 * args.scale)}
+    sources.update((name, content) for name, content in programs(args.scale).items() if not name.startswith("lab_"))
+
+    for name, content in sources.items():
+        plain, _ = compile(content, False)
+        common, reused = compile(content, True)
+
+        plain_time, plain_output = serve(plain, args.repeat)
+        common_time, common_output = serve(common, args.repeat)
+        if plain_output != common_output:
+            print(f"{name}: program prints different output with CSE")
+            sys.exit(1)
+
+        print(
+            f"{name:<14}reused {reused:>5}  serve {plain_time * 1000:>9.2f} ms -> {common_time * 1000:>9.2f} ms"
+            f"  ({plain_time / common_time:.2f}x)"
+        )
@@ -0,0 +1,49 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import incremental
+import rd_parser
+
+from generator import long_block
+from lexer import tokenize
+
+
+def full(text):
+    return rd_parser.parse(tokenize(text, positions=True), report=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=20000, help="size of the edited file in lines")
+    parser.add_argument("--keystrokes", type=int, default=200, help="edits to apply")
+    args = parser.parse_args()
+
+    rng = random.Random(34)
+    text = long_block(args.lines)
+    document = incremental.Document(text)
+
+    start = time.perf_counter()
+    full(text)
+    full_time = time.perf_counter() - start
+
+    # Typing a statement one character at a time at random lines.
+    elapsed = 0.0
+    edits = 0
+    while edits < args.keystrokes:
+        position = document.text.find("\n", rng.randrange(len(document.text))) + 1
+        for character in "x = x + 1\n":
+            start = time.perf_counter()
+            document.edit(position, position, character)
+            elapsed += time.perf_counter() - start
+            position += 1
+            edits += 1
+
+    keystroke = elapsed / edits
+    print(f"{len(text)} chars, {args.lines} lines")
+    print(f"full parse    {full_time * 1000:>9.3f} ms")
+    print(f"keystroke     {keystroke * 1000:>9.3f} ms  ({full_time / keystroke:.0f}x)")
@@ -0,0 +1,165 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ply.lex as lex
+
+import lexer
+
+from generator import programs
+from ply_parser import tokens
+
+
+# The PLY lexer that lexer.py replaced, kept as the baseline and built on first
+# use only.
+literals = ["=", "+", "-", "*", "/", "(", ")", ";", ":", "^", "{", "}", ","]
+
+
+def t_FLOAT(t):
+    r"\d+\.\d+|\.\d+"
+    return t
+
+
+def t_INTEGER(t):
+    r"\d+"
+    return t
+
+
+def t_BOOL(t):
+    r"true|false"
+    return t
+
+
+def t_CAST(t):
+    r"static_cast"
+    return t
+
+
+def t_IF(t):
+    r"if"
+    return t
+
+
+def t_WHILE(t):
+    r"while"
+    return t
+
+
+def t_FOR(t):
+    r"for"
+    return t
+
+
+def t_PARALLEL(t):
+    r"parallel"
+    return t
+
+
+def t_FUNCTION(t):
+    r"function"
+    return t
+
+
+def t_PRINT(t):
+    r"print"
+    return t
+
+
+def t_MATH_FUNCTION(t):
+    r"sin|cos|exp|sqrt|log"
+    return t
+
+
+def t_TWOSTAR(t):
+    r"\*\*"
+    t.type = "^"
+    t.value = "^"
+    return t
+
+
+def t_PI(t):
+    r"PI"
+    return t
+
+
+def t_COMMENT(t):
+    r"\#.*"
+    return t
+
+
+def t_STRING(t):
+    r"\"(.*?)\""
+    return t
+
+
+def t_NAME(t):
+    r"[a-zA-Z_][a-zA-Z0-9_]*"
+    return t
+
+
+def t_newline(t):
+    r"\n+"
+    t.lexer.lineno += len(t.value)
+
+
+t_RELATION = r"<=|>=|==|!=|<|>"
+
+t_TVASSIGNMENT = r":="
+
+t_ignore = " \t"
+
+
+def t_error(t):
+    print("Illegal character '%s'" % t.value[0])
+    t.lexer.skip(1)
+
+
+ply_lexer = None
+
+
+def ply_tokenize(content):
+    global ply_lexer
+    if ply_lexer is None:
+        ply_lexer = lex.lex()
+
+    ply_lexer.input(content)
+    ply_lexer.lineno = 1
+    result = []
+    while True:
+        tok = ply_lexer.token()
+        if not tok:
+            return result
+        result.append(tok)
+
+
+def best_of(function, content, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=20, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per lexer")
+    args = parser.parse_args()
+
+    content = "\n".join(programs(args.scale).values())
+    count = len(lexer.tokenize(content))
+
+    ply_time = best_of(ply_tokenize, content, args.repeat)
+    fast_time = best_of(lexer.tokenize, content, args.repeat)
+    tracked_time = best_of(lambda text: lexer.tokenize(text, positions=True), content, args.repeat)
+
+    print(f"{len(content)} characters, {count} tokens")
+    print(f"ply lexer   {ply_time * 1000:>10.2f} ms")
+    print(f"master regex{fast_time * 1000:>10.2f} ms ({ply_time / fast_time:.1f}x faster)")
+    print(f"  +positions{tracked_time * 1000:>10.2f} ms ({ply_time / tracked_time:.1f}x faster)")
@@ -0,0 +1,49 @@
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashcons
+import rd_parser
+import tree
+
+from lexer import tokenize
+
+
+def program(statements):
+    lines = ["x := 0"]
+    for i in range(statements):
+        lines.append(f"x = x + {i % 10} * 2")
+
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=1000000, help="approximate AST size")
+    args = parser.parse_args()
+
+    tokens = tokenize(program(args.nodes // 7))
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    ast = rd_parser.parse(tokens)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    ast = hashcons.share(ast)
+    shared_elapsed = time.perf_counter() - start
+    shared_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    nodes = sum(1 for _ in tree.walk(ast))
+    unique = hashcons.unique(ast)
+    print(f"{nodes} nodes, {size / 2 ** 20:.1f} MiB, {size / nodes:.1f} bytes per node")
+    print(f"shared {unique} unique nodes, {shared_size / 2 ** 20:.1f} MiB")
+    print(f"construction {elapsed:.2f} s, sharing {shared_elapsed:.2f} s")
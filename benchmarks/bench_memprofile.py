@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import machine
+import memprofile
+import optimizer
+import rd_parser
+import specialize
+import tree
+import unroll
+
+from lexer import tokenize
+from output import capture
+
+
+# String building, scope churn and recursion, the usual drivers of memory
+# growth in a script.
+def workloads(size):
+    return {
+        "strings": (
+            "function build(n : int) = {\n"
+            "    s := \"\"\n"
+            "    for(i := 0; i < n; i = i + 1){\n"
+            "        s = s + \"abcdefghij\"\n"
+            "    }\n"
+            "    s\n"
+            "}\n"
+            f"for(j := 0; j < {size // 100}; j = j + 1){{\n"
+            "    {\n"
+            "        text := build(200)\n"
+            "        print(text == \"\")\n"
+            "    }\n"
+            "}\n"
+        ),
+        "scopes": (
+            "total := 0\n"
+            f"for(i := 0; i < {size}; i = i + 1){{\n"
+            "    {\n"
+            "        a := i * 2\n"
+            "        b := a + 1\n"
+            "        if(b > 10){\n"
+            "            c := b - a\n"
+            "            total = total + c\n"
+            "        }\n"
+            "    }\n"
+            "}\n"
+            "print(total)\n"
+        ),
+        "recursion": (
+            "function depth(n : int) = {\n"
+            "    r := 0\n"
+            "    if(n > 0){\n"
+            "        r = depth(n - 1) + 1\n"
+            "    }\n"
+            "    r\n"
+            "}\n"
+            "total := 0\n"
+            f"for(j := 0; j < {size // 200}; j = j + 1){{\n"
+            "    total = total + depth(200)\n"
+            "}\n"
+            "print(total)\n"
+        ),
+    }
+
+
+def measure(content, enabled, repeat):
+    best = None
+    for _ in range(repeat):
+        memprofile.configure(enabled, 5)
+        program = optimizer.optimize(rd_parser.parse(tokenize(content)))
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            with memprofile.tracing(program):
+                machine.run(program) if machine.ENABLED else program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines, memprofile.report() if enabled else None
+
+
+# The profiler's own bookkeeping is not charged, so a statement that allocates
+# nothing reports nothing however often it runs.
+def idle():
+    measure(f"for(i := 0; i < 200; i = i + 1){{\n    true\n}}\n", True, 1)
+    for construct in memprofile.profiler.measures:
+        if construct.label == "for i > expression":
+            return construct.runs == 200 and abs(construct.retained) < 32 and construct.peak < 32
+
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20000, help="iterations of each workload")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--evaluator", default="stack", choices=["tree", "stack"], help="evaluator of both runs")
+    parser.add_argument("--report", default="0", choices=["0", "1"], help="print the memory report of each workload")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(100000)
+    unroll.configure(0, 1)
+    specialize.configure(0)
+    machine.configure(args.evaluator == "stack", machine.LIMIT)
+    if not idle():
+        print("a statement that allocates nothing is charged memory when profiled")
+        sys.exit(1)
+
+    for name, content in workloads(args.size).items():
+        profiled_time, profiled_output, report = measure(content, True, args.repeat)
+        plain_time, plain_output, _ = measure(content, False, args.repeat)
+        if plain_output != profiled_output:
+            print(f"{name}: program prints different output when profiled")
+            sys.exit(1)
+
+        print(
+            f"{name:<12}plain {plain_time * 1000:>9.2f} ms -> profiled {profiled_time * 1000:>9.2f} ms"
+            f"  ({profiled_time / plain_time:.2f}x)"
+        )
+        if args.report == "1":
+            print(report)
@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codegen
+import native
+import optimizer
+import rd_parser
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+# A numeric kernel: a midpoint-rule integral with an integer loop, float
+# arithmetic, a branch and a math function, called from a plain loop.
+def numeric(calls, steps):
+    return (
+        "function integrate(n : int, scale : float) = {\n"
+        "    total := 0.0\n"
+        "    width := 1.0 / static_cast(n, float)\n"
+        "    for(i := 0; i < n; i = i + 1){\n"
+        "        {\n"
+        "            x := static_cast(i, float) * width + width * 0.5\n"
+        "            y := x * x * scale + 1.0\n"
+        "            if(y > 2.0){\n"
+        "                y = y - 2.0\n"
+        "            }\n"
+        "            total = total + y * width\n"
+        "        }\n"
+        "    }\n"
+        "    total + sqrt(scale)\n"
+        "}\n"
+        "sum := 0.0\n"
+        f"for(j := 0; j < {calls}; j = j + 1){{\n"
+        f"    sum = sum + integrate({steps}, static_cast(j, float) / 10.0)\n"
+        "}\n"
+        "print(sum)\n"
+    )
+
+
+def measure(content, threshold, enabled, repeat):
+    codegen.configure(threshold)
+    native.configure(enabled, native.CACHE)
+    program = optimizer.optimize(rd_parser.parse(tokenize(content)))
+
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200, help="calls of the numeric function")
+    parser.add_argument("--steps", type=int, default=2000, help="loop iterations per call")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    content = numeric(args.calls, args.steps)
+    cache = native.CACHE
+    with tempfile.TemporaryDirectory() as directory:
+        native.CACHE = directory
+        tree_time, tree_output = measure(content, 0, False, 1)
+        python_time, python_output = measure(content, 2, False, args.repeat)
+        cold_time, _ = measure(content, 2, True, 1)
+        native.libraries.clear()
+        native_time, native_output = measure(content, 2, True, args.repeat)
+    native.CACHE = cache
+
+    print(f"tree      {tree_time * 1000:>10.2f} ms  {tree_output[-1]}")
+    print(f"python    {python_time * 1000:>10.2f} ms  {python_output[-1]}  ({tree_time / python_time:.1f}x)")
+    print(f"native    {native_time * 1000:>10.2f} ms  {native_output[-1]}  ({tree_time / native_time:.1f}x)")
+    print(f"cold native run, compiler included {cold_time * 1000:.2f} ms")
+    if not tree_output == python_output == native_output:
+        print("output differs between backends")
+        sys.exit(1)
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import optimizer
+import parallel
+import rd_parser
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+# Independent CPU-bound iterations: each one sums a polynomial over an inner
+# loop, prints its result and adds it to an accumulator.
+def independent(iterations, work):
+    return (
+        "function series(n : int, terms : int) = {\n"
+        "    s := 0\n"
+        "    for(k := 0; k < terms; k = k + 1){\n"
+        "        s = s + n * k * k + k * 7 - n\n"
+        "    }\n"
+        "    s\n"
+        "}\n"
+        "total := 0\n"
+        f"parallel for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    {\n"
+        f"        v := series(i, {work})\n"
+        "        print(v)\n"
+        "        total = total + v\n"
+        "    }\n"
+        "}\n"
+        "print(total)\n"
+    )
+
+
+def measure(content, workers, repeat):
+    parallel.configure(workers)
+    program = optimizer.optimize(rd_parser.parse(tokenize(content)))
+
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=64, help="parallel loop iterations")
+    parser.add_argument("--work", type=int, default=4000, help="inner loop trip count per iteration")
+    parser.add_argument("--workers", type=int, default=parallel.WORKERS, help="largest worker count measured")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    content = independent(args.iterations, args.work)
+    sequential_time, sequential_output = measure(content, 1, args.repeat)
+    print(f"cpus {os.cpu_count()}, {args.iterations} iterations")
+    print(f"workers  1 {sequential_time * 1000:>9.2f} ms")
+
+    workers = 2
+    while workers <= max(args.workers, 2):
+        elapsed, lines = measure(content, workers, args.repeat)
+        if lines != sequential_output:
+            print(f"workers {workers:>2}: output differs from the sequential run")
+            sys.exit(1)
+        print(f"workers {workers:>2} {elapsed * 1000:>9.2f} ms  ({sequential_time / elapsed:.2f}x)")
+        workers *= 2
@@ -0,0 +1,103 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ply_parser
+import rd_parser
+import tree
+
+from generator import lab_files, programs
+
+
+ERROR_CASES = {
+    "stray_paren": "print(1) ) print(2)",
+    "broken_operand": "x := 1 + print(3) print(4)",
+    "missing_paren": "print(1) print(2",
+    "stray_assign": "print(1) = print(5)",
+    "unclosed_block": "{ print(1) ",
+    "grouping": "x := (1) print(2)",
+    "empty_block": "if(true){} print(3)",
+}
+
+ATTRIBUTES = ("operator", "function", "value", "key", "name", "type_name", "content")
+
+
+def structure(node):
+    if isinstance(node, tuple):
+        return tuple(structure(item) for item in node)
+    if isinstance(node, list):
+        return [structure(item) for item in node]
+    if not isinstance(node, tree.Node):
+        return node
+
+    result = [type(node).__name__]
+    for attribute in dict.fromkeys(ATTRIBUTES + type(node).fields):
+        if hasattr(node, attribute):
+            result.append((attribute, structure(getattr(node, attribute))))
+
+    return tuple(result)
+
+
+def cross_check(sources):
+    failures = []
+    for name, content in sources.items():
+        tokens = ply_parser.tokenize(content)
+        with contextlib.redirect_stdout(io.StringIO()) as ply_output:
+            expected = ply_parser.ply_parse(tokens)
+        with contextlib.redirect_stdout(io.StringIO()) as rd_output:
+            actual = rd_parser.parse(tokens)
+
+        if structure(expected) != structure(actual) or ply_output.getvalue() != rd_output.getvalue():
+            failures.append(name)
+
+    return failures
+
+
+def best_of(function, tokens, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(tokens)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=5, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per parser")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    sources = programs(1)
+    sources.update(ERROR_CASES)
+    failures = cross_check(sources)
+    if failures:
+        print(f"Parsers disagree on: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"Parsers agree on {len(lab_files())} lab files, generated programs and error cases.")
+
+    start = time.perf_counter()
+    ply_parser.parser = None
+    ply_parser.ply_parse(ply_parser.tokenize("print(1)"))
+    print(f"ply table setup {(time.perf_counter() - start) * 1000:>10.2f} ms")
+
+    for name, content in programs(args.scale).items():
+        if name.startswith("lab_"):
+            continue
+
+        tokens = ply_parser.tokenize(content)
+        ply_time = best_of(ply_parser.ply_parse, tokens, args.repeat)
+        rd_time = best_of(rd_parser.parse, tokens, args.repeat)
+        print(
+            f"{name:<14}{len(tokens):>8} tokens  ply {ply_time * 1000:>9.2f} ms"
+            f"  rd {rd_time * 1000:>9.2f} ms  ({ply_time / rd_time:.1f}x)"
+        )
@@ -0,0 +1,45 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import repl
+import tree
+
+from output import capture
+
+
+LINES = [
+    "x := 1",
+    "x = x + 1",
+    "print(x * 2 + 3)",
+    "function twice(a : int) = {",
+    "    a * 2",
+    "}",
+    "print(twice(x))",
+    "1 + 2",
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parser", default="ply", choices=["ply", "rd"], help="parser front end")
+    parser.add_argument("--repeat", type=int, default=200, help="sessions to replay")
+    args = parser.parse_args()
+
+    times = {line: [] for line in LINES}
+    with capture():
+        repl.Session(args.parser).feed("0")
+        for _ in range(args.repeat):
+            tree.reset()
+            session = repl.Session(args.parser, echo=True)
+            for line in LINES:
+                start = time.perf_counter()
+                session.feed(line)
+                times[line].append(time.perf_counter() - start)
+
+    for line, samples in times.items():
+        print(f"{line:<28}{statistics.median(samples) * 1e6:>9.1f} us")
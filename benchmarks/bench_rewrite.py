@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import liveness
+import rd_parser
+import rewrite
+import tree
+
+from generator import programs
+from lexer import tokenize
+from output import capture
+
+
+def identities(iterations):
+    return (
+        "function scale(v : int) = {\n"
+        "    v * 1 + 0\n"
+        "}\n"
+        "acc := 0\n"
+        "x := 2.0\n"
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    acc = acc + scale(i) * 2 - 0 + i * 0\n"
+        "    x = x / 2.0 * 1.0 + 2.0 ^ 3.0 * 0.5 - 3.0\n"
+        "}\n"
+        "print(acc)\n"
+        "print(x)\n"
+    )
+
+
+def operators(program):
+    return sum(1 for node in tree.walk(program) if type(node) is tree.Operator)
+
+
+def compile(content, rewriting):
+    program = rd_parser.parse(tokenize(content)).optimize()
+    if rewriting:
+        rewrite.rewrite(program)
+    liveness.eliminate(program)
+    return program
+
+
+def serve(program, repeat):
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=5, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    sources = {"identities": identities(2000 * args.scale)}
+    sources.update((name, content) for name, content in programs(args.scale).items() if not name.startswith("lab_"))
+
+    for name, content in sources.items():
+        plain = compile(content, False)
+        rewritten = compile(content, True)
+
+        plain_time, plain_output = serve(plain, args.repeat)
+        rewritten_time, rewritten_output = serve(rewritten, args.repeat)
+        if plain_output != rewritten_output:
+            print(f"{name}: rewritten program prints different output")
+            sys.exit(1)
+
+        print(
+            f"{name:<14}operators {operators(plain):>6} -> {operators(rewritten):<6}"
+            f"  serve {plain_time * 1000:>9.2f} ms -> {rewritten_time * 1000:>9.2f} ms"
+            f"  ({plain_time / rewritten_time:.2f}x)"
+        )
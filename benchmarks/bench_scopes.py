@@ -0,0 +1,113 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codegen
+import optimizer
+import rd_parser
+import scopes
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+def guarded_loop(iterations):
+    return (
+        "x := 0\n"
+        f"while(x < {iterations}){{\n"
+        "    if(x >= 0){\n"
+        "        x = x + 1\n"
+        "    }\n"
+        "}\n"
+        "print(x)\n"
+    )
+
+
+def nested_block(iterations):
+    return (
+        "acc := 0\n"
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    {\n"
+        "        acc = acc + i\n"
+        "    }\n"
+        "}\n"
+        "print(acc)\n"
+    )
+
+
+def plain_call(iterations):
+    return (
+        "count := 0\n"
+        "function tick() = {\n"
+        "    count = count + 1\n"
+        "}\n"
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    tick()\n"
+        "}\n"
+        "print(count)\n"
+    )
+
+
+def declaring_branch(iterations):
+    return (
+        "acc := 0\n"
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    if(true){\n"
+        "        y := i * 2\n"
+        "        acc = acc + y\n"
+        "    }\n"
+        "}\n"
+        "print(acc)\n"
+    )
+
+
+# Scope frames and variable records are counted by wrapping their constructors.
+def measure(content, iterations):
+    counts = {"frames": 0, "variables": 0}
+    scope, variable = scopes.Scope, scopes.Variable
+
+    class CountedScope(scope):
+        def __init__(self):
+            counts["frames"] += 1
+            super().__init__()
+
+    def counted_variable(*args):
+        counts["variables"] += 1
+        return variable(*args)
+
+    program = optimizer.optimize(rd_parser.parse(tokenize(content)))
+    scopes.Scope, scopes.Variable = CountedScope, counted_variable
+    try:
+        tree.reset()
+        counts["frames"] = counts["variables"] = 0
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+    finally:
+        scopes.Scope, scopes.Variable = scope, variable
+
+    return counts["frames"] / iterations, counts["variables"] / iterations, elapsed / iterations, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000, help="loop iterations per program")
+    args = parser.parse_args()
+
+    codegen.configure(0)
+    cases = [
+        ("guarded while", guarded_loop),
+        ("nested block", nested_block),
+        ("no-argument call", plain_call),
+        ("declaring branch", declaring_branch),
+    ]
+
+    print(f"{'program':<20}{'frames/iter':>12}{'vars/iter':>12}{'us/iter':>10}")
+    for name, make in cases:
+        frames, variables, elapsed, lines = measure(make(args.iterations), args.iterations)
+        print(f"{name:<20}{frames:>12.2f}{variables:>12.2f}{elapsed * 1e6:>10.2f}  {lines[-1]}")
@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import repl
+import snapshot
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+# Helper functions and configuration variables, plus a warm-up loop that calls
+# one helper often enough to tier it up.
+def prelude(functions):
+    lines = []
+    for i in range(functions):
+        lines += [
+            f"function helper{i}(x : int, y : float) = {{",
+            f"    total := x * {i + 1}",
+            "    for(j := 0; j < 3; j = j + 1){",
+            "        if(total > 100){",
+            "            total = total - 100",
+            "        }",
+            "    }",
+            "    static_cast(total, float) + y",
+            "}",
+            f"setting{i} := {i * 7}",
+            f'label{i} := "option {i}"',
+        ]
+    lines += [
+        "warm := 0.0",
+        "for(i := 0; i < 2000; i = i + 1){",
+        "    warm = helper0(i, warm) / 2.0",
+        "}",
+        'print("prelude ready")',
+    ]
+
+    return "\n".join(lines) + "\n"
+
+
+def program(functions):
+    return (
+        f"print(helper{functions - 1}(setting3, 1.5))\n"
+        f"print(label{functions // 2})\n"
+        "print(warm)\n"
+    )
+
+
+def run(path, snapshot_path, content, front_end):
+    tree.reset()
+    session = repl.Session(front_end)
+    with capture() as lines:
+        start = time.perf_counter()
+        snapshot.prepare(session, path, snapshot_path)
+        ready = time.perf_counter() - start
+        session.run(tokenize(content))
+        total = time.perf_counter() - start
+
+    return ready, total, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=1000, help="functions in the prelude")
+    parser.add_argument("--parser", default="ply", choices=["ply", "rd"], help="parser front end")
+    parser.add_argument("--repeat", type=int, default=3, help="warm runs")
+    args = parser.parse_args()
+
+    content = program(args.functions)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "prelude.mw34")
+        snapshot_path = os.path.join(directory, "prelude.snapshot")
+        with open(path, "w") as f:
+            f.write(prelude(args.functions))
+
+        run(path, None, content, args.parser)
+        cold_ready, cold_total, cold_lines = run(path, snapshot_path, content, args.parser)
+        size = os.path.getsize(snapshot_path)
+
+        warm = [run(path, snapshot_path, content, args.parser) for _ in range(args.repeat)]
+        warm_ready, warm_total, warm_lines = min(warm)
+
+    status = "same output" if warm_lines == cold_lines else "DIFFERENT OUTPUT"
+    print(f"{args.functions} functions, snapshot {size / 1024:.0f} KiB, {status}")
+    print(f"cold  prelude {cold_ready * 1000:>9.2f} ms  total {cold_total * 1000:>9.2f} ms")
+    print(f"warm  prelude {warm_ready * 1000:>9.2f} ms  total {warm_total * 1000:>9.2f} ms")
+    print(f"speedup {cold_ready / warm_ready:.0f}x on the prelude, {cold_total / warm_total:.1f}x overall")
+    sys.exit(0 if warm_lines == cold_lines else 1)
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codegen
+import optimizer
+import rd_parser
+import specialize
+import tree
+
+from generator import programs
+from lexer import tokenize
+from output import capture
+
+
+# A helper configured by literal arguments at each call site: a mode flag, a
+# scale and a short fixed loop.
+def configured_calls(calls):
+    return (
+        "function kernel(x : int, fast : bool, scale : int, rounds : int) = {\n"
+        "    total := x\n"
+        "    for(r := 0; r < rounds; r = r + 1){\n"
+        "        if(fast){\n"
+        "            total = total + scale\n"
+        "        }\n"
+        "        if(fast == false){\n"
+        "            total = total * scale - x\n"
+        "        }\n"
+        "    }\n"
+        "    total\n"
+        "}\n"
+        "acc := 0\n"
+        f"for(i := 0; i < {calls}; i = i + 1){{\n"
+        "    acc = kernel(i, true, 3, 4) - kernel(i, false, 1, 2) + acc\n"
+        "}\n"
+        "print(acc)\n"
+    )
+
+
+def serve(content, variants, threshold, repeat):
+    specialize.configure(variants)
+    codegen.configure(threshold)
+    program = optimizer.optimize(rd_parser.parse(tokenize(content)))
+
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000, help="loop iterations of the configured program")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    variants, threshold = specialize.VARIANTS, codegen.THRESHOLD
+    sources = {"configured": configured_calls(args.calls)}
+    sources.update((name, content) for name, content in programs(1).items() if name.startswith("lab_"))
+
+    for name, content in sources.items():
+        for mode, tier in (("tree", 0), ("tiered", threshold)):
+            generic_time, generic_output = serve(content, 0, tier, args.repeat)
+            special_time, special_output = serve(content, variants, tier, args.repeat)
+            if generic_output != special_output:
+                print(f"{name}: program prints different output when specialized")
+                sys.exit(1)
+
+            print(
+                f"{name:<12}{mode:<8}generic {generic_time * 1000:>9.2f} ms -> specialized"
+                f" {special_time * 1000:>9.2f} ms  ({generic_time / special_time:.2f}x)"
+            )
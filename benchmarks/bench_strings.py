@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import optimizer
+import rd_parser
+import rope
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+CHUNK = "0123456789" * 10
+
+
+def program(megabytes):
+    iterations = megabytes * 2 ** 20 // len(CHUNK)
+    return (
+        's := ""\n'
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        f'    s = s + "{CHUNK}"\n'
+        "}\n"
+        'print(s == "")\n'
+    )
+
+
+def run(megabytes, threshold):
+    program_ast = optimizer.optimize(rd_parser.parse(tokenize(program(megabytes))))
+
+    previous, rope.THRESHOLD = rope.THRESHOLD, threshold
+    tree.reset()
+    with capture() as lines:
+        start = time.perf_counter()
+        program_ast.serve()
+        elapsed = time.perf_counter() - start
+    rope.THRESHOLD = previous
+
+    return elapsed, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=10, help="size of the built string")
+    parser.add_argument("--flat-limit", type=int, default=2, help="largest size to also build with plain str")
+    args = parser.parse_args()
+
+    sizes = sorted({size for size in (1, 2, 5, args.megabytes) if size <= args.megabytes})
+    for megabytes in sizes:
+        rope_time, rope_output = run(megabytes, rope.THRESHOLD)
+        line = f"{megabytes:>3} MB  rope {rope_time * 1000:>10.2f} ms"
+
+        if megabytes <= args.flat_limit:
+            flat_time, flat_output = run(megabytes, float("inf"))
+            if flat_output != rope_output:
+                print(f"{megabytes} MB: rope and plain strings print different output")
+                sys.exit(1)
+            line += f"  str {flat_time * 1000:>10.2f} ms  ({flat_time / rope_time:.2f}x)"
+
+        print(line)
@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codegen
+import hashcons
+import optimizer
+import rd_parser
+import tree
+
+from generator import programs
+from lexer import tokenize
+from output import capture
+
+
+def hot_function(iterations):
+    return (
+        "function step(x : int, y : int) = {\n"
+        "    z := x + y * 3\n"
+        "    if(z > 1000){\n"
+        "        z = z - 1000\n"
+        "    }\n"
+        "    z\n"
+        "}\n"
+        "acc := 1\n"
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    acc = step(acc, i)\n"
+        "}\n"
+        "print(acc)\n"
+    )
+
+
+def compile(content):
+    return optimizer.optimize(hashcons.share(rd_parser.parse(tokenize(content))))
+
+
+def serve(content, threshold, repeat):
+    codegen.THRESHOLD = threshold
+    program = compile(content)
+    events = len(codegen.events)
+
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines, codegen.events[events:]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=5, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    threshold = codegen.THRESHOLD
+    sources = {"hot_function": hot_function(2000 * args.scale)}
+    sources.update((name, content) for name, content in programs(args.scale).items() if not name.startswith("lab_"))
+
+    for name, content in sources.items():
+        interpreted_time, interpreted_output, _ = serve(content, None, args.repeat)
+        tiered_time, tiered_output, events = serve(content, threshold, args.repeat)
+        if interpreted_output != tiered_output:
+            print(f"{name}: program prints different output when tiered up")
+            sys.exit(1)
+
+        compiled = sum(1 for event in events if event["compiled"])
+        print(
+            f"{name:<14}serve {interpreted_time * 1000:>9.2f} ms -> {tiered_time * 1000:>9.2f} ms"
+            f"  ({interpreted_time / tiered_time:.2f}x, {compiled}/{len(events)} tiered up)"
+        )
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashcons
+import optimizer
+import rd_parser
+import tree
+import unroll
+
+from generator import programs
+from lexer import tokenize
+from output import capture
+
+
+def small_loops(iterations):
+    return (
+        "total := 0\n"
+        "weights := 0.0\n"
+        f"for(k := 0; k < {iterations}; k = k + 1){{\n"
+        "    for(i := 0; i < 4; i = i + 1){\n"
+        "        total = total + i * k\n"
+        "    }\n"
+        "    for(j := 1; j <= 3; j = j + 1){\n"
+        "        weights = weights + static_cast(j, float) * 0.25\n"
+        "    }\n"
+        "}\n"
+        "print(total)\n"
+        "print(weights)\n"
+    )
+
+
+def compile(content, limit, factor):
+    unroll.configure(limit, factor)
+    return optimizer.optimize(hashcons.share(rd_parser.parse(tokenize(content))))
+
+
+def serve(program, repeat):
+    best = None
+    for _ in range(repeat):
+        tree.reset()
+        with capture() as lines:
+            start = time.perf_counter()
+            program.serve()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=5, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    limit, factor = unroll.LIMIT, unroll.FACTOR
+    sources = {"small_loops": small_loops(400 * args.scale)}
+    sources.update((name, content) for name, content in programs(args.scale).items() if not name.startswith("lab_"))
+
+    for name, content in sources.items():
+        rolled = compile(content, 0, 1)
+        unrolled = compile(content, limit, factor)
+
+        rolled_time, rolled_output = serve(rolled, args.repeat)
+        unrolled_time, unrolled_output = serve(unrolled, args.repeat)
+        if rolled_output != unrolled_output:
+            print(f"{name}: program prints different output when unrolled")
+            sys.exit(1)
+
+        print(
+            f"{name:<14}serve {rolled_time * 1000:>9.2f} ms -> {unrolled_time * 1000:>9.2f} ms"
+            f"  ({rolled_time / unrolled_time:.2f}x)"
+        )
@@ -0,0 +1,63 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import incremental
+import rd_parser
+import tree
+
+from generator import programs
+from lexer import tokenize
+
+
+SNIPPETS = ["", " ", "\n", "x", "1", "+", "(", ")", "{", "}", "\"", "#", "print(x)\n", "y := 2\n", "if(", "= 3"]
+
+
+def shape(value):
+    if isinstance(value, tree.Node):
+        slots = [name for name in type(value).__slots__ if name not in ("backedges", "compiled", "optimized")]
+        return (type(value).__name__,) + tuple(shape(getattr(value, name)) for name in slots)
+    elif isinstance(value, (list, tuple)):
+        return tuple(shape(item) for item in value)
+    return value
+
+
+def check(document, context):
+    fresh = incremental.Document(document.text)
+    if shape(document.program()) != shape(fresh.program()) or document.errors() != fresh.errors():
+        print(f"{context}: incremental result differs from a full reparse")
+        return False
+
+    if not fresh.errors():
+        full = rd_parser.parse(tokenize(document.text), report=False)
+        if full is not None and shape(full) != shape(fresh.program()):
+            print(f"{context}: document differs from the rd front end")
+            return False
+
+    return True
+
+
+if __name__ == "__main__":
+    rng = random.Random(34)
+    sources = {name: content for name, content in programs(1).items() if name != "hot_loop"}
+
+    edits = failures = 0
+    for name, content in sources.items():
+        document = incremental.Document(content)
+        if not check(document, name):
+            failures += 1
+            continue
+
+        for step in range(150):
+            start = rng.randrange(len(document.text) + 1)
+            end = min(start + rng.choice((0, 0, 1, 2, 5, 20)), len(document.text))
+            document.edit(start, end, rng.choice(SNIPPETS))
+            edits += 1
+            if not check(document, f"{name} edit {step}"):
+                failures += 1
+                break
+
+    print(f"{edits} edits checked, {failures} failures.")
+    sys.exit(1 if failures else 0)
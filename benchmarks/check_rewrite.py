@@ -0,0 +1,144 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parallel
+import rd_parser
+import rewrite
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+DECLARATIONS = "a := 3\nb := 4\nx := 2.5\ny := 0.25\ns := \"ab\"\nfunction f(n : int) = { n * 3 }\n"
+
+CASES = [
+    ("a + 0", "a"),
+    ("0 + a", "a"),
+    ("a * b * 1", "(a * b)"),
+    ("f(a) + 0", "f(a)"),
+    ("a - a", "0"),
+    ("f(a) - f(a)", "(f(a) - f(a))"),
+    ("a * 0", "0"),
+    ("f(a) * 0", "(f(a) * 0)"),
+    ("a * 2", "(a + a)"),
+    ("a / 1", "static_cast(a, float)"),
+    ("a / 2", "(a / 2)"),
+    ("x / 2.0", "(x * 0.5)"),
+    ("x / 2", "(x / 2)"),
+    ("x * 1.0", "x"),
+    ("x * 1", "(x * 1)"),
+    ("x + 0.0", "(x + 0.0)"),
+    ("x * 0.0", "(x * 0.0)"),
+    ("x ^ 2.0", "(x * x)"),
+    ("a ^ 2", "(a ^ 2)"),
+    ("a ^ 0", "1"),
+    ("1 ^ a", "1"),
+    ("0 - a", "-a"),
+    ("0 - a + b", "(-a + b)"),
+    ("s + \"c\" + s", "((s + \"c\") + s)"),
+    ("\"a\" + \"b\"", "\"ab\""),
+    ("2 ^ 3 * 4 == 32", "true"),
+    ("sin(0.5 * PI) == 1.0", "true"),
+    ("1 + 2.0", "(1 + 2.0)"),
+    ("1 ^ 2.0", "(1 ^ 2.0)"),
+    ("a * 1 + 0 - 0", "a"),
+    ("a * 2 * 1 + b * 0", "(a + a)"),
+    ("static_cast(3, float) / 1.0", "3.0"),
+]
+
+# Accumulator updates in a parallel loop keep their shape, so the loop still
+# passes the dependence check; only their right side is simplified.
+REDUCTIONS = [
+    ("prod * 2", "(prod * 2)"),
+    ("prod * 1", "(prod * 1)"),
+    ("prod + i * 1", "(prod + i)"),
+    ("prod + 0", "(prod + 0)"),
+]
+
+
+def render(node):
+    kind = type(node)
+    if kind is tree.Operator:
+        return f"({render(node.left_part)} {node.operator} {render(node.right_part)})"
+    elif kind is tree.Relation:
+        return f"({render(node.left)} {node.operator} {render(node.right)})"
+    elif kind is tree.UMinus:
+        return f"-{render(node.statement)}"
+    elif kind is tree.Cast:
+        return f"static_cast({render(node.value)}, {node.type_name.type_name})"
+    elif kind is tree.MathFunction:
+        return f"{node.function}({render(node.value)})"
+    elif kind is tree.Call:
+        arguments = node.args.arguments if node.args is not None else []
+        return f"{node.name.name}({', '.join(render(argument) for argument in arguments)})"
+    elif kind is tree.KeyVal:
+        return node.key
+    elif kind is tree.StringVal:
+        return f'"{node.value}"'
+    elif kind is tree.BoolVal:
+        return "true" if node.value else "false"
+    elif kind is tree.Pi:
+        return "PI"
+    return str(node.serve())
+
+
+def run(program):
+    tree.reset()
+    with capture() as lines:
+        program.serve()
+    return lines
+
+
+def check(expression, expected):
+    source = f"{DECLARATIONS}print({expression})\n"
+    reference = run(rd_parser.parse(tokenize(source)))
+
+    program = rd_parser.parse(tokenize(source))
+    rewrite.rewrite(program)
+    actual = render(program.block.statements[-1].statement)
+
+    failures = []
+    if actual != expected:
+        failures.append(f"{expression}: expected {expected}, got {actual}")
+    if run(program) != reference:
+        failures.append(f"{expression}: rewritten program prints different output")
+
+    return failures
+
+
+def check_reduction(update, expected):
+    source = f"prod := 1\nparallel for(i := 0; i < 6; i = i + 1){{\n    prod = {update}\n}}\nprint(prod)\n"
+    reference = run(rd_parser.parse(tokenize(source)))
+
+    program = rd_parser.parse(tokenize(source))
+    rewrite.rewrite(program)
+    loop = program.block.statements[1]
+    actual = render(loop.block.statements[0].value)
+
+    failures = []
+    if actual != expected:
+        failures.append(f"prod = {update}: expected {expected}, got {actual}")
+    reason = parallel.check(loop).reason
+    if reason is not None:
+        failures.append(f"prod = {update}: loop runs in order: {reason}")
+    if run(program) != reference:
+        failures.append(f"prod = {update}: rewritten program prints different output")
+
+    return failures
+
+
+if __name__ == "__main__":
+    failures = []
+    for expression, expected in CASES:
+        failures.extend(check(expression, expected))
+    for update, expected in REDUCTIONS:
+        failures.extend(check_reduction(update, expected))
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print(f"{len(CASES) + len(REDUCTIONS)} rewrite cases passed.")
@@ -0,0 +1,109 @@
+import glob
+import os
+
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests")
+
+
+def deep_nesting(depth):
+    lines = ["level := 0"]
+    for i in range(depth):
+        lines.append("    " * i + f"if(level == {i}){{")
+        lines.append("    " * (i + 1) + "level = level + 1")
+    lines.append("    " * depth + "print(level)")
+    for i in reversed(range(depth)):
+        lines.append("    " * i + "}")
+
+    return "\n".join(lines) + "\n"
+
+
+def long_block(length):
+    lines = ["value := 0", "total := 0.0"]
+    for i in range(length):
+        if i % 3 == 0:
+            lines.append(f"value = value + {i}")
+        elif i % 3 == 1:
+            lines.append(f"total = total + static_cast(value, float) * 0.5")
+        else:
+            lines.append("print(value)")
+    lines.append("print(total)")
+
+    return "\n".join(lines) + "\n"
+
+
+def hot_loop(iterations):
+    return (
+        "acc := 0\n"
+        "x := 1.5\n"
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    acc = acc + i * 2 - 1\n"
+        "    x = x * 1.0 + 0.5\n"
+        "}\n"
+        "print(acc)\n"
+        "print(x)\n"
+    )
+
+
+def many_calls(calls):
+    return (
+        "function add(a : int, b : int) = {\n"
+        "    a + b\n"
+        "}\n"
+        "function square(n : int) = {\n"
+        "    n * n\n"
+        "}\n"
+        "total := 0\n"
+        f"for(i := 0; i < {calls}; i = i + 1){{\n"
+        "    total = add(total, 3)\n"
+        "    total = total - square(1)\n"
+        "}\n"
+        "print(total)\n"
+    )
+
+
+def string_heavy(iterations):
+    return (
+        'text := ""\n'
+        'word := "lorem ipsum dolor sit amet "\n'
+        f"for(i := 0; i < {iterations}; i = i + 1){{\n"
+        "    text = text + word\n"
+        '    print("line " + static_cast(i, string))\n'
+        "}\n"
+        "print(text == word)\n"
+    )
+
+
+def synthetic(scale=1):
+    return {
+        "deep_nesting": deep_nesting(50 * scale),
+        "long_block": long_block(1500 * scale),
+        "hot_loop": hot_loop(5000 * scale),
+        "many_calls": many_calls(2000 * scale),
+        "string_heavy": string_heavy(1000 * scale),
+    }
+
+
+def lab_files():
+    programs = {}
+    for path in sorted(glob.glob(os.path.join(TESTS_DIR, "*.mw34"))):
+        with open(path, "r") as f:
+            programs[os.path.splitext(os.path.basename(path))[0]] = f.read()
+
+    return programs
+
+
+def programs(scale=1):
+    result = lab_files()
+    result.update(synthetic(scale))
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("name", help="synthetic program name")
+    parser.add_argument("--scale", type=int, default=1, help="size multiplier")
+    args = parser.parse_args()
+
+    print(synthetic(args.scale)[args.name], end="")
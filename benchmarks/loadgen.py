@@ -0,0 +1,128 @@
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from generator import programs
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def wait_for(host, port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.1)
+
+    return False
+
+
+# Each client keeps one connection open and sends its share of the requests.
+# Unique sources get a counter comment so they miss the compiled-program cache.
+def client(host, port, sources, count, unique, results):
+    connection = http.client.HTTPConnection(host, port)
+    for i in range(count):
+        source = sources[i % len(sources)]
+        if unique:
+            source = f"# {threading.get_ident()} {i}\n" + source
+
+        body = json.dumps({"source": source})
+        start = time.perf_counter()
+        connection.request("POST", "/run", body, {"Content-Type": "application/json"})
+        result = json.loads(connection.getresponse().read())
+        results.append((time.perf_counter() - start, result["status"]))
+
+
+def load(host, port, sources, requests, concurrency, unique):
+    results = []
+    share = requests // concurrency
+    threads = [
+        threading.Thread(target=client, args=(host, port, sources, share, unique, results))
+        for _ in range(concurrency)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p90": percentile(latencies, 0.90),
+        "p99": percentile(latencies, 0.99),
+        "mean": statistics.mean(latencies),
+        "statuses": statuses,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="existing server to load, e.g. http://127.0.0.1:8034")
+    parser.add_argument("--port", type=int, default=8034, help="port of the server started by this script")
+    parser.add_argument("--workers", type=int, default=2, help="workers of the server started by this script")
+    parser.add_argument("--requests", type=int, default=400, help="requests per run")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel clients")
+    parser.add_argument("--json", action="store_true", help="print results as json")
+    args = parser.parse_args()
+
+    process = None
+    if args.url is None:
+        host, port = "127.0.0.1", args.port
+        process = subprocess.Popen(
+            [sys.executable, "main.py", "--serve", str(port), "--workers", str(args.workers)],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+        )
+    else:
+        url = urllib.parse.urlparse(args.url)
+        host, port = url.hostname, url.port
+
+    try:
+        if not wait_for(host, port):
+            print("Server did not start.")
+            sys.exit(1)
+
+        sources = [content for name, content in programs(1).items() if name.startswith("lab_")]
+        results = {}
+        for name, unique in (("cached", False), ("uncached", True)):
+            results[name] = load(host, port, sources, args.requests, args.concurrency, unique)
+
+        if args.json:
+            print(json.dumps(results))
+        else:
+            for name, result in results.items():
+                print(
+                    f"{name:<10}{result['requests']:>6} requests {result['throughput']:>8.1f} req/s"
+                    f"  p50 {result['p50'] * 1000:>7.2f} ms  p90 {result['p90'] * 1000:>7.2f} ms"
+                    f"  p99 {result['p99'] * 1000:>7.2f} ms  {result['statuses']}"
+                )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,134 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import optimizer
+import output
+import ply_parser
+import tree
+
+from generator import programs
+
+
+PHASES = ("lex", "parse", "optimize", "serve")
+
+
+def measure(content, front_end):
+    timings = {}
+
+    start = time.perf_counter()
+    tokens = ply_parser.tokenize(content)
+    timings["lex"] = time.perf_counter() - start
+
+    tree.reset()
+
+    start = time.perf_counter()
+    ast = ply_parser.FRONT_ENDS[front_end](tokens)
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ast = optimizer.optimize(ast)
+    timings["optimize"] = time.perf_counter() - start
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        ast.serve()
+        output.flush()
+        timings["serve"] = time.perf_counter() - start
+
+    return timings
+
+
+def run(scale, repeat, only=None, front_end="ply"):
+    results = {}
+    for name, content in programs(scale).items():
+        if only and name not in only:
+            continue
+
+        samples = {phase: [] for phase in PHASES}
+        for _ in range(repeat):
+            for phase, value in measure(content, front_end).items():
+                samples[phase].append(value)
+
+        results[name] = {
+            phase: {"min": min(values), "median": statistics.median(values)}
+            for phase, values in samples.items()
+        }
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": scale,
+            "repeat": repeat,
+            "parser": front_end,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for name, phases in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+
+        for phase, values in phases.items():
+            old = baseline["results"][name].get(phase)
+            if old is None or old["min"] == 0:
+                continue
+
+            ratio = values["min"] / old["min"]
+            if ratio > 1 + threshold:
+                regressions.append((name, phase, old["min"], values["min"], ratio))
+
+    return regressions
+
+
+def print_table(report):
+    print(f"{'program':<16}" + "".join(f"{phase:>12}" for phase in PHASES))
+    for name, phases in report["results"].items():
+        row = "".join(f"{phases[phase]['min'] * 1000:>10.2f}ms" for phase in PHASES)
+        print(f"{name:<16}{row}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1, help="synthetic program size multiplier")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per program")
+    parser.add_argument("--only", nargs="*", help="run only these programs")
+    parser.add_argument("--parser", default="ply", choices=["ply", "rd"], help="parser front end")
+    parser.add_argument("--output", help="write results as json")
+    parser.add_argument("--baseline", help="compare against stored results")
+    parser.add_argument("--save-baseline", help="store results as new baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown ratio")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    report = run(args.scale, args.repeat, args.only, args.parser)
+    print_table(report)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+        regressions = compare(report, baseline, args.threshold)
+        for name, phase, old, new, ratio in regressions:
+            print(f"REGRESSION {name}/{phase}: {old * 1000:.2f}ms -> {new * 1000:.2f}ms ({ratio:.2f}x)")
+
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%}.")
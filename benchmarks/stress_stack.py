@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import machine
+import optimizer
+import ply_parser
+import tree
+
+from lexer import tokenize
+from output import capture
+
+
+# Every case is source text, parsed, shared and optimized the way a file is
+# before it runs, so the front end and each pass see the whole depth.
+def nested_ifs(depth):
+    content = "if(true){\n" * depth + 'print("bottom")\n' + "}\n" * depth + 'print("top")\n'
+    return content, ["bottom", "top"]
+
+
+def operator_chain(depth, operator):
+    content = "one := 1\nprint(" + f" {operator} ".join(["one"] * depth) + ")\n"
+    return content, [str(depth) if operator == "+" else "1"]
+
+
+def nested_calls(depth):
+    content = "function inc(n : int) = { n + 1 }\nprint(" + "inc(" * depth + "0" + ")" * depth + ")\n"
+    return content, [str(depth)]
+
+
+def recursion(depth):
+    content = (
+        "function count(n : int) = {\n"
+        "    total := 0\n"
+        "    if(n > 0){\n"
+        "        total = count(n - 1) + 1\n"
+        "    }\n"
+        "    total\n"
+        "}\n"
+        f"print(count({depth}))\n"
+    )
+
+    return content, [str(depth)]
+
+
+def run(name, content, expected, limit, front_end):
+    start = time.perf_counter()
+    program = optimizer.optimize(ply_parser.build(tokenize(content), front_end))
+    compiled = time.perf_counter() - start
+
+    machine.configure(True, limit)
+    tree.reset()
+    with capture() as lines:
+        start = time.perf_counter()
+        machine.run(program)
+        elapsed = time.perf_counter() - start
+
+    status = "ok" if lines == expected else f"FAIL {lines[:3]}"
+    print(f"{name:<28}{front_end:<5}compile {compiled * 1000:>9.1f} ms  run {elapsed * 1000:>9.1f} ms  {status}")
+    return lines == expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depth", type=int, default=100000, help="nesting and recursion depth")
+    parser.add_argument("--parser", choices=["ply", "rd"], nargs="*", default=["ply", "rd"], help="front ends to parse with")
+    args = parser.parse_args()
+
+    depth, limit = args.depth, machine.LIMIT
+    cases = [
+        ("nested ifs", *nested_ifs(depth), limit),
+        ("left operator chain", *operator_chain(depth, "+"), limit),
+        ("right operator chain", *operator_chain(depth, "^"), limit),
+        ("nested calls", *nested_calls(depth), limit),
+        ("recursion", *recursion(depth), limit),
+        ("recursion past the limit", recursion(depth)[0], ["Stack limit of 1000 frames exceeded."], 1000),
+    ]
+
+    passed = all([run(*case, front_end) for front_end in args.parser for case in cases])
+    print(f"Python recursion limit {sys.getrecursionlimit()}")
+    sys.exit(0 if passed else 1)
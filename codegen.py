@@ -0,0 +1,333 @@
+import math
+import time
+
+import native
+import output
+import tree
+
+from utils import convert_to, evaluate, pi, type_to_string, valid_type
+
+
+THRESHOLD = 1000
+
+NUMBERS = (int, float)
+
+events = []
+
+
+def configure(threshold):
+    global THRESHOLD
+    THRESHOLD = threshold if threshold > 0 else None
+
+
+def add(left, right):
+    if type(left) is type(right) and type(left) in NUMBERS:
+        return left + right
+    return tree.operate("+", left, right)
+
+
+def subtract(left, right):
+    if type(left) is type(right) and type(left) in NUMBERS:
+        return left - right
+    return tree.operate("-", left, right)
+
+
+def multiply(left, right):
+    if type(left) is type(right) and type(left) in NUMBERS:
+        return left * right
+    return tree.operate("*", left, right)
+
+
+def less(left, right):
+    if type(left) is type(right) and type(left) in NUMBERS:
+        return left < right
+    return tree.relate("<", left, right)
+
+
+def greater(left, right):
+    if type(left) is type(right) and type(left) in NUMBERS:
+        return left > right
+    return tree.relate(">", left, right)
+
+
+def store(slot, value):
+    tree.temporaries[slot] = value
+    return value
+
+
+OPERATORS = {"+": "add", "-": "subtract", "*": "multiply"}
+
+RELATIONS = {"<": "less", ">": "greater"}
+
+def runtime():
+    return {
+        "tree": tree,
+        "operate": tree.operate,
+        "relate": tree.relate,
+        "temporaries": tree.temporaries,
+        "convert_to": convert_to,
+        "evaluate": evaluate,
+        "type_to_string": type_to_string,
+        "write": output.write,
+        "pi": pi,
+        "add": add,
+        "subtract": subtract,
+        "multiply": multiply,
+        "less": less,
+        "greater": greater,
+        "store": store,
+    }
+
+
+PROLOGUE = [
+    "scopes = tree.scopes",
+    "get = scopes.get",
+    "assign = scopes.assign",
+    "define = scopes.define",
+    "declare = scopes.declare",
+]
+
+# Generated code calls the same helpers as serve, so diagnostics and type rules
+# match the tree interpreter. Nodes without a translation are served from the
+# generated code through the nodes list.
+class Generator:
+    def __init__(self):
+        super().__init__()
+
+        self.lines = []
+        self.nodes = []
+        self.bindings = []
+        self.names = 0
+
+    def emit(self, depth, line):
+        self.lines.append("    " * depth + line)
+
+    def name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def fallback(self, node):
+        self.nodes.append(node)
+        return f"nodes[{len(self.nodes) - 1}].serve()"
+
+    def expression(self, node):
+        kind = type(node)
+        if kind is tree.IntVal or kind is tree.FloatVal or kind is tree.StringVal or kind is tree.BoolVal:
+            value = node.serve()
+            if type(value) is float and not math.isfinite(value):
+                return self.fallback(node)
+            return repr(value)
+        elif kind is tree.Pi:
+            return "pi"
+        elif kind is tree.KeyVal:
+            return f"get({node.key!r})"
+        elif kind is tree.Operator:
+            left, right = self.expression(node.left_part), self.expression(node.right_part)
+            if node.operator in OPERATORS:
+                return f"{OPERATORS[node.operator]}({left}, {right})"
+            return f"operate({node.operator!r}, {left}, {right})"
+        elif kind is tree.Relation:
+            left, right = self.expression(node.left), self.expression(node.right)
+            if node.operator in RELATIONS:
+                return f"{RELATIONS[node.operator]}({left}, {right})"
+            return f"relate({node.operator!r}, {left}, {right})"
+        elif kind is tree.UMinus:
+            return f"(-{self.expression(node.statement)})"
+        elif kind is tree.MathFunction:
+            return f"round(evaluate({node.function!r}, {self.expression(node.value)}), 5)"
+        elif kind is tree.Cast and valid_type(node.type_name.type_name):
+            return f"convert_to({self.expression(node.value)}, {node.type_name.type_name!r})"
+        elif kind is tree.Call and (node.args is None or type(node.args) is tree.ArgsVal):
+            if node.args is None:
+                arguments = "None"
+            else:
+                arguments = "[" + ", ".join(self.expression(argument) for argument in node.args.arguments) + "]"
+            self.nodes.append(node)
+            call, function = self.name("call"), self.name("f")
+            self.bindings.append(f"{call} = nodes[{len(self.nodes) - 1}]")
+            self.bindings.append(f"{call}_lookup, {call}_apply = {call}.lookup, {call}.apply")
+            return f"({call}_apply({function}, {arguments}) if ({function} := {call}_lookup()) is not None else None)"
+        elif kind is tree.CommonStore:
+            return f"store({node.slot}, {self.expression(node.expression)})"
+        elif kind is tree.CommonLoad:
+            temporary = self.name("t")
+            return (
+                f"({temporary} if ({temporary} := temporaries.get({node.slot})) is not None"
+                f" else {self.expression(node.expression)})"
+            )
+
+        return self.fallback(node)
+
+    def block(self, block, depth):
+        if not block.statements:
+            self.emit(depth, "value = None")
+        for statement in block.statements:
+            self.statement(statement, depth)
+
+    def scoped(self, node, block, depth):
+        if not tree.opens(node):
+            self.block(block, depth)
+            return
+
+        self.emit(depth, "scopes.add_scope()")
+        self.block(block, depth)
+        self.emit(depth, "scopes.remove_scope()")
+
+    def statement(self, node, depth):
+        kind = type(node)
+        if kind is tree.Assign:
+            self.emit(depth, f"assign({node.name.name!r}, {self.expression(node.value)})")
+            self.emit(depth, "value = None")
+        elif kind is tree.AssignWithType:
+            self.emit(depth, f"define({node.name.name!r}, {self.expression(node.value)})")
+            self.emit(depth, "value = None")
+        elif kind is tree.TypeDeclare and valid_type(node.type_name.type_name):
+            self.emit(depth, f"declare({node.name.name!r}, {node.type_name.type_name!r})")
+            self.emit(depth, "value = None")
+        elif kind is tree.Print:
+            self.emit(depth, f"write({self.expression(node.statement)})")
+            self.emit(depth, "value = None")
+        elif kind is tree.Comment:
+            self.emit(depth, "value = None")
+        elif kind is tree.Block:
+            self.block(node, depth)
+        elif kind is tree.InstructionBlock:
+            self.scoped(node, node.block, depth)
+            self.emit(depth, "value = None")
+        elif kind is tree.UnrolledFor:
+            self.scoped(node, node.block, depth)
+        elif kind is tree.If:
+            condition = self.name("c")
+            self.emit(depth, f"{condition} = {self.expression(node.condition)}")
+            self.emit(depth, f"if type({condition}) is not bool:")
+            self.emit(depth + 1, f'write("Condition type missmatch, got " + type_to_string({condition}) + ".")')
+            self.emit(depth + 1, "value = None")
+            self.emit(depth, f"elif {condition}:")
+            self.scoped(node, node.action, depth + 1)
+            self.emit(depth, "else:")
+            self.emit(depth + 1, "value = None")
+        elif kind is tree.For and node.parallel:
+            self.emit(depth, f"value = {self.fallback(node)}")
+        elif kind is tree.While or kind is tree.For:
+            self.loop(node, depth)
+        else:
+            self.emit(depth, f"value = {self.expression(node)}")
+
+    def loop(self, node, depth):
+        condition = self.name("c")
+        self.emit(depth, "value = None")
+        if tree.opens(node):
+            self.emit(depth, "scopes.add_scope()")
+        if type(node) is tree.For:
+            self.statement(node.init, depth)
+            self.emit(depth, "value = None")
+        self.emit(depth, f"{condition} = {self.expression(node.condition)}")
+        self.emit(depth, f"if type({condition}) is not bool:")
+        self.emit(depth + 1, 'write("Invalid syntax: condition is not a bool type.")')
+        self.emit(depth + 1, "value = None")
+        self.emit(depth, "else:")
+        self.body(node, condition, depth + 1)
+
+    def body(self, node, condition, depth):
+        self.emit(depth, f"while {condition}:")
+        if type(node) is tree.For:
+            self.statement(node.step, depth + 1)
+        self.block(node.block, depth + 1)
+        self.emit(depth + 1, f"{condition} = {self.expression(node.condition)}")
+        if tree.opens(node):
+            self.emit(depth, "scopes.remove_scope()")
+
+    def function(self, block):
+        self.emit(0, "def make(nodes):")
+        self.emit(1, "def run():")
+        for line in PROLOGUE:
+            self.emit(2, line)
+        self.emit(2, "value = None")
+        self.block(block, 2)
+        self.emit(2, "return value")
+        self.emit(1, "return run")
+
+    # A loop entered from the interpreter mid-run (resume) skips the prologue;
+    # its scope and induction variable already live in tree.scopes.
+    def entry(self, node):
+        condition = self.name("c")
+        self.emit(0, "def make(nodes):")
+        self.emit(1, "def run(value, resume):")
+        for line in PROLOGUE:
+            self.emit(2, line)
+        self.emit(2, "if resume:")
+        self.emit(3, f"{condition} = {self.expression(node.condition)}")
+        self.emit(2, "else:")
+        self.emit(3, "value = None")
+        if tree.opens(node):
+            self.emit(3, "scopes.add_scope()")
+        if type(node) is tree.For:
+            self.statement(node.init, 3)
+            self.emit(3, "value = None")
+        self.emit(3, f"{condition} = {self.expression(node.condition)}")
+        self.emit(3, f"if type({condition}) is not bool:")
+        self.emit(4, 'write("Invalid syntax: condition is not a bool type.")')
+        self.emit(4, "return None")
+        self.body(node, condition, 2)
+        self.emit(2, "return value")
+        self.emit(1, "return run")
+
+    # Call sites are bound once in make, so run does not index nodes per call.
+    def build(self, filename):
+        namespace = runtime()
+        lines = self.lines[:1] + ["    " + line for line in self.bindings] + self.lines[1:]
+        exec(compile("\n".join(lines) + "\n", filename, "exec"), namespace)
+        return namespace["make"](self.nodes)
+
+
+def compile_function(block, name):
+    generator = Generator()
+    generator.function(block)
+    return generator.build(f"<function {name}>")
+
+
+def compile_loop(node):
+    generator = Generator()
+    generator.entry(node)
+    return generator.build(f"<loop {node.id}>")
+
+
+def record(kind, name, start, compiled):
+    events.append(
+        {
+            "kind": kind,
+            "name": name,
+            "after": THRESHOLD,
+            "compiled": compiled is not None,
+            "time": time.perf_counter() - start,
+        }
+    )
+
+
+# Numeric functions go to C when the native backend is on; the rest, and any
+# function it cannot compile, get Python code.
+def tier_up_function(function):
+    start = time.perf_counter()
+    compiled = native.compile_function(function) if native.ENABLED else None
+    kind = "function" if compiled is None else "native function"
+    if compiled is None:
+        try:
+            compiled = compile_function(function["block"], function["name"])
+        except (SyntaxError, RecursionError, MemoryError, ValueError):
+            compiled = None
+
+    function["compiled"] = compiled or False
+    record(kind, function["name"], start, compiled)
+    return compiled is not None
+
+
+def tier_up_loop(node):
+    start = time.perf_counter()
+    try:
+        compiled = compile_loop(node)
+    except (SyntaxError, RecursionError, MemoryError, ValueError):
+        compiled = None
+
+    node.compiled = compiled or False
+    record(type(node).__name__.lower(), node.id, start, compiled)
+    return compiled is not None
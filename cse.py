@@ -0,0 +1,203 @@
+import copy
+from functools import partial
+
+import hashcons
+import tree
+
+from utils import valid_type
+
+
+CANDIDATES = (tree.Operator, tree.Relation, tree.UMinus, tree.MathFunction, tree.Cast)
+
+ASSIGNMENTS = (tree.Assign, tree.AssignWithType, tree.TypeDeclare)
+
+LITERALS = (tree.IntVal, tree.FloatVal, tree.StringVal, tree.BoolVal)
+
+
+OPERANDS = {
+    tree.Operator: ("left_part", "right_part"),
+    tree.Relation: ("left", "right"),
+    tree.UMinus: ("statement",),
+    tree.MathFunction: ("value",),
+    tree.Cast: ("value",),
+}
+
+
+def operands(node):
+    return [getattr(node, field) for field in OPERANDS.get(type(node), ())]
+
+
+# A key holds the value numbers of the operands rather than their keys, so it
+# stays flat however deep the expression is.
+def key(node, numbers):
+    kind = type(node)
+    if kind is tree.KeyVal:
+        return ("KeyVal", node.key)
+    elif kind in LITERALS:
+        return (kind.__name__, node.serve())
+    elif kind is tree.Pi:
+        return ("Pi",)
+    elif kind not in OPERANDS or None in numbers:
+        return None
+    elif kind is tree.Operator or kind is tree.Relation:
+        return (kind.__name__, node.operator, *numbers)
+    elif kind is tree.UMinus:
+        return ("UMinus", *numbers)
+    elif kind is tree.MathFunction:
+        return ("MathFunction", node.function, *numbers)
+    elif valid_type(node.type_name.type_name):
+        return ("Cast", node.type_name.type_name, *numbers)
+
+    return None
+
+
+# Expression subtrees are shared, so a node is copied the first time one of its
+# children has to be replaced and the copy takes its place in the parent.
+class Owner:
+    __slots__ = ("node", "replace", "private")
+
+    def __init__(self, node, replace):
+        self.node = node
+        self.replace = replace
+        self.private = type(node) not in hashcons.SHARED
+
+    def set(self, field, value):
+        if not self.private:
+            self.node = copy.copy(self.node)
+            self.replace(self.node)
+            self.private = True
+
+        setattr(self.node, field, value)
+
+
+class Entry:
+    __slots__ = ("node", "replace", "names", "store")
+
+    def __init__(self, node, replace, names):
+        self.node = node
+        self.replace = replace
+        self.names = names
+        self.store = None
+
+
+# Availability follows evaluation order. Anything that may not run (branches,
+# loop bodies, call arguments) only sees what was available before it, and
+# calls forget everything because the callee can assign any visible name.
+class Eliminator:
+    def __init__(self):
+        super().__init__()
+
+        self.slots = 0
+        self.loads = 0
+        self.numbers = {}
+        self.values = {}
+        self.names = []
+
+    # Numbers the expression bottom-up from an explicit stack; equal keys get
+    # the same number, and names[number] is what the expression reads.
+    def number(self, root):
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if node in self.numbers:
+                stack.pop()
+                continue
+            pending = [child for child in operands(node) if child not in self.numbers]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            numbers = [self.numbers[child] for child in operands(node)]
+            node_key = key(node, numbers)
+            if node_key is not None and node_key not in self.values:
+                self.values[node_key] = len(self.names)
+                if node_key[0] == "KeyVal":
+                    self.names.append(frozenset((node.key,)))
+                else:
+                    self.names.append(frozenset().union(*(self.names[number] for number in numbers)))
+            self.numbers[node] = None if node_key is None else self.values[node_key]
+
+        return self.numbers[root]
+
+    def kill(self, available, name):
+        for number in [number for number, entry in available.items() if name in entry.names]:
+            del available[number]
+
+    def load(self, entry, node):
+        if entry.store is None:
+            entry.store = tree.CommonStore(self.slots, entry.node)
+            entry.replace(entry.store)
+            self.slots += 1
+
+        self.loads += 1
+        return tree.CommonLoad(entry.store.slot, node)
+
+    # child, nested, loop and visit are generators run by tree.trampoline, so
+    # the walk follows nesting of any depth.
+    def child(self, owner, field, available):
+        value = getattr(owner.node, field)
+        if value is not None:
+            yield self.visit(value, available, partial(owner.set, field))
+
+    def nested(self, owner, fields, available):
+        inner = dict(available)
+        for field in fields:
+            yield from self.child(owner, field, inner)
+
+        for number in [number for number, entry in available.items() if inner.get(number) is not entry]:
+            del available[number]
+
+    def loop(self, node, available):
+        assigned = set()
+        for child in tree.walk(node):
+            if type(child) is tree.Call:
+                available.clear()
+            elif type(child) in ASSIGNMENTS:
+                assigned.add(child.name.name)
+        for name in assigned:
+            self.kill(available, name)
+
+        yield from self.nested(Owner(node, None), node.fields, available)
+
+    def visit(self, node, available, replace):
+        kind = type(node)
+        if kind is tree.Block:
+            for i, statement in enumerate(node.statements):
+                yield self.visit(statement, available, partial(node.statements.__setitem__, i))
+            return
+        elif kind is tree.Function:
+            yield self.visit(node.block, {}, None)
+            return
+        elif kind is tree.Call:
+            available.clear()
+            return
+        elif kind is tree.If:
+            yield from self.child(Owner(node, None), "condition", available)
+            yield from self.nested(Owner(node, None), ("action",), available)
+            return
+        elif kind is tree.InstructionBlock or kind is tree.UnrolledFor:
+            yield from self.nested(Owner(node, None), ("block",), available)
+            return
+        elif kind is tree.While or kind is tree.For:
+            yield from self.loop(node, available)
+            return
+
+        number = self.number(node) if kind in CANDIDATES else None
+        if number is not None and number in available:
+            replace(self.load(available[number], node))
+            return
+
+        owner = Owner(node, replace)
+        for field in kind.fields:
+            yield from self.child(owner, field, available)
+
+        if number is not None:
+            available[number] = Entry(owner.node, replace, self.names[number])
+        elif kind in ASSIGNMENTS:
+            self.kill(available, node.name.name)
+
+def eliminate(program):
+    eliminator = Eliminator()
+    tree.trampoline(eliminator.visit(program.block, {}, None))
+    return eliminator.loads
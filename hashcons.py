@@ -0,0 +1,133 @@
+import copy
+
+import tree
+
+from astfile import TRANSIENT
+
+
+SHARED = (
+    tree.IntVal,
+    tree.FloatVal,
+    tree.StringVal,
+    tree.BoolVal,
+    tree.Pi,
+    tree.NameVal,
+    tree.KeyVal,
+    tree.TypeVal,
+    tree.Operator,
+    tree.Relation,
+    tree.UMinus,
+    tree.MathFunction,
+    tree.Cast,
+)
+
+SCALARS = {
+    kind: [name for name in kind.__slots__ if name not in kind.fields and name not in TRANSIENT]
+    for kind in SHARED
+}
+
+REVERSED = {kind: kind.fields[::-1] for kind in SHARED}
+
+
+# Children are interned before their parents, so a key only holds the identity
+# of each child and equal subtrees compare and hash in constant time. Floats are
+# keyed by repr to keep 0.0 and -0.0 apart.
+class Interner:
+    def __init__(self):
+        super().__init__()
+
+        self.table = {}
+
+    def key(self, node):
+        kind = type(node)
+        values = [kind]
+        for name in SCALARS[kind]:
+            value = getattr(node, name)
+            values.append(repr(value) if type(value) is float else value)
+        for field in kind.fields:
+            values.append(getattr(node, field))
+        return tuple(values)
+
+    def intern(self, node):
+        if type(node) not in SCALARS:
+            return node
+
+        return self.table.setdefault(self.key(node), node)
+
+    # For passes run by tree.trampoline: function returns the generator of the
+    # pass on a child, and callers delegate with yield from.
+    def rebuild(self, node, function):
+        kind = type(node)
+        if kind not in SCALARS:
+            yield from node.map_nested(function)
+            return node
+
+        values = [getattr(node, field) for field in kind.fields]
+        mapped = []
+        for value in values:
+            mapped.append((yield function(value)))
+        if any(value is not result for value, result in zip(values, mapped)):
+            node = copy.copy(node)
+            for field, value in zip(kind.fields, mapped):
+                setattr(node, field, value)
+
+        return self.intern(node)
+
+    # Postorder on an explicit stack, so interning does not cost nesting depth.
+    # A node with children is pushed back under them with their count, and
+    # takes their shared copies from the top of results when it comes up again.
+    def share(self, root):
+        results = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if type(node) is int:
+                count = node
+                node = stack.pop()
+                if type(node) in SCALARS:
+                    for field in REVERSED[type(node)]:
+                        setattr(node, field, results.pop())
+                    results.append(self.table.setdefault(self.key(node), node))
+                else:
+                    values = iter(results[-count:])
+                    del results[-count:]
+                    node.map_children(lambda child: next(values))
+                    results.append(node)
+                continue
+
+            if type(node) in SCALARS:
+                fields = REVERSED[type(node)]
+                if not fields:
+                    results.append(self.table.setdefault(self.key(node), node))
+                    continue
+                stack.append(node)
+                stack.append(len(fields))
+                for field in fields:
+                    stack.append(getattr(node, field))
+                continue
+
+            children = list(node.children())
+            if not children:
+                results.append(node)
+                continue
+            stack.append(node)
+            stack.append(len(children))
+            children.reverse()
+            stack.extend(children)
+
+        return results[0]
+
+
+def share(program):
+    return Interner().share(program)
+
+
+def unique(program):
+    seen = set()
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        if node not in seen:
+            seen.add(node)
+            stack.extend(node.children())
+    return len(seen)
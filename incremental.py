@@ -0,0 +1,180 @@
+from bisect import bisect_right
+
+import rd_parser
+import tree
+
+from lexer import tokenize
+
+
+# Tokens a finished statement never continues with, so a statement that ends
+# at the edge of a reparsed region ends the same way in the whole file.
+STOPS = rd_parser.PRIMARY | {"NAME", "PRINT", "{", "}", "IF", "WHILE", "FOR", "FUNCTION", "COMMENT"}
+
+
+# One top-level statement with the tokens skipped in front of it. Error
+# positions are kept relative to the chunk, so a chunk after an edit only
+# moves its start.
+class Chunk:
+    __slots__ = ("start", "line", "first", "statement", "errors")
+
+    def __init__(self, start, line, first, statement, errors):
+        super().__init__()
+
+        self.start = start
+        self.line = line
+        self.first = first
+        self.statement = statement
+        self.errors = errors
+
+
+# Chunks from index shifted on are stored delta characters and line_delta
+# lines before their real position. An edit only settles the chunks between
+# the previous edit and this one, so typing in one place never walks the file.
+class Document:
+    def __init__(self, text=""):
+        super().__init__()
+
+        self.text = text
+        self.chunks, _ = self.parse(0, 1, len(text), True)
+        self.statements = [chunk.statement for chunk in self.chunks]
+        self.missing = sum(1 for statement in self.statements if statement is None)
+        self.faulty = [index for index, chunk in enumerate(self.chunks) if chunk.errors]
+        self.shifted = len(self.chunks)
+        self.delta = 0
+        self.line_delta = 0
+
+    # Parses text[start:stop] statement by statement. Returns the chunks and
+    # whether the last statement was complete before stop.
+    def parse(self, start, line, stop, final):
+        lexical = []
+        tokens = tokenize(self.text[start:stop], True, line, start, lexical)
+        parser = rd_parser.Parser(tokens, report=False)
+        types = parser.types
+        chunks = []
+
+        while types[parser.position] != rd_parser.END:
+            first = parser.position
+            if chunks:
+                chunk_start, chunk_line = tokens.positions[first], tokens.linenos[first]
+            else:
+                chunk_start, chunk_line = start, line
+            chunk = Chunk(chunk_start, chunk_line, types[first], None, [])
+            chunks.append(chunk)
+
+            try:
+                while types[parser.position] == "}":
+                    parser.error()
+                if types[parser.position] != rd_parser.END:
+                    chunk.statement = tree.trampoline(parser.statement())
+            except rd_parser.UnexpectedEnd:
+                if not final:
+                    return chunks, False
+            finally:
+                for position, message in parser.errors:
+                    if position < len(tokens):
+                        error_line, offset = tokens.linenos[position], tokens.positions[position]
+                    else:
+                        error_line, offset = line + self.text.count("\n", start, stop), stop
+                    chunk.errors.append((error_line - chunk.line, offset - chunk.start, message))
+                parser.errors.clear()
+
+            if chunk.statement is None:
+                break
+
+        if lexical and not chunks:
+            chunks.append(Chunk(start, line, None, None, []))
+        starts = [chunk.start for chunk in chunks]
+        for offset, message in lexical:
+            chunk = chunks[max(bisect_right(starts, offset) - 1, 0)]
+            error_line = line + self.text.count("\n", start, offset)
+            chunk.errors.append((error_line - chunk.line, offset - chunk.start, message))
+
+        return chunks, True
+
+    def position(self, index):
+        chunk = self.chunks[index]
+        if index < self.shifted:
+            return chunk.start, chunk.line
+        return chunk.start + self.delta, chunk.line + self.line_delta
+
+    def settle(self, index):
+        if index > self.shifted:
+            for chunk in self.chunks[self.shifted : index]:
+                chunk.start += self.delta
+                chunk.line += self.line_delta
+        else:
+            for chunk in self.chunks[index : self.shifted]:
+                chunk.start -= self.delta
+                chunk.line -= self.line_delta
+        self.shifted = index
+
+    # Index of the first chunk that starts after offset.
+    def find(self, offset):
+        low, high = 0, len(self.chunks)
+        while low < high:
+            middle = (low + high) // 2
+            if self.position(middle)[0] > offset:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def edit(self, start, end, text):
+        old, chunks = self.text, self.chunks
+        delta = len(text) - (end - start)
+        line_delta = text.count("\n") - old.count("\n", start, end)
+
+        # Strings and comments stop at a newline, so tokens on later lines
+        # lex the same as before.
+        limit = old.find("\n", end)
+        if limit < 0:
+            limit = len(old)
+
+        self.text = old[:start] + text + old[end:]
+
+        first = max(self.find(start) - 2, 0)
+        while first > 0 and chunks[first].first not in STOPS:
+            first -= 1
+        region_start, region_line = self.position(first) if first else (0, 1)
+
+        last = self.find(limit)
+        while True:
+            while last < len(chunks) and chunks[last].first not in STOPS:
+                last += 1
+            final = last == len(chunks)
+            stop = len(self.text) if final else self.position(last)[0] + delta
+            parsed, complete = self.parse(region_start, region_line, stop, final)
+            if complete:
+                break
+            last = min(last + max(last - first, 1), len(chunks))
+
+        self.settle(last)
+        chunks[first:last] = parsed
+        replaced = self.statements[first:last]
+        self.statements[first:last] = [chunk.statement for chunk in parsed]
+        self.missing += sum(1 for chunk in parsed if chunk.statement is None)
+        self.missing -= sum(1 for statement in replaced if statement is None)
+        self.shifted = first + len(parsed)
+        self.delta += delta
+        self.line_delta += line_delta
+
+        moved = len(parsed) - (last - first)
+        self.faulty = (
+            [index for index in self.faulty if index < first]
+            + [first + index for index, chunk in enumerate(parsed) if chunk.errors]
+            + [index + moved for index in self.faulty if index >= last]
+        )
+
+        return self.program(), self.errors()
+
+    def program(self):
+        if self.missing:
+            return tree.Program(tree.Block([statement for statement in self.statements if statement is not None]))
+        return tree.Program(tree.Block(list(self.statements)))
+
+    def errors(self):
+        errors = []
+        for index in self.faulty:
+            start, line = self.position(index)
+            errors.extend((line + error_line, start + offset, message) for error_line, offset, message in self.chunks[index].errors)
+        return sorted(errors)
@@ -0,0 +1,172 @@
+import tree
+
+
+LITERAL_TYPES = {
+    tree.IntVal: "int",
+    tree.FloatVal: "float",
+    tree.StringVal: "string",
+    tree.BoolVal: "bool",
+    tree.Pi: "float",
+    tree.MathFunction: "float",
+}
+
+NUMERIC = ("int", "float")
+
+
+def literal_type(node):
+    if type(node) is tree.Cast:
+        return node.type_name.type_name
+    return LITERAL_TYPES.get(type(node))
+
+
+def operator_type(operator, left, right):
+    if left is None or left != right:
+        return None
+    if operator == "+" and left != "bool":
+        return left
+    if left in NUMERIC:
+        return "float" if operator == "/" else left
+    return None
+
+
+# Names are resolved dynamically, so a name only gets a static type when every
+# declaration of it anywhere in the program agrees on one. A program compiled
+# against an environment also counts the declarations it can reach there.
+class Types:
+    def __init__(self, program, environment=None):
+        super().__init__()
+
+        self.declared = {}
+        self.functions = {}
+        self.returns = {}
+
+        if environment is not None:
+            for name, types in environment.declared.items():
+                self.declared[name] = set(types)
+            for name, function in environment.functions.items():
+                self.functions[name] = [function]
+
+        inferred = []
+        for node in tree.walk(program):
+            kind = type(node)
+            if kind is tree.TypeDeclare:
+                self.declare(node.name.name, node.type_name.type_name)
+            elif kind is tree.AssignWithType:
+                if literal_type(node.value) is None:
+                    inferred.append(node)
+                else:
+                    self.declare(node.name.name, literal_type(node.value))
+            elif kind is tree.Function:
+                self.functions.setdefault(node.name.name, []).append(node)
+                if node.args is not None:
+                    for name, type_name in node.args.arguments:
+                        self.declare(name.name, type_name.type_name)
+
+        types = [self.static_type(node.value) for node in inferred]
+        for node, type_name in zip(inferred, types):
+            self.declare(node.name.name, type_name)
+
+    def declare(self, name, type_name):
+        self.declared.setdefault(name, set()).add(type_name)
+
+    def declared_type(self, name):
+        types = self.declared.get(name, ())
+        if len(types) == 1:
+            return next(iter(types))
+        return None
+
+    def return_type(self, name):
+        if name in self.returns:
+            return self.returns[name]
+
+        definitions = self.functions.get(name, ())
+        self.returns[name] = None
+        if len(definitions) == 1 and definitions[0].block.statements:
+            self.returns[name] = self.static_type(definitions[0].block.statements[-1])
+
+        return self.returns[name]
+
+    def static_type(self, node):
+        kind = type(node)
+        if kind in LITERAL_TYPES or kind is tree.Cast:
+            return literal_type(node)
+        elif kind is tree.KeyVal:
+            return self.declared_type(node.key)
+        elif kind is tree.Call:
+            return self.return_type(node.name.name)
+        return tree.trampoline(self.infer(node))
+
+    # static_type on an expression, as a generator for tree.trampoline so a long
+    # chain of operators is not limited by the recursion limit.
+    def infer(self, node):
+        kind = type(node)
+        if kind in LITERAL_TYPES or kind is tree.Cast:
+            return literal_type(node)
+        elif kind is tree.KeyVal:
+            return self.declared_type(node.key)
+        elif kind is tree.Call:
+            return self.return_type(node.name.name)
+        elif kind is tree.UMinus:
+            value_type = yield self.infer(node.statement)
+            return value_type if value_type in NUMERIC else None
+        elif kind is tree.Relation:
+            left = yield self.infer(node.left)
+            if left is not None and left == (yield self.infer(node.right)):
+                return "bool"
+        elif kind is tree.Operator:
+            left = yield self.infer(node.left_part)
+            return operator_type(node.operator, left, (yield self.infer(node.right_part)))
+
+        return None
+
+
+def definition(name, function):
+    args = None
+    if function["args"] is not None:
+        args = tree.Args([(tree.NameVal(arg_name), tree.TypeVal(arg_type)) for arg_name, arg_type in function["args"]])
+    return tree.Function(tree.NameVal(name), args, function["block"])
+
+
+# What a program compiled on its own, as each interactive entry is, finds
+# already defined: the functions in the table and the variables in the global
+# scope. Functions are rebuilt as definitions around their live blocks, so a
+# pass sees what a call will run, and are walked for declarations once.
+class Environment:
+    def __init__(self):
+        super().__init__()
+
+        self.functions = {}
+        self.declared = {}
+        self.locals = {}
+
+    def refresh(self):
+        functions, declared = {}, {}
+        for name, function in tree.functions.items():
+            node = self.functions.get(name)
+            if node is None or node.block is not function["block"]:
+                node = definition(name, function)
+                self.locals[name] = Types(node).declared
+            functions[name] = node
+            for local, types in self.locals[name].items():
+                declared.setdefault(local, set()).update(types)
+
+        for name, variable in tree.scopes.scopes_list[0].names.items():
+            declared.setdefault(name, set()).add(variable.type)
+
+        for name in [name for name in self.locals if name not in functions]:
+            del self.locals[name]
+        self.functions = functions
+        self.declared = declared
+
+    # The declarations found in each function, for a snapshot to store, so a
+    # restored session starts from them instead of walking every body again.
+    def declarations(self):
+        return {
+            name: {local: list(types) for local, types in declared.items()}
+            for name, declared in self.locals.items()
+        }
+
+    def load(self, declarations):
+        for name, declared in declarations.items():
+            self.functions[name] = definition(name, tree.functions[name])
+            self.locals[name] = {local: set(types) for local, types in declared.items()}
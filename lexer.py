@@ -0,0 +1,172 @@
+import re
+import string
+
+
+RESERVED = {
+    "true": "BOOL",
+    "false": "BOOL",
+    "static_cast": "CAST",
+    "if": "IF",
+    "while": "WHILE",
+    "for": "FOR",
+    "parallel": "PARALLEL",
+    "function": "FUNCTION",
+    "print": "PRINT",
+    "sin": "MATH_FUNCTION",
+    "cos": "MATH_FUNCTION",
+    "exp": "MATH_FUNCTION",
+    "sqrt": "MATH_FUNCTION",
+    "log": "MATH_FUNCTION",
+    "PI": "PI",
+}
+
+FIXED = {
+    "**": "^",
+    "<=": "RELATION",
+    ">=": "RELATION",
+    "==": "RELATION",
+    "!=": "RELATION",
+    "<": "RELATION",
+    ">": "RELATION",
+    ":=": "TVASSIGNMENT",
+}
+FIXED.update({literal: literal for literal in "=+-*/();:^{},"})
+FIXED.update(RESERVED)
+
+NAME_START = set(string.ascii_letters + "_")
+
+# Whitespace is consumed as a prefix of every token, so one match is one token
+# and findall can do the whole scan in C.
+MASTER = re.compile(
+    r"""[ \t\n]*(
+        [a-zA-Z_][a-zA-Z0-9_]*
+        |\d+\.\d+|\.\d+|\d+
+        |\*\*|<=|>=|==|!=|:=
+        |"[^"\n]*"
+        |\#.*
+        |[^ \t\n]
+    )""",
+    re.VERBOSE,
+)
+
+
+def classify(value):
+    first = value[0]
+    if first in NAME_START:
+        return "NAME"
+    elif first.isdecimal() or (first == "." and len(value) > 1):
+        return "FLOAT" if "." in value else "INTEGER"
+    elif first == '"' and len(value) > 1:
+        return "STRING"
+    elif first == "#":
+        return "COMMENT"
+    else:
+        return None
+
+
+class Token:
+    __slots__ = ("type", "value", "lineno", "lexpos", "lexer")
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __str__(self):
+        return "LexToken(%s,%r,%d,%d)" % (self.type, self.value, self.lineno, self.lexpos)
+
+    def __repr__(self):
+        return str(self)
+
+
+class Tokens:
+    def __init__(self, types, values, positions=None, linenos=None):
+        super().__init__()
+
+        self.types = types
+        self.values = values
+        self.positions = positions
+        self.linenos = linenos
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if self.positions is None:
+            return Token(self.types[index], self.values[index], 0, 0)
+
+        return Token(
+            self.types[index],
+            self.values[index],
+            self.linenos[index],
+            self.positions[index],
+        )
+
+
+def tokenize(content, positions=False, lineno=1, offset=0, errors=None):
+    if positions:
+        matches = list(MASTER.finditer(content))
+        values = [match.group(1) for match in matches]
+        starts = [match.start(1) + offset for match in matches]
+    else:
+        values = MASTER.findall(content)
+        starts = None
+
+    fixed = FIXED.get
+    types = [fixed(value) or classify(value) for value in values]
+
+    if "**" in values:
+        values = ["^" if value == "**" else value for value in values]
+
+    if None in types:
+        keep = []
+        for i, kind in enumerate(types):
+            if kind is None:
+                message = "Illegal character '%s'" % values[i]
+                if errors is None:
+                    print(message)
+                else:
+                    errors.append((None if starts is None else starts[i], message))
+            else:
+                keep.append(i)
+
+        types = [types[i] for i in keep]
+        values = [values[i] for i in keep]
+        if starts is not None:
+            starts = [starts[i] for i in keep]
+
+    linenos = None
+    if starts is not None:
+        linenos = []
+        count = content.count
+        last = 0
+        for start in starts:
+            lineno += count("\n", last, start - offset)
+            last = start - offset
+            linenos.append(lineno)
+
+    return Tokens(types, values, starts, linenos)
+
+
+class Lexer:
+    def __init__(self):
+        super().__init__()
+
+        self.tokens = Tokens([], [])
+        self.position = 0
+
+    def input(self, content, positions=False):
+        self.load(tokenize(content, positions))
+
+    def load(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def token(self):
+        if self.position >= len(self.tokens):
+            return None
+
+        tok = self.tokens[self.position]
+        self.position += 1
+        return tok
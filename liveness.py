@@ -0,0 +1,342 @@
+import tree
+
+from inference import Types
+
+
+DEFINITIONS = (tree.AssignWithType, tree.TypeDeclare)
+
+STATEMENTS = (
+    tree.Block,
+    tree.InstructionBlock,
+    tree.If,
+    tree.While,
+    tree.For,
+    tree.UnrolledFor,
+    tree.Print,
+    tree.Assign,
+    tree.TypeDeclare,
+    tree.AssignWithType,
+    tree.Function,
+    tree.Comment,
+)
+
+def local_nodes(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if type(node) is not tree.Function:
+            stack.extend(node.children())
+
+
+def parameters(function):
+    if function.args is None:
+        return set()
+    return {argument[0].name for argument in function.args.arguments}
+
+
+def constant_false(node):
+    return type(node) is tree.BoolVal and node.value is False
+
+
+# Against an environment, functions the program calls but does not define are
+# taken from it, and everything stays observable after the program: later
+# input may call any function and read any name.
+class Liveness:
+    def __init__(self, program, types=None, environment=None):
+        super().__init__()
+
+        self.types = Types(program, environment) if types is None else types
+        self.functions = {}
+        self.function_reads = {}
+        self.function_mentions = {}
+        self.function_calls = {}
+        self.reads, self.mentions, self.called = set(), set(), set()
+
+        sets = (self.reads, self.mentions, self.called)
+        stack, taken = [(program, sets)], set()
+        while stack:
+            self.collect(stack)
+            if environment is not None:
+                for name in self.called.union(*self.function_calls.values()) - taken:
+                    if name in environment.functions:
+                        taken.add(name)
+                        stack.append((environment.functions[name], sets))
+
+        if environment is not None:
+            self.called |= set(self.functions)
+
+        self.propagate()
+
+        # What a function body may leave for later input is limited to the
+        # names it and its callees mention.
+        self.open_ended = environment is not None
+        self.exported = set()
+        if self.open_ended:
+            self.exported = self.mentions.union(*self.function_mentions.values())
+            self.reads |= self.exported
+            self.mentions |= self.exported
+
+        self.pure_functions = {name for name, definitions in self.functions.items() if len(definitions) == 1}
+        changed = True
+        while changed:
+            changed = False
+            for name in list(self.pure_functions):
+                function = self.functions[name][0]
+                if not self.pure_body(function.block, parameters(function)):
+                    self.pure_functions.discard(name)
+                    changed = True
+
+        self.sweeping = True
+        self.eliminated = {}
+
+    def collect(self, stack):
+        while stack:
+            node, (reads, mentions, calls) = stack.pop()
+            kind = type(node)
+            if kind is tree.KeyVal:
+                reads.add(node.key)
+                mentions.add(node.key)
+            elif kind is tree.Call:
+                calls.add(node.name.name)
+            elif kind is tree.Assign or kind in DEFINITIONS:
+                mentions.add(node.name.name)
+            elif kind is tree.Function:
+                name = node.name.name
+                self.functions.setdefault(name, []).append(node)
+                reads = self.function_reads.setdefault(name, set())
+                mentions = self.function_mentions.setdefault(name, set())
+                calls = self.function_calls.setdefault(name, set())
+                mentions.update(parameters(node))
+
+            sets = (reads, mentions, calls)
+            stack.extend((child, sets) for child in node.children())
+
+    def propagate(self):
+        changed = True
+        while changed:
+            changed = False
+            for name, calls in self.function_calls.items():
+                reads = self.function_reads[name]
+                mentions = self.function_mentions[name]
+                before = len(reads), len(mentions)
+                for callee in calls:
+                    reads |= self.function_reads.get(callee, set())
+                    mentions |= self.function_mentions.get(callee, set())
+                if (len(reads), len(mentions)) != before:
+                    changed = True
+
+        pending = list(self.called)
+        while pending:
+            name = pending.pop()
+            for callee in self.function_calls.get(name, ()):
+                if callee not in self.called:
+                    self.called.add(callee)
+                    pending.append(callee)
+        for name in self.called:
+            self.reads |= self.function_reads.get(name, set())
+            self.mentions |= self.function_mentions.get(name, set())
+
+    def pure_call(self, call):
+        name = call.name.name
+        if name not in self.pure_functions:
+            return False
+
+        function = self.functions[name][0]
+        if function.args is None or call.args is None:
+            return function.args is None and call.args is None
+        return len(function.args.arguments) == len(call.args.arguments)
+
+    def pure_body(self, node, local):
+        stack = [(node, frozenset(local))]
+        while stack:
+            node, local = stack.pop()
+            kind = type(node)
+            if kind is tree.Print or kind is tree.Function:
+                return False
+            elif kind is tree.Call and not self.pure_call(node):
+                return False
+            elif kind is tree.Assign and node.name.name not in local:
+                return False
+            elif kind is tree.Block:
+                for statement in node.statements:
+                    stack.append((statement, local))
+                    if type(statement) in DEFINITIONS:
+                        local = local | {statement.name.name}
+                continue
+            elif kind is tree.For and type(node.init) in DEFINITIONS:
+                local = local | {node.init.name.name}
+
+            stack.extend((child, local) for child in node.children())
+
+        return True
+
+    def pure(self, node):
+        for child in local_nodes(node):
+            kind = type(child)
+            if kind in STATEMENTS:
+                return False
+            if kind is tree.Call and not self.pure_call(child):
+                return False
+
+        return True
+
+    def type_safe(self, name, value):
+        declared = self.types.declared_type(name)
+        return declared is not None and declared == self.types.static_type(value)
+
+    def dead(self, statement, live, mentioned):
+        kind = type(statement)
+        if kind is tree.Comment:
+            return "comments"
+        elif kind is tree.Function:
+            if statement.name.name not in self.called:
+                return "functions"
+        elif kind is tree.If or kind is tree.While:
+            if constant_false(statement.condition):
+                return "unreachable"
+        elif kind is tree.InstructionBlock or kind is tree.UnrolledFor:
+            if not statement.block.statements:
+                return "unreachable"
+        elif kind is tree.Assign:
+            name = statement.name.name
+            if (
+                name not in live
+                and self.pure(statement.value)
+                and (name not in self.reads or self.type_safe(name, statement.value))
+            ):
+                return "stores"
+        elif kind is tree.AssignWithType:
+            if statement.name.name not in mentioned and self.pure(statement.value):
+                return "definitions"
+        elif kind is tree.TypeDeclare:
+            if statement.name.name not in mentioned:
+                return "definitions"
+
+        return None
+
+    # transfer, block and loop are generators run by tree.trampoline, so they
+    # follow nesting of any depth.
+    def transfer(self, node, live, mentioned, observed=True):
+        kind = type(node)
+        if kind is tree.KeyVal:
+            return live | {node.key}, mentioned | {node.key}
+        elif kind is tree.Assign:
+            name = node.name.name
+            return (yield self.transfer(node.value, live - {name}, mentioned | {name}))
+        elif kind is tree.AssignWithType:
+            return (yield self.transfer(node.value, live, mentioned | {node.name.name}))
+        elif kind is tree.TypeDeclare:
+            return live, mentioned | {node.name.name}
+        elif kind is tree.Call:
+            name = node.name.name
+            live = live | self.function_reads.get(name, set())
+            mentioned = mentioned | self.function_mentions.get(name, set())
+            if node.args is not None:
+                return (yield self.transfer(node.args, live, mentioned))
+            return live, mentioned
+        elif kind is tree.Function:
+            if self.sweeping:
+                live_out, mentioned_out = self.reads, self.mentions
+                if self.open_ended:
+                    live_out = mentioned_out = self.function_mentions[node.name.name]
+                yield self.block(node.block, live_out, mentioned_out, True, parameters(node))
+            return live, mentioned
+        elif kind is tree.InstructionBlock:
+            return (yield self.block(node.block, live, mentioned, False))
+        elif kind is tree.UnrolledFor:
+            return (yield self.block(node.block, live, mentioned, observed))
+        elif kind is tree.If:
+            action_live, action_mentioned = yield self.block(node.action, live, mentioned, observed)
+            return (yield self.transfer(node.condition, live | action_live, mentioned | action_mentioned))
+        elif kind is tree.While:
+            return (yield self.loop(None, node.condition, None, node.block, live, mentioned, observed))
+        elif kind is tree.For:
+            return (yield self.loop(node.init, node.condition, node.step, node.block, live, mentioned, observed))
+
+        for child in reversed(list(node.children())):
+            live, mentioned = yield self.transfer(child, live, mentioned)
+        return live, mentioned
+
+    # Definitions in a scope shadow the outer name only after they run and only
+    # until the scope ends, so kills past a local definition stay inside it.
+    def block(self, block, live_out, mentioned_out, observed, local=(), scoped=True):
+        statements = block.statements
+
+        first = {}
+        if scoped:
+            for i, statement in enumerate(statements):
+                if type(statement) in DEFINITIONS:
+                    first.setdefault(statement.name.name, i)
+
+        local = set(local) | set(first)
+        live = live_out - local
+        mentioned = mentioned_out - local
+
+        kept = []
+        for i in range(len(statements) - 1, -1, -1):
+            statement = statements[i]
+            tail = observed and i == len(statements) - 1
+
+            kind = self.dead(statement, live, mentioned) if self.sweeping and not tail else None
+            if kind is not None:
+                self.eliminated[kind] = self.eliminated.get(kind, 0) + 1
+            else:
+                live, mentioned = yield self.transfer(statement, live, mentioned, tail)
+                kept.append(statement)
+
+            if type(statement) in DEFINITIONS and first.get(statement.name.name) == i:
+                name = statement.name.name
+                live |= live_out & {name}
+                mentioned |= mentioned_out & {name}
+
+        if self.sweeping:
+            kept.reverse()
+            block.statements = kept
+
+        return live, mentioned
+
+    def loop(self, init, condition, step, body, live, mentioned, observed):
+        local = {init.name.name} if type(init) in DEFINITIONS else set()
+        live_out, mentioned_out = live - local, mentioned - local
+
+        sweeping = self.sweeping
+        self.sweeping = False
+
+        head_live, head_mentioned = yield self.transfer(condition, live_out, mentioned_out)
+        while True:
+            body_live, body_mentioned = yield self.block(body, head_live, head_mentioned, observed, scoped=False)
+            if step is not None:
+                body_live, body_mentioned = yield self.transfer(step, body_live, body_mentioned)
+            body_live, body_mentioned = yield self.transfer(
+                condition, live_out | body_live, mentioned_out | body_mentioned
+            )
+
+            if body_live == head_live and body_mentioned == head_mentioned:
+                break
+            head_live, head_mentioned = body_live, body_mentioned
+
+        self.sweeping = sweeping
+        if sweeping:
+            yield self.block(body, head_live, head_mentioned, observed, scoped=False)
+
+        if init is not None:
+            head_live, head_mentioned = yield self.transfer(init, head_live, head_mentioned)
+
+        return head_live | (live & local), head_mentioned | (mentioned & local)
+
+
+def eliminate(program, environment=None):
+    types = Types(program, environment)
+    eliminated = {}
+    while True:
+        liveness = Liveness(program, types, environment)
+        open_ended = liveness.open_ended
+        tree.trampoline(
+            liveness.block(program.block, liveness.exported, liveness.exported, open_ended, scoped=not open_ended)
+        )
+        if not liveness.eliminated:
+            return eliminated
+
+        for kind, count in liveness.eliminated.items():
+            eliminated[kind] = eliminated.get(kind, 0) + count
@@ -0,0 +1,393 @@
+import memprofile
+import output
+import parallel
+import tree
+
+from utils import convert_to, evaluate, type_to_string
+
+
+ENABLED = False
+
+LIMIT = 5_000_000
+
+DEPTH = 32
+
+CALL = float("inf")
+
+
+def configure(enabled, limit):
+    global ENABLED, LIMIT
+    ENABLED = enabled
+    LIMIT = limit
+
+
+class StackLimit(Exception):
+    pass
+
+
+# Calls make a subtree unbounded; anything else is as high as its deepest path.
+# Shared subtrees are measured once.
+def heights(program):
+    result = {}
+    stack = [(program, None)]
+    while stack:
+        node, children = stack.pop()
+        if node in result:
+            continue
+
+        if children is None:
+            children = list(node.children())
+            stack.append((node, children))
+            stack.extend((child, None) for child in children if child not in result)
+            continue
+
+        height = 0
+        for child in children:
+            if result[child] > height:
+                height = result[child]
+        result[node] = CALL if type(node) is tree.Call else height + 1
+
+    return result
+
+
+# Evaluates a tree without recursing in Python past DEPTH. A frame is a node and
+# the state to resume it in, kept in two parallel lists; every node leaves
+# exactly one value on the value stack. Call-free subtrees no higher than DEPTH
+# are served in place instead of getting frames, so a node visits one child per
+# state to keep the evaluation order.
+class Machine:
+    def __init__(self, program):
+        super().__init__()
+
+        self.heights = heights(program)
+        self.nodes = []
+        self.states = []
+        self.values = []
+        self.handlers = {
+            tree.Program: self.program,
+            tree.Block: self.block,
+            tree.InstructionBlock: self.instruction_block,
+            tree.UnrolledFor: self.unrolled_for,
+            tree.If: self.branch,
+            tree.While: self.while_loop,
+            tree.For: self.for_loop,
+            tree.Relation: self.relation,
+            tree.Operator: self.operator,
+            tree.UMinus: self.minus,
+            tree.MathFunction: self.math_function,
+            tree.Cast: self.cast,
+            tree.Print: self.print,
+            tree.Assign: self.assign,
+            tree.AssignWithType: self.assign_with_type,
+            tree.Call: self.call,
+            tree.ArgsVal: self.arguments,
+            tree.CommonStore: self.common_store,
+            tree.CommonLoad: self.common_load,
+            memprofile.Measure: self.measure,
+        }
+
+    def push(self, node, state):
+        self.nodes.append(node)
+        self.states.append(state)
+
+    def visit(self, node):
+        if self.heights.get(node, CALL) <= DEPTH:
+            self.values.append(node.serve())
+        else:
+            self.nodes.append(node)
+            self.states.append(0)
+
+    # A stack limit error drops the frames this run pushed, and closes the
+    # scopes their calls opened so the caller sees the scopes it started with.
+    def run(self, node):
+        nodes, states, handlers = self.nodes, self.states, self.handlers
+        base = len(nodes)
+        depth = len(tree.scopes.scopes_list)
+        calls = tree.calls_count
+        self.visit(node)
+
+        try:
+            while len(nodes) > base:
+                node = nodes.pop()
+                handler = handlers.get(type(node))
+                if handler is None:
+                    states.pop()
+                    self.values.append(node.serve())
+                else:
+                    handler(node, states.pop())
+        except StackLimit:
+            output.write(f"Stack limit of {LIMIT} frames exceeded.")
+            if memprofile.ENABLED:
+                memprofile.profiler.abandon(nodes[base:], states[base:])
+            del nodes[base:], states[base:]
+            self.values.clear()
+            scopes = tree.scopes
+            while len(scopes.scopes_list) > depth:
+                scopes.remove_scope()
+            tree.calls_count = calls
+            return None
+
+        return self.values.pop()
+
+    def program(self, node, state):
+        self.visit(node.block)
+
+    def block(self, node, state):
+        statements = node.statements
+        if state == len(statements):
+            if not statements:
+                self.values.append(None)
+            return
+
+        if state:
+            self.values.pop()
+        self.push(node, state + 1)
+        self.visit(statements[state])
+
+    def instruction_block(self, node, state):
+        if state == 0:
+            scoped = tree.opens(node)
+            if scoped:
+                tree.scopes.add_scope()
+            self.push(node, 1 if scoped else 2)
+            self.visit(node.block)
+        else:
+            if state == 1:
+                tree.scopes.remove_scope()
+            self.values[-1] = None
+
+    def unrolled_for(self, node, state):
+        if state == 0:
+            if not tree.opens(node):
+                self.visit(node.block)
+                return
+
+            tree.scopes.add_scope()
+            self.push(node, 1)
+            self.visit(node.block)
+        else:
+            tree.scopes.remove_scope()
+
+    def branch(self, node, state):
+        values = self.values
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.condition)
+        elif state == 1:
+            condition_value = values.pop()
+            if type(condition_value) is not bool:
+                output.write(f"Condition type missmatch, got {type_to_string(condition_value)}.")
+                values.append(None)
+            elif condition_value:
+                if tree.opens(node):
+                    tree.scopes.add_scope()
+                    self.push(node, 2)
+                self.visit(node.action)
+            else:
+                values.append(None)
+        else:
+            tree.scopes.remove_scope()
+
+    # The loop value sits under the frames of the loop until it finishes. As in
+    # serve, only the first condition has to be a bool and a bad one leaves the
+    # loop scope open.
+    def while_loop(self, node, state):
+        values = self.values
+        if state == 0:
+            if tree.opens(node):
+                tree.scopes.add_scope()
+            values.append(None)
+            self.push(node, 1)
+            self.visit(node.condition)
+        elif state == 1 or state == 3:
+            condition_value = values.pop()
+            if state == 1 and type(condition_value) is not bool:
+                output.write(f"Invalid syntax: condition is not a bool type.")
+            elif condition_value:
+                self.push(node, 2)
+                self.visit(node.block)
+            elif node.scoped:
+                tree.scopes.remove_scope()
+        else:
+            block_value = values.pop()
+            values[-1] = block_value
+            self.push(node, 3)
+            self.visit(node.condition)
+
+    def for_loop(self, node, state):
+        values = self.values
+        if state == 0 and node.parallel and parallel.accepts(node):
+            values.append(parallel.run(node))
+        elif state == 0:
+            if tree.opens(node):
+                tree.scopes.add_scope()
+            values.append(None)
+            self.push(node, 1)
+            self.visit(node.init)
+        elif state == 1:
+            values.pop()
+            self.push(node, 2)
+            self.visit(node.condition)
+        elif state == 2 or state == 5:
+            condition_value = values.pop()
+            if state == 2 and type(condition_value) is not bool:
+                output.write(f"Invalid syntax: condition is not a bool type.")
+            elif condition_value:
+                self.push(node, 3)
+                self.visit(node.step)
+            elif node.scoped:
+                tree.scopes.remove_scope()
+        elif state == 3:
+            values.pop()
+            self.push(node, 4)
+            self.visit(node.block)
+        else:
+            block_value = values.pop()
+            values[-1] = block_value
+            self.push(node, 5)
+            self.visit(node.condition)
+
+    def relation(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.left)
+        elif state == 1:
+            self.push(node, 2)
+            self.visit(node.right)
+        else:
+            right = self.values.pop()
+            self.values[-1] = tree.relate(node.operator, self.values[-1], right)
+
+    def operator(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.left_part)
+        elif state == 1:
+            self.push(node, 2)
+            self.visit(node.right_part)
+        else:
+            right_part = self.values.pop()
+            self.values[-1] = tree.operate(node.operator, self.values[-1], right_part)
+
+    def minus(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.statement)
+        else:
+            self.values[-1] = -self.values[-1]
+
+    def math_function(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.value)
+        else:
+            self.values[-1] = round(evaluate(node.function, self.values[-1]), 5)
+
+    def cast(self, node, state):
+        if state == 0:
+            type_name = node.type_name.serve()
+            if type_name is None:
+                self.values.append(None)
+                return
+
+            self.push(node, 1)
+            self.visit(node.value)
+        else:
+            self.values[-1] = convert_to(self.values[-1], node.type_name.type_name)
+
+    def print(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.statement)
+        else:
+            output.write(self.values[-1])
+            self.values[-1] = None
+
+    def assign(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.value)
+        else:
+            tree.scopes.assign(node.name.serve(), self.values[-1])
+            self.values[-1] = None
+
+    def assign_with_type(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.value)
+        else:
+            tree.scopes.define(node.name.serve(), self.values[-1])
+            self.values[-1] = None
+
+    # Arguments are collected into one list value. The function body runs on
+    # the same stacks, so recursion depth is bounded by LIMIT instead of the
+    # Python recursion limit.
+    def call(self, node, state):
+        values = self.values
+        if state == 0:
+            if node.lookup() is None:
+                values.append(None)
+                return
+
+            self.push(node, 1)
+            if node.args is None:
+                values.append(None)
+            else:
+                self.visit(node.args)
+        elif state == 1:
+            function = node.target
+            if function is not None and not function["stale"]:
+                tree.bind_cached(function, values.pop())
+                block = node.body(function)["block"]
+            else:
+                function = tree.bind(node.name.serve(), values.pop())
+                if function is None:
+                    values.append(None)
+                    return
+                block = function["block"]
+
+            if len(self.nodes) >= LIMIT:
+                raise StackLimit()
+            if function["scoped"]:
+                self.push(node, 2)
+            self.visit(block)
+        else:
+            tree.scopes.remove_scope()
+
+    def arguments(self, node, state):
+        count = len(node.arguments)
+        if state < count:
+            self.push(node, state + 1)
+            self.visit(node.arguments[state])
+        elif count:
+            collected = self.values[-count:]
+            del self.values[-count:]
+            self.values.append(collected)
+        else:
+            self.values.append([])
+
+    def common_store(self, node, state):
+        if state == 0:
+            self.push(node, 1)
+            self.visit(node.expression)
+        else:
+            tree.temporaries[node.slot] = self.values[-1]
+
+    def common_load(self, node, state):
+        value = tree.temporaries.get(node.slot)
+        if value is None:
+            self.visit(node.expression)
+        else:
+            self.values.append(value)
+
+    def measure(self, node, state):
+        if state == 0:
+            memprofile.profiler.enter(node)
+            self.push(node, 1)
+            self.visit(node.node)
+        else:
+            memprofile.profiler.leave(node)
+
+
+def run(program):
+    return Machine(program).run(program)
@@ -1,20 +1,92 @@
 import argparse
+import sys
 
-from ply_parser import parse_cmd
+import codegen
+import machine
+import memprofile
+import native
+import output
+import parallel
+import repl
+import server
+import snapshot
+import specialize
+import unroll
+from ply_parser import emit_file
+from ply_parser import load_file
 from ply_parser import parse_file
+from stats import Stats
 
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--file", help="path to file")
-parser.add_argument("--hide_tree", help="hide ast tree")
+parser.add_argument("--hide_tree", help="hide ast tree (the interactive mode draws it only with 0)")
 parser.add_argument("--verbose", help="display lexer tokens")
+parser.add_argument("--parser", default="ply", choices=["ply", "rd"], help="parser front end")
+parser.add_argument("--emit-ast", help="compile --file to a binary ast file instead of running it")
+parser.add_argument("--load-ast", help="run a binary ast file")
+parser.add_argument("--output", help="write program output to file")
+parser.add_argument("--flush", default="size", choices=["exit", "size", "time"], help="output flush policy")
+parser.add_argument("--unroll", type=int, default=unroll.LIMIT, help="fully unroll for loops up to this trip count")
+parser.add_argument("--unroll-factor", type=int, default=unroll.FACTOR, help="largest partial unroll factor")
+parser.add_argument("--specialize", type=int, default=specialize.VARIANTS, help="variants per function specialized on constant arguments (0 disables)")
+parser.add_argument("--tier-threshold", type=int, default=codegen.THRESHOLD, help="compile functions and loops after this many calls or iterations (0 disables)")
+parser.add_argument("--native", default="0", choices=["0", "1"], help="compile numeric functions to C with the system compiler when they tier up")
+parser.add_argument("--native-cache", default=native.CACHE, help="directory of compiled native functions")
+parser.add_argument("--evaluator", choices=["tree", "stack"], help="evaluate with recursive serve or an explicit stack (tree, or stack with --memprofile)")
+parser.add_argument("--stack-limit", type=int, default=machine.LIMIT, help="frame limit of the stack evaluator")
+parser.add_argument("--parallel-workers", type=int, default=parallel.WORKERS, help="worker processes of parallel for loops (1 runs them in order)")
+parser.add_argument("--serve", type=int, help="run a local execution server on this port")
+parser.add_argument("--workers", type=int, default=server.WORKERS, help="worker processes of the server")
+parser.add_argument("--prelude", help="run this file before --file or the interactive mode")
+parser.add_argument("--snapshot", help="restore the --prelude state from this file, or write it there")
+parser.add_argument("--memprofile", default="0", choices=["0", "1"], help="trace memory and report it per function, loop and statement (turns off unrolling and specialization)")
+parser.add_argument("--memprofile-limit", type=int, default=memprofile.LIMIT, help="constructs listed in the memory report")
+parser.add_argument("--timings", help="display phase timings, allocations and counters (1 or json); tracing allocations slows the phases")
 
 if __name__ == "__main__":
     args = parser.parse_args()
+    if args.snapshot is not None and args.prelude is None:
+        parser.error("--snapshot needs --prelude")
+    if args.memprofile == "1" and (args.serve is not None or args.snapshot is not None):
+        parser.error("--memprofile cannot be combined with --serve or --snapshot")
 
     verbosity_flag = True if args.verbose == "1" else False
+    stats = Stats(allocations=True) if args.timings in ("1", "json") else None
+    # Unrolled copies and specialized variants would each get their own rows in
+    # the memory report, splitting one construct's cost between them.
+    if args.memprofile == "1":
+        unroll.configure(0, 1)
+        specialize.configure(0)
+    else:
+        unroll.configure(args.unroll, args.unroll_factor)
+        specialize.configure(args.specialize)
+    codegen.configure(args.tier_threshold)
+    native.configure(args.native == "1", args.native_cache)
+    evaluator = args.evaluator or ("stack" if args.memprofile == "1" else "tree")
+    machine.configure(evaluator == "stack", args.stack_limit)
+    parallel.configure(args.parallel_workers)
+    memprofile.configure(args.memprofile == "1", args.memprofile_limit)
+
+    if args.output is not None:
+        output.set_sink(output.to_file(args.output, args.flush))
+    else:
+        output.set_sink(output.Output(policy=args.flush))
 
-    if args.file is not None:
-        parse_file(args.file, verbosity_flag)
+    if args.serve is not None:
+        server.serve(args.serve, args.workers)
+    elif args.load_ast is not None:
+        load_file(args.load_ast, stats)
+    elif args.file is not None and args.emit_ast is not None:
+        emit_file(args.file, args.emit_ast, verbosity_flag, stats, args.parser)
+    elif args.prelude is not None:
+        snapshot.start(args.prelude, args.snapshot, args.file, args.parser, stats, verbosity_flag)
+    elif args.file is not None:
+        parse_file(args.file, verbosity_flag, stats, args.parser)
     else:
-        parse_cmd(True if args.hide_tree == "1" else False, verbosity_flag)
+        repl.start(args.parser, stats, verbosity_flag, args.hide_tree == "0")
+
+    if stats is not None:
+        print(stats.to_json() if args.timings == "json" else stats.report(), file=sys.stderr)
+    if memprofile.ENABLED:
+        print(memprofile.report(), file=sys.stderr)
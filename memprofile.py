@@ -0,0 +1,263 @@
+import tracemalloc
+from array import array
+from contextlib import contextmanager, nullcontext
+from tracemalloc import get_traced_memory, reset_peak
+
+import hashcons
+import tree
+
+
+ENABLED = False
+
+LIMIT = 20
+
+profiler = None
+
+
+def configure(enabled, limit=LIMIT):
+    global ENABLED, LIMIT, profiler
+    ENABLED = enabled
+    LIMIT = limit
+    profiler = Profiler() if enabled else None
+
+
+def size(count):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(count) < 1024 or unit == "MiB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.2f} {unit}"
+        count /= 1024
+
+
+def describe(node):
+    kind = type(node)
+    if kind is tree.For:
+        init = node.init
+        name = f" {init.name.name}" if type(init) in (tree.Assign, tree.AssignWithType) else ""
+        return ("parallel for" if node.parallel else "for") + name
+    elif kind is tree.While:
+        return "while"
+    elif kind is tree.If:
+        return "if"
+    elif kind is tree.UnrolledFor:
+        return "unrolled for"
+    elif kind is tree.InstructionBlock or kind is tree.Block:
+        return "block"
+    elif kind is tree.AssignWithType:
+        return f"{node.name.name} :="
+    elif kind is tree.Assign:
+        return f"{node.name.name} ="
+    elif kind is tree.TypeDeclare:
+        return f"{node.name.name} : {node.type_name.type_name}"
+    elif kind is tree.Print:
+        return "print"
+    elif kind is tree.Call:
+        return f"{node.name.name}()"
+    elif kind is tree.KeyVal:
+        return node.key
+
+    return "expression"
+
+
+# Runs the node it wraps between two readings of the traced memory. runs,
+# retained and peak add up over every time the construct ran, and include what
+# the constructs nested in it allocated. A recursive function retains what its
+# outermost call does, since the inner calls are part of it.
+class Measure(tree.Node):
+    fields = ("node",)
+    __slots__ = fields + ("label", "runs", "retained", "peak", "active")
+
+    def __init__(self, node, label):
+        super().__init__()
+
+        self.node = node
+        self.label = label
+        self.runs = 0
+        self.retained = 0
+        self.peak = 0
+        self.active = 0
+
+    def serve(self):
+        profiler.enter(self)
+        try:
+            return self.node.serve()
+        finally:
+            profiler.leave(self)
+
+    def optimize(self):
+        return self
+
+    def draw(self, graph, parent_id):
+        self.node.draw(graph, parent_id)
+
+
+# tracemalloc keeps one peak, so entering a construct folds the peak so far into
+# the construct around it and resets it. The innermost open construct's peak is
+# then the traced peak, and each one folds its own into its parent on leaving.
+# Scopes are sampled when a statement finishes: declarations go to the
+# innermost scope, so it is the one that may have grown. The readings are kept
+# in arrays and dropped before the peak is reset, so a construct is not charged
+# for the profiler's own bookkeeping.
+class Profiler:
+    def __init__(self):
+        super().__init__()
+
+        self.measures = []
+        self.labels = set()
+        self.blocks = set()
+        self.starts = array("q", [0])
+        self.peaks = array("q", [0])
+        self.peak = 0
+        self.traced = 0
+        self.retained = 0
+        self.scopes_created = 0
+        self.deepest = 0
+        self.widest = 0
+
+    def enter(self, node):
+        node.active += 1
+        current, peak = get_traced_memory()
+        peaks = self.peaks
+        if peak > peaks[-1]:
+            peaks[-1] = peak
+        self.starts.append(current)
+        peaks.append(current)
+        del current, peak
+        reset_peak()
+
+    def leave(self, node):
+        current, peak = get_traced_memory()
+        start = self.starts.pop()
+        peaks = self.peaks
+        top = peaks.pop()
+        if peak > top:
+            top = peak
+        if top > peaks[-1]:
+            peaks[-1] = top
+
+        node.runs += 1
+        node.active -= 1
+        if not node.active:
+            node.retained += current - start
+        if top - start > node.peak:
+            node.peak = top - start
+
+        scopes = tree.scopes.scopes_list
+        if len(scopes) > self.deepest:
+            self.deepest = len(scopes)
+        if len(scopes[-1].names) > self.widest:
+            self.widest = len(scopes[-1].names)
+
+    # Frames the stack evaluator dropped after a stack limit error never leave.
+    def abandon(self, nodes, states):
+        for node, state in zip(nodes, states):
+            if state == 1 and type(node) is Measure:
+                node.active -= 1
+                self.starts.pop()
+                self.peaks.pop()
+
+    def measure(self, node, label):
+        count = 1
+        unique = label
+        while unique in self.labels:
+            count += 1
+            unique = f"{label} #{count}"
+        self.labels.add(unique)
+
+        measure = Measure(node, unique)
+        self.measures.append(measure)
+        return measure
+
+    # A function body becomes one measured block around its measured
+    # statements. The block object stays the same, since the function and its
+    # specialized variants are matched by identity.
+    def body(self, block, label):
+        if block in self.blocks:
+            return
+        self.blocks.add(block)
+
+        inner = tree.Block(block.statements)
+        measure = self.measure(inner, label)
+        inner.statements = [self.statement(statement, measure.label) for statement in block.statements]
+        block.statements = [measure]
+
+    def statement(self, node, parent):
+        if type(node) is Measure or type(node) is tree.Comment:
+            return node
+        elif type(node) is tree.Function:
+            self.instrument(node, parent)
+            return node
+
+        measure = self.measure(node, f"{parent} > {describe(node)}" if parent else describe(node))
+        self.instrument(node, measure.label)
+        return measure
+
+    def instrument(self, node, label):
+        kind = type(node)
+        if kind in hashcons.SHARED:
+            return
+        elif kind is tree.Block:
+            if node not in self.blocks:
+                self.blocks.add(node)
+                node.statements = [self.statement(statement, label) for statement in node.statements]
+            return
+        elif kind is tree.Function:
+            self.body(node.block, f"function {node.name.name}")
+            return
+        elif kind is tree.Call and node.variant is not None:
+            self.body(node.variant["block"], f"function {node.variant['name']}")
+
+        for child in node.children():
+            self.instrument(child, label)
+
+    @contextmanager
+    def trace(self, program):
+        self.instrument(program, "")
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        reset_peak()
+        start, _ = get_traced_memory()
+        self.starts, self.peaks = array("q", [start]), array("q", [start])
+        created = tree.scopes.created
+        try:
+            yield
+        finally:
+            current, peak = get_traced_memory()
+            top = max(self.peaks[0], peak)
+            self.peak = max(self.peak, top - start)
+            self.traced = max(self.traced, top)
+            self.retained += current - start
+            self.scopes_created += tree.scopes.created - created
+            if started:
+                tracemalloc.stop()
+
+    def report(self):
+        lines = ["----------------------MEMORY PROFILE-----------------------"]
+        lines.append(f"peak          {size(self.peak)} above the start ({size(self.traced)} traced)")
+        lines.append(f"retained      {size(self.retained)}")
+        lines.append(
+            f"scopes        {self.scopes_created} created, {self.deepest} live at most,"
+            f" {self.widest} variables in the widest"
+        )
+        lines.append(f"{'peak':>12}{'retained':>13}{'runs':>10}  construct")
+
+        measures = [measure for measure in self.measures if measure.runs]
+        measures.sort(key=lambda measure: (measure.peak, measure.retained), reverse=True)
+        for measure in measures[:LIMIT]:
+            lines.append(
+                f"{size(measure.peak):>12}{size(measure.retained):>13}{measure.runs:>10}  {measure.label}"
+            )
+        lines.append("-----------------------------------------------------------")
+
+        return "\n".join(lines)
+
+
+def tracing(program):
+    if not ENABLED:
+        return nullcontext()
+    return profiler.trace(program)
+
+
+def report():
+    return profiler.report()
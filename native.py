@@ -0,0 +1,356 @@
+import ctypes
+import hashlib
+import math
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+
+import tree
+
+
+ENABLED = False
+
+COMPILER = os.environ.get("CC", "cc")
+
+FLAGS = ["-O2", "-std=c11", "-ffp-contract=off", "-shared", "-fPIC"]
+
+CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "mw34-native"
+)
+
+INT_MIN = -(1 << 63)
+
+INT_MAX = (1 << 63) - 1
+
+C_TYPES = {"int": "int64_t", "float": "double", "bool": "int"}
+
+CTYPES = {"int": ctypes.c_int64, "float": ctypes.c_double, "bool": ctypes.c_int}
+
+OVERFLOW = {"+": "add", "-": "sub", "*": "mul"}
+
+RELATIONS = {"<", ">", "<=", ">=", "==", "!="}
+
+# Every check that fails returns 1, and the call runs again in the interpreter,
+# which raises or prints what it would have without the native code.
+PRELUDE = [
+    "#include <math.h>",
+    "#include <stdint.h>",
+    "#include <stdio.h>",
+    "#include <stdlib.h>",
+    "",
+    "#define EXACT(x) ((x) >= -9007199254740992 && (x) <= 9007199254740992)",
+    "#define FITS(x) ((x) >= -9223372036854775808.0 && (x) < 9223372036854775808.0)",
+    "",
+    "static double round5(double x) {",
+    "    char buffer[400];",
+    '    snprintf(buffer, sizeof buffer, "%.5f", x);',
+    "    return strtod(buffer, NULL);",
+    "}",
+    "",
+]
+
+libraries = {}
+
+
+def configure(enabled, cache=CACHE):
+    global ENABLED, CACHE
+    ENABLED = enabled
+    CACHE = cache
+
+
+class Unsupported(Exception):
+    pass
+
+
+# Numeric function bodies to C. Python ints become int64_t with overflow
+# checks, and an operation the interpreter would reject or compute differently
+# fails the call instead. Statements that would print a diagnostic, such as a
+# declaration repeated in a loop scope or a type mismatch, keep the function in
+# Python altogether.
+class Translator:
+    def __init__(self):
+        super().__init__()
+
+        self.lines = []
+        self.scopes = []
+        self.names = 0
+
+    def emit(self, depth, line):
+        self.lines.append("    " * depth + line)
+
+    def name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def temporary(self, depth, type_name, value):
+        name = self.name("t")
+        self.emit(depth, f"{C_TYPES[type_name]} {name} = {value};")
+        return name
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise Unsupported()
+
+    def declare(self, depth, name, type_name, value):
+        if name in self.scopes[-1]:
+            raise Unsupported()
+
+        variable = self.name("v")
+        self.emit(depth, f"{C_TYPES[type_name]} {variable} = {value};")
+        self.scopes[-1][name] = (variable, type_name)
+
+    def operator(self, node, depth):
+        left, left_type = self.expression(node.left_part, depth)
+        right, right_type = self.expression(node.right_part, depth)
+        if left_type != right_type or left_type not in ("int", "float"):
+            raise Unsupported()
+
+        operator = node.operator
+        if left_type == "int" and operator in OVERFLOW:
+            result = self.name("t")
+            self.emit(depth, f"int64_t {result};")
+            self.emit(depth, f"if (__builtin_{OVERFLOW[operator]}_overflow({left}, {right}, &{result})) return 1;")
+            return result, "int"
+        elif left_type == "int" and operator == "/":
+            self.emit(depth, f"if ({right} == 0 || !EXACT({left}) || !EXACT({right})) return 1;")
+            return self.temporary(depth, "float", f"(double){left} / (double){right}"), "float"
+        elif operator in OVERFLOW:
+            return self.temporary(depth, "float", f"{left} {operator} {right}"), "float"
+        elif operator == "/":
+            self.emit(depth, f"if ({right} == 0.0) return 1;")
+            return self.temporary(depth, "float", f"{left} / {right}"), "float"
+        elif operator == "^":
+            power = self.temporary(depth, "float", f"pow((double){left}, (double){right})")
+            if left_type == "float":
+                self.emit(depth, f"if (!isfinite({power})) return 1;")
+                return power, "float"
+            self.emit(depth, f"if (!isfinite({power}) || !FITS({power})) return 1;")
+            return self.temporary(depth, "int", f"(int64_t){power}"), "int"
+
+        raise Unsupported()
+
+    def expression(self, node, depth):
+        kind = type(node)
+        if kind is tree.IntVal:
+            value = node.serve()
+            if value > INT_MAX:
+                raise Unsupported()
+            return f"INT64_C({value})", "int"
+        elif kind is tree.FloatVal or kind is tree.Pi:
+            value = node.serve()
+            if not math.isfinite(value):
+                raise Unsupported()
+            return value.hex(), "float"
+        elif kind is tree.BoolVal:
+            return ("1" if node.serve() else "0"), "bool"
+        elif kind is tree.KeyVal:
+            return self.lookup(node.key)
+        elif kind is tree.CommonStore or kind is tree.CommonLoad:
+            return self.expression(node.expression, depth)
+        elif kind is tree.Operator:
+            return self.operator(node, depth)
+        elif kind is tree.Relation:
+            left, left_type = self.expression(node.left, depth)
+            right, right_type = self.expression(node.right, depth)
+            if left_type != right_type or node.operator not in RELATIONS:
+                raise Unsupported()
+            return self.temporary(depth, "bool", f"{left} {node.operator} {right}"), "bool"
+        elif kind is tree.UMinus:
+            value, type_name = self.expression(node.statement, depth)
+            if type_name == "float":
+                return self.temporary(depth, "float", f"-{value}"), "float"
+            elif type_name == "int":
+                result = self.name("t")
+                self.emit(depth, f"int64_t {result};")
+                self.emit(depth, f"if (__builtin_sub_overflow(0, {value}, &{result})) return 1;")
+                return result, "int"
+        elif kind is tree.MathFunction:
+            value, type_name = self.expression(node.value, depth)
+            if type_name not in ("int", "float"):
+                raise Unsupported()
+            argument = self.temporary(depth, "float", f"(double){value}")
+            result = self.temporary(depth, "float", f"{node.function}({argument})")
+            self.emit(depth, f"if (!isfinite({argument}) || !isfinite({result})) return 1;")
+            return self.temporary(depth, "float", f"round5({result})"), "float"
+        elif kind is tree.Cast:
+            value, type_name = self.expression(node.value, depth)
+            target = node.type_name.type_name
+            if type_name not in ("int", "float") or target not in ("int", "float"):
+                raise Unsupported()
+            if target == "float":
+                return self.temporary(depth, "float", f"(double){value}"), "float"
+            elif type_name == "float":
+                self.emit(depth, f"if (!isfinite({value}) || !FITS({value})) return 1;")
+            return self.temporary(depth, "int", f"(int64_t){value}"), "int"
+
+        raise Unsupported()
+
+    def condition(self, node, depth):
+        value, type_name = self.expression(node, depth)
+        if type_name != "bool":
+            raise Unsupported()
+        return value
+
+    def scoped(self, block, depth):
+        self.emit(depth, "{")
+        self.scopes.append({})
+        self.block(block, depth + 1, False)
+        self.scopes.pop()
+        self.emit(depth, "}")
+
+    # Loops open one scope for all their iterations, so a declaration in the
+    # body would fail from the second iteration on.
+    def loop(self, node, depth):
+        self.emit(depth, "{")
+        self.scopes.append({})
+        if type(node) is tree.For:
+            self.statement(node.init, depth + 1, False)
+        self.emit(depth + 1, "for (;;) {")
+        self.emit(depth + 2, f"if (!{self.condition(node.condition, depth + 2)}) break;")
+        if type(node) is tree.For:
+            self.statement(node.step, depth + 2, True)
+        self.block(node.block, depth + 2, True)
+        self.emit(depth + 1, "}")
+        self.scopes.pop()
+        self.emit(depth, "}")
+
+    def statement(self, node, depth, shared):
+        kind = type(node)
+        if kind is tree.AssignWithType:
+            if shared:
+                raise Unsupported()
+            value, type_name = self.expression(node.value, depth)
+            self.declare(depth, node.name.name, type_name, value)
+        elif kind is tree.Assign:
+            value, type_name = self.expression(node.value, depth)
+            variable, variable_type = self.lookup(node.name.name)
+            if type_name != variable_type:
+                raise Unsupported()
+            self.emit(depth, f"{variable} = {value};")
+        elif kind is tree.Comment:
+            pass
+        elif kind is tree.Block:
+            self.block(node, depth, shared)
+        elif kind is tree.InstructionBlock or kind is tree.UnrolledFor:
+            self.scoped(node.block, depth)
+        elif kind is tree.If:
+            self.emit(depth, f"if ({self.condition(node.condition, depth)})")
+            self.scoped(node.action, depth)
+        elif kind is tree.While or (kind is tree.For and not node.parallel):
+            self.loop(node, depth)
+        else:
+            self.expression(node, depth)
+
+    def block(self, node, depth, shared):
+        for statement in node.statements:
+            self.statement(statement, depth, shared)
+
+    # The value of a function is the value of its last statement, which has to
+    # be an expression here.
+    def function(self, function):
+        parameters = []
+        self.scopes.append({})
+        for name, type_name in function["args"] or ():
+            if type_name not in C_TYPES:
+                raise Unsupported()
+            variable = self.name("p")
+            parameters.append(f"{C_TYPES[type_name]} {variable}")
+            self.scopes[-1][name] = (variable, type_name)
+
+        statements = function["block"].statements
+        for statement in statements[:-1]:
+            self.statement(statement, 1, False)
+        value, type_name = self.expression(statements[-1], 1)
+        self.emit(1, f"*result = {value};")
+        self.emit(1, "return 0;")
+
+        parameters.append(f"{C_TYPES[type_name]} *result")
+        header = f"int run({', '.join(parameters)}) {{"
+        return "\n".join(PRELUDE + [header] + self.lines + ["}"]) + "\n", type_name
+
+
+# Loading a library runs its code, so only a cache directory and libraries
+# that the current user owns and no one else can write are trusted. Symbolic
+# links are not followed.
+def trusted(path):
+    info = os.lstat(path)
+    if stat.S_ISLNK(info.st_mode) or info.st_uid != os.getuid():
+        return False
+    return not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+# Libraries are cached on disk under a hash of the source and the compiler
+# command, so a function is compiled once across runs. The cache is private to
+# the user who runs the interpreter.
+def build(source):
+    key = "\0".join([COMPILER] + FLAGS + [source])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    if digest in libraries:
+        return libraries[digest]
+
+    os.makedirs(CACHE, mode=0o700, exist_ok=True)
+    if not trusted(CACHE):
+        return None
+
+    path = os.path.join(CACHE, f"{digest}.so")
+    if not os.path.exists(path):
+        if shutil.which(COMPILER) is None:
+            return None
+        with tempfile.TemporaryDirectory(dir=CACHE) as directory:
+            source_path = os.path.join(directory, "function.c")
+            with open(source_path, "w") as f:
+                f.write(source)
+            temporary = os.path.join(directory, "function.so")
+            completed = subprocess.run(
+                [COMPILER] + FLAGS + ["-o", temporary, source_path, "-lm"], capture_output=True
+            )
+            if completed.returncode != 0:
+                return None
+            os.chmod(temporary, 0o700)
+            os.replace(temporary, path)
+
+    if not trusted(path):
+        return None
+    libraries[digest] = ctypes.CDLL(path)
+    return libraries[digest]
+
+
+# The arguments are read back from the call scope, where bind has already
+# converted them. Ints outside int64_t and failed checks run the body in the
+# interpreter instead.
+def compile_function(function):
+    try:
+        source, type_name = Translator().function(function)
+    except (Unsupported, RecursionError):
+        return None
+
+    try:
+        library = build(source)
+    except OSError:
+        return None
+    if library is None:
+        return None
+
+    native = library.run
+    arguments = [(name, arg_type) for name, arg_type in function["args"] or ()]
+    native.argtypes = [CTYPES[arg_type] for _, arg_type in arguments] + [ctypes.POINTER(CTYPES[type_name])]
+    native.restype = ctypes.c_int
+    result = CTYPES[type_name]()
+    pointer = ctypes.byref(result)
+    block = function["block"]
+
+    def run():
+        get = tree.scopes.get
+        values = [get(name) for name, _ in arguments]
+        for (_, arg_type), value in zip(arguments, values):
+            if arg_type == "int" and not INT_MIN <= value <= INT_MAX:
+                return block.serve()
+        if native(*values, pointer):
+            return block.serve()
+        return bool(result.value) if type_name == "bool" else result.value
+
+    return run
@@ -0,0 +1,30 @@
+import cse
+import liveness
+import rewrite
+import specialize
+import unroll
+
+
+def merge(totals, counts):
+    for key, count in counts.items():
+        totals[key] = totals.get(key, 0) + count
+
+
+# The environment is what earlier input defined, for a program compiled on its
+# own against a live session; see inference.Environment.
+def optimize(program, stats=None, environment=None):
+    specialized = specialize.specialize(program, environment)
+    unrolled = unroll.unroll(program, environment)
+    rewrites = rewrite.rewrite(program, environment=environment)
+    eliminated = liveness.eliminate(program, environment)
+    reused = cse.eliminate(program)
+    if reused:
+        rewrites["common subexpression"] = reused
+
+    if stats is not None:
+        merge(stats.rewrites, specialized)
+        merge(stats.rewrites, unrolled)
+        merge(stats.rewrites, rewrites)
+        merge(stats.eliminated, eliminated)
+
+    return program
@@ -0,0 +1,94 @@
+import atexit
+import sys
+import time
+from contextlib import contextmanager
+
+
+class Output:
+    def __init__(self, target=None, policy="size", buffer_size=1 << 16, interval=0.5):
+        super().__init__()
+
+        if policy not in ("exit", "size", "time"):
+            raise ValueError(f"Unknown flush policy {policy}.")
+
+        self.target = target
+        self.policy = policy
+        self.buffer_size = buffer_size
+        self.interval = interval
+        self.buffer = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, value):
+        line = f"{value}\n"
+        self.buffer.append(line)
+        self.size += len(line)
+
+        if self.policy == "size":
+            if self.size >= self.buffer_size:
+                self.flush()
+        elif self.policy == "time":
+            if self.size >= self.buffer_size or time.monotonic() - self.last_flush >= self.interval:
+                self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+
+        buffer = self.buffer
+        self.buffer = []
+        self.size = 0
+
+        if self.target is None:
+            sys.stdout.write("".join(buffer))
+            sys.stdout.flush()
+        elif isinstance(self.target, list):
+            self.target.extend(line[:-1] for line in buffer)
+        elif callable(self.target):
+            self.target("".join(buffer))
+        else:
+            self.target.write("".join(buffer))
+            self.target.flush()
+
+    def close(self):
+        self.flush()
+        if hasattr(self.target, "close"):
+            self.target.close()
+
+
+sink = Output()
+
+
+def write(value):
+    sink.write(value)
+
+
+def flush():
+    sink.flush()
+
+
+def set_sink(new_sink):
+    global sink
+    sink.flush()
+    previous, sink = sink, new_sink
+    return previous
+
+
+def to_file(path, policy="size", buffer_size=1 << 16, interval=0.5):
+    result = Output(open(path, "w"), policy, buffer_size, interval)
+    atexit.register(result.close)
+    return result
+
+
+@contextmanager
+def capture(target=None, policy="exit"):
+    lines = [] if target is None else target
+    previous = set_sink(Output(lines, policy))
+    try:
+        yield lines
+    finally:
+        set_sink(previous)
+
+
+atexit.register(flush)
@@ -0,0 +1,264 @@
+import multiprocessing
+import os
+import sys
+
+import output
+import tree
+
+from rope import flatten
+from utils import determine_type
+
+
+WORKERS = os.cpu_count() or 1
+
+CHUNKS = 4
+
+IDENTITIES = {
+    ("+", "int"): 0,
+    ("*", "int"): 1,
+    ("+", "float"): 0.0,
+    ("*", "float"): 1.0,
+    ("+", "string"): "",
+}
+
+loop = None
+
+
+def configure(workers):
+    global WORKERS
+    WORKERS = workers
+
+
+class Dependence(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+# What a parallel loop needs to run its iterations apart: the induction
+# variable and the accumulators with their operators. The check looked into the
+# functions the body calls, so the plan holds only while the same definitions
+# are in place. reason says why a loop that failed the check runs in order.
+class Plan:
+    def __init__(self, variable):
+        super().__init__()
+
+        self.variable = variable
+        self.reductions = {}
+        self.functions = []
+        self.reason = None
+
+    def current(self):
+        return all(tree.functions.get(name) is function for name, function in self.functions)
+
+
+# Iterations may read anything, but the only names outside the body they may
+# assign are accumulators updated as acc = acc + e or acc = acc * e, and read
+# nowhere else. With dynamic scoping the same holds for every function the body
+# calls. The body declares nothing in the loop scope, since that scope is shared
+# by all iterations.
+class Checker:
+    def __init__(self, node):
+        super().__init__()
+
+        self.node = node
+        self.plan = Plan(node.init.name.name)
+        self.reads = {}
+        self.called = set()
+
+    def reduction(self, node):
+        name, value = node.name.name, node.value
+        if name == self.plan.variable:
+            raise Dependence(f"iterations assign the induction variable {name}")
+        if type(value) is not tree.Operator or value.operator not in ("+", "*"):
+            raise Dependence(f"iterations assign {name}")
+        if type(value.left_part) is not tree.KeyVal or value.left_part.key != name:
+            raise Dependence(f"iterations assign {name}")
+        if self.plan.reductions.setdefault(name, value.operator) != value.operator:
+            raise Dependence(f"{name} is accumulated with both + and *")
+
+        return value.right_part
+
+    def call(self, name):
+        function = tree.functions.get(name)
+        if name in self.called:
+            return
+        self.called.add(name)
+        self.plan.functions.append((name, function))
+        if function is None:
+            return
+
+        local = set() if function["args"] is None else {argument[0] for argument in function["args"]}
+        self.visit(function["block"], local, False)
+
+    def visit(self, node, local, top):
+        kind = type(node)
+        if kind is tree.Function:
+            raise Dependence("the body defines a function")
+        elif kind is tree.AssignWithType or kind is tree.TypeDeclare:
+            if top:
+                raise Dependence(f"the body declares {node.name.name} in the loop scope")
+            if kind is tree.AssignWithType:
+                self.visit(node.value, local, top)
+            local.add(node.name.name)
+            return
+        elif kind is tree.Assign and node.name.name not in local:
+            self.visit(self.reduction(node), local, top)
+            return
+        elif kind is tree.KeyVal:
+            self.reads[node.key] = self.reads.get(node.key, 0) + 1
+        elif kind is tree.Call:
+            self.call(node.name.name)
+        elif kind is tree.For and node.parallel:
+            planned(node)
+        if kind in tree.OPENERS:
+            local, top = set(local), False
+
+        for child in node.children():
+            self.visit(child, local, top)
+
+    def check(self):
+        node = self.node
+        if type(node.step) is not tree.Assign or node.step.name.name != self.plan.variable:
+            raise Dependence("the step does not assign the induction variable")
+        mentioned = set()
+        for part in (node.condition, node.step):
+            for child in tree.walk(part):
+                if type(child) is tree.Call or type(child) is tree.Print:
+                    raise Dependence("the condition or step has side effects")
+                elif type(child) is tree.KeyVal:
+                    mentioned.add(child.key)
+
+        self.visit(node.block, set(), True)
+        for name in self.plan.reductions:
+            if self.reads.get(name) or name in mentioned:
+                raise Dependence(f"iterations read the accumulator {name}")
+
+        return self.plan
+
+
+def check(node):
+    if type(node.init) is not tree.AssignWithType:
+        plan = Plan(None)
+        plan.reason = "the init does not declare the induction variable"
+        return plan
+
+    checker = Checker(node)
+    try:
+        return checker.check()
+    except Dependence as e:
+        checker.plan.reason = e.message
+        return checker.plan
+
+
+# Whether a loop can run in parallel depends only on the program, so the reason
+# it cannot is reported the first time it is reached, whatever the worker count.
+# The check of a loop also plans the parallel loops in its body, so workers
+# inherit those plans and do not report them again. Reasons go to stderr, apart
+# from the program's output. A loop met again while its own check runs, through
+# a recursive call, sees an empty plan in the meantime.
+def planned(node):
+    plan = node.plan
+    if plan is None or not plan.current():
+        node.plan = Plan(None)
+        plan = node.plan = check(node)
+        if plan.reason is not None:
+            print(f"Parallel for runs in order: {plan.reason}.", file=sys.stderr)
+
+    return plan
+
+
+# Loops nested in a worker run in order, as do loops when there is one worker.
+def accepts(node):
+    if planned(node).reason is not None:
+        return False
+
+    return WORKERS >= 2 and not multiprocessing.current_process().daemon
+
+
+# The condition and step do not depend on the body, so the induction values
+# are known before any iteration runs.
+def iterations(node):
+    values = []
+    condition_value = node.condition.serve()
+    if type(condition_value) is not bool:
+        output.write(f"Invalid syntax: condition is not a bool type.")
+        return values
+
+    while condition_value:
+        node.step.serve()
+        values.append(tree.scopes.get(node.plan.variable))
+        condition_value = node.condition.serve()
+
+    return values
+
+
+def split(values, count):
+    size, extra = divmod(len(values), count)
+    chunks, start = [], 0
+    for i in range(count):
+        end = start + size + (i < extra)
+        chunks.append(values[start:end])
+        start = end
+
+    return chunks
+
+
+# Runs in a forked worker, which starts from the interpreter state at the loop.
+# Accumulators start from the identity of their operator.
+def iterate(chunk):
+    node, identities = loop
+    for name, identity in identities.items():
+        tree.scopes.assign(name, identity)
+
+    value = None
+    with output.capture() as lines:
+        for item in chunk:
+            tree.scopes.assign(node.plan.variable, item)
+            value = node.block.serve()
+
+    partials = {name: flatten(tree.scopes.get(name)) for name in identities}
+    return lines, partials, flatten(value)
+
+
+# Chunks are contiguous and their results are taken in order, so the output and
+# the accumulators come out as if the iterations had run one after another.
+def run(node):
+    global loop
+    plan = node.plan
+
+    tree.scopes.add_scope()
+    node.init.serve()
+    values = iterations(node)
+
+    identities = {}
+    for name, operator in plan.reductions.items():
+        identity = IDENTITIES.get((operator, determine_type(tree.scopes.get(name))))
+        if identity is None:
+            break
+        identities[name] = identity
+
+    value = None
+    if len(identities) < len(plan.reductions) or len(values) < 2:
+        for item in values:
+            tree.scopes.assign(plan.variable, item)
+            value = node.block.serve()
+        tree.scopes.remove_scope()
+        return value
+
+    chunks = split(values, min(len(values), WORKERS * CHUNKS))
+    output.flush()
+    loop = (node, identities)
+    try:
+        with multiprocessing.get_context("fork").Pool(min(WORKERS, len(chunks))) as pool:
+            results = pool.map(iterate, chunks)
+    finally:
+        loop = None
+
+    for lines, partials, value in results:
+        for line in lines:
+            output.write(line)
+        for name, partial in partials.items():
+            tree.scopes.assign(name, tree.operate(plan.reductions[name], tree.scopes.get(name), partial))
+
+    tree.scopes.remove_scope()
+    return value
@@ -1,9 +1,20 @@
-import ply.lex as lex
 import ply.yacc as yacc
+import astfile
+import codegen
+import gc
+import hashcons
+import machine
 import math
+import memprofile
+import optimizer
+import output
+import rd_parser
+import sys
 import tree
 
 from graphviz import Digraph
+from lexer import Lexer, tokenize
+from stats import phase
 
 
 tokens = (
@@ -13,6 +24,7 @@ tokens = (
     "IF",
     "WHILE",
     "FOR",
+    "PARALLEL",
     "FUNCTION",
     "NAME",
     "STRING",
@@ -25,97 +37,6 @@ tokens = (
     "PI",
 )
 
-literals = ["=", "+", "-", "*", "/", "(", ")", ";", ":", "^", "{", "}", ","]
-
-
-def t_FLOAT(t):
-    r"\d+\.\d+|\.\d+"
-    return t
-
-
-def t_INTEGER(t):
-    r"\d+"
-    return t
-
-
-def t_BOOL(t):
-    r"true|false"
-    return t
-
-
-def t_CAST(t):
-    r"static_cast"
-    return t
-
-
-def t_IF(t):
-    r"if"
-    return t
-
-
-def t_WHILE(t):
-    r"while"
-    return t
-
-
-def t_FOR(t):
-    r"for"
-    return t
-
-
-def t_FUNCTION(t):
-    r"function"
-    return t
-
-
-def t_PRINT(t):
-    r"print"
-    return t
-
-
-def t_MATH_FUNCTION(t):
-    r"sin|cos|exp|sqrt|log"
-    return t
-
-
-def t_TWOSTAR(t):
-    r"\*\*"
-    t.type = "^"
-    t.value = "^"
-    return t
-
-
-def t_PI(t):
-    r"PI"
-    return t
-
-
-def t_COMMENT(t):
-    r"\#.*"
-    return t
-
-
-def t_STRING(t):
-    r"\"(.*?)\""
-    return t
-
-
-def t_NAME(t):
-    r"[a-zA-Z_][a-zA-Z0-9_]*"
-    return t
-
-
-def t_newline(t):
-    r"\n+"
-    t.lexer.lineno += len(t.value)
-
-
-t_RELATION = r"<=|>=|==|!=|<|>"
-
-t_TVASSIGNMENT = r":="
-
-t_ignore = " \t"
-
 precedence = (
     ("left", "RELATION"),
     ("left", "+", "-"),
@@ -124,12 +45,7 @@ precedence = (
 )
 
 
-def t_error(t):
-    print("Illegal character '%s'" % t.value[0])
-    t.lexer.skip(1)
-
-
-lexer = lex.lex()
+lexer = Lexer()
 
 
 def p_program(p):
@@ -180,6 +96,11 @@ def p_statement_for(p):
     p[0] = tree.For(p[3], p[5], p[7], p[10])
 
 
+def p_statement_parallel_for(p):
+    " statement : PARALLEL FOR '(' statement ';' statement ';' statement ')' '{' block '}'"
+    p[0] = tree.For(p[4], p[6], p[8], p[11], True)
+
+
 def p_statement_assignment(p):
     "statement : NAME '=' statement "
     p[0] = tree.Assign(tree.NameVal(p[1]), p[3])
@@ -321,56 +242,140 @@ def p_error(p):
         print("Syntax error at EOF")
 
 
-parser = yacc.yacc()
+parser = None
+
+
+def ply_parse(token_list):
+    global parser
+    if parser is None:
+        parser = yacc.yacc()
+
+    lexer.load(token_list)
+    return parser.parse(lexer=lexer)
+
+
+FRONT_ENDS = {"ply": ply_parse, "rd": rd_parser.parse}
 
 
-def parse_file(path, verbose=False):
+def build(tokens, front_end="ply"):
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        ast = FRONT_ENDS[front_end](tokens)
+        return ast if ast is None else hashcons.share(ast)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def parse_file(path, verbose=False, stats=None, front_end="ply"):
     with open(path, "r") as f:
         content = f.read()
 
-        parse(content, False, verbose)
+        parse(content, False, verbose, stats, front_end)
 
 
-def parse_cmd(hide_tree=False, verbose=False):
-    while True:
-        try:
-            s = input("> ")
-        except EOFError:
-            break
-        if not s:
-            continue
+def emit_file(path, ast_path, verbose=False, stats=None, front_end="ply"):
+    with open(path, "r") as f:
+        content = f.read()
+
+    ast = compile_program(content, verbose, stats, front_end)
+    if ast is not None:
+        with phase(stats, "emit"):
+            astfile.dump(ast, ast_path)
+
+
+def load_file(ast_path, stats=None):
+    try:
+        with phase(stats, "load"):
+            ast = astfile.load(ast_path)
+    except astfile.FormatError as e:
+        print(e.message)
+        return
 
-        parse(s, hide_tree, verbose)
+    execute(ast, stats)
 
 
-def parse(content, hide_tree, verbose):
+def parse(content, hide_tree, verbose, stats=None, front_end="ply"):
+    ast = compile_program(content, verbose, stats, front_end, freeze=True)
+
+    if ast is not None:
+        execute(ast, stats)
+        draw(ast, hide_tree, stats)
+
+
+# freeze moves everything alive, garbage included, out of the collector's reach
+# for good, so only a one-shot run asks for it; the server and the interactive
+# mode compile many programs in one process.
+def compile_program(content, verbose=False, stats=None, front_end="ply", freeze=False):
+    with phase(stats, "tokenize"):
+        tokens = tokenize(content, positions=verbose)
+
+    if stats is not None:
+        stats.tokens += len(tokens)
+
     if verbose:
-        print_tokens(content)
+        print_tokens(tokens)
 
     ast = None
-    ast = yacc.parse(content)
+    with phase(stats, "parse"):
+        ast = build(tokens, front_end)
 
-    if ast is not None:
-        ast = ast.optimize()
-        ast.serve()
+    if ast is None:
+        return None
+
+    if stats is not None:
+        stats.nodes_before += sum(1 for _ in tree.walk(ast))
+
+    with phase(stats, "optimize"):
+        ast = optimizer.optimize(ast, stats)
+        if freeze:
+            gc.freeze()
 
-        graph = Digraph()
-        ast.draw(graph)
+    if stats is not None:
+        stats.nodes_after += sum(1 for _ in tree.walk(ast))
+        stats.unique_nodes += hashcons.unique(ast)
+
+    return ast
+
+
+def execute(ast, stats=None):
+    if stats is not None:
+        scopes_created = tree.scopes.created
+        calls = tree.calls_count
+        events = len(codegen.events)
+
+    with phase(stats, "serve"), memprofile.tracing(ast):
+        value = machine.run(ast) if machine.ENABLED else ast.serve()
+        output.flush()
+
+    if stats is not None:
+        stats.scopes_created += tree.scopes.created - scopes_created
+        stats.calls += tree.calls_count - calls
+        stats.tier_ups.extend(codegen.events[events:])
+
+    return value
+
+
+# The draw methods recurse, so a tree nested past the recursion limit is not
+# drawn; the program has already run by then.
+def draw(ast, hide_tree, stats=None):
+    with phase(stats, "draw"):
+        graph = Digraph(strict=True)
+        try:
+            ast.draw(graph)
+        except RecursionError:
+            if not hide_tree:
+                print("The tree is too deep to draw.", file=sys.stderr)
+            return
         if not hide_tree:
             graph.render("ast", format="png", view=True, cleanup=True)
 
 
-def print_tokens(content):
+def print_tokens(tokens):
     print("-------------------------TOKENS----------------------------")
     print("-----------------------------------------------------------")
-    # Give the lexer some input
-    lexer.input(content)
-
-    # Tokenize
-    while True:
-        tok = lexer.token()
-        if not tok:
-            break  # No more input
+    for tok in tokens:
         print(tok)
 
     print("-----------------------------------------------------------")
@@ -0,0 +1,285 @@
+import tree
+
+
+BINARY_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2, "^": 3}
+RIGHT_ASSOCIATIVE = {"^"}
+
+END = "$end"
+
+ATOMS = {
+    "INTEGER": tree.IntVal,
+    "NAME": tree.KeyVal,
+    "FLOAT": tree.FloatVal,
+    "STRING": tree.StringVal,
+    "BOOL": tree.BoolVal,
+}
+
+
+class UnexpectedEnd(Exception):
+    pass
+
+
+# The productions are generators run by tree.trampoline. Where the grammar
+# nests, a production is yielded and its node sent back, so nesting depth is
+# bounded by memory instead of the recursion limit; elsewhere yield from keeps
+# the work in one generator chain of fixed depth.
+class Parser:
+    def __init__(self, tokens, report=True):
+        super().__init__()
+
+        self.types = tokens.types + [END]
+        self.values = tokens.values + [None]
+        self.position = 0
+        self.report = report
+        self.errors = []
+
+    def error(self):
+        kind = self.types[self.position]
+        if kind == END:
+            self.errors.append((self.position, "Syntax error at EOF"))
+            if self.report:
+                print("Syntax error at EOF")
+            raise UnexpectedEnd()
+
+        message = f"Syntax error at token {self.values[self.position]}."
+        self.errors.append((self.position, message))
+        if self.report:
+            print(message)
+        self.position += 1
+
+    def expect(self, kind):
+        while self.types[self.position] != kind:
+            self.error()
+
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        if index >= len(self.types):
+            return END
+        return self.types[index]
+
+    def program(self):
+        return tree.Program((yield from self.block(top_level=True)))
+
+    def block(self, top_level=False):
+        statements = [(yield from self.statement())]
+
+        types = self.types
+        stop = END if top_level else "}"
+        while types[self.position] != stop:
+            if top_level and types[self.position] == "}":
+                self.error()
+                continue
+            statements.append((yield from self.statement()))
+
+        return tree.Block(statements)
+
+    def statement(self):
+        while True:
+            kind = self.types[self.position]
+
+            if kind == "NAME":
+                following = self.peek(1)
+                if following == "=":
+                    name = self.values[self.position]
+                    self.position += 2
+                    return tree.Assign(tree.NameVal(name), (yield from self.nested()))
+                elif following == ":":
+                    name = self.values[self.position]
+                    self.position += 2
+                    type_name = self.expect("NAME")
+                    return tree.TypeDeclare(tree.NameVal(name), tree.TypeVal(type_name))
+                elif following == "TVASSIGNMENT":
+                    name = self.values[self.position]
+                    self.position += 2
+                    return tree.AssignWithType(tree.NameVal(name), (yield from self.nested()))
+                return (yield from self.expression(relation=True))
+            elif kind == "PRINT":
+                self.position += 1
+                self.expect("(")
+                statement = yield from self.nested()
+                self.expect(")")
+                return tree.Print(statement)
+            elif kind == "{":
+                self.position += 1
+                block = yield self.block()
+                self.expect("}")
+                return tree.InstructionBlock(block)
+            elif kind == "IF" or kind == "WHILE":
+                self.position += 1
+                self.expect("(")
+                condition = yield from self.nested()
+                self.expect(")")
+                block = yield self.braced_block()
+                if kind == "IF":
+                    return tree.If(condition, block)
+                return tree.While(condition, block)
+            elif kind == "FOR" or kind == "PARALLEL":
+                self.position += 1
+                if kind == "PARALLEL":
+                    self.expect("FOR")
+                self.expect("(")
+                init = yield from self.nested()
+                self.expect(";")
+                condition = yield from self.nested()
+                self.expect(";")
+                step = yield from self.nested()
+                self.expect(")")
+                return tree.For(init, condition, step, (yield self.braced_block()), kind == "PARALLEL")
+            elif kind == "FUNCTION":
+                return (yield from self.function())
+            elif kind == "COMMENT":
+                self.position += 1
+                return tree.Comment(None)
+            elif kind in PRIMARY:
+                return (yield from self.expression(relation=True))
+
+            self.error()
+
+    # A statement inside another one. It is usually a plain expression, parsed
+    # in place, and anything else goes through the trampoline.
+    def nested(self):
+        kind = self.types[self.position]
+        if kind in PRIMARY or kind == "NAME" and self.peek(1) not in ("=", ":", "TVASSIGNMENT"):
+            return self.expression(relation=True)
+        return self.deeper()
+
+    def deeper(self):
+        return (yield self.statement())
+
+    def braced_block(self):
+        self.expect("{")
+        block = yield from self.block()
+        self.expect("}")
+        return block
+
+    def function(self):
+        self.position += 1
+        name = self.expect("NAME")
+        self.expect("(")
+
+        args = None
+        if self.types[self.position] != ")":
+            arguments = [self.arg_tuple()]
+            while self.types[self.position] == ",":
+                self.position += 1
+                arguments.append(self.arg_tuple())
+            args = tree.Args(arguments)
+
+        self.expect(")")
+        self.expect("=")
+        return tree.Function(tree.NameVal(name), args, (yield self.braced_block()))
+
+    def arg_tuple(self):
+        name = self.expect("NAME")
+        self.expect(":")
+        type_name = self.expect("NAME")
+        return (tree.NameVal(name), tree.TypeVal(type_name))
+
+    # Precedence climbing with the operators that wait for their right operand
+    # on a list, so a chain of any length takes one production. Plain literals
+    # and names are read in place. With relation, a comparison of two such
+    # expressions is read too.
+    def expression(self, relation=False):
+        types = self.types
+        operands, operators = [], []
+        comparison = None
+        while True:
+            kind = types[self.position]
+            if kind in ATOMS and (kind != "NAME" or types[self.position + 1] != "("):
+                operands.append(ATOMS[kind](self.values[self.position]))
+                self.position += 1
+            else:
+                operands.append((yield self.primary()))
+
+            operator = types[self.position]
+            precedence = BINARY_PRECEDENCE.get(operator)
+            while operators:
+                waiting = BINARY_PRECEDENCE[operators[-1]]
+                if precedence is not None and (
+                    waiting < precedence or waiting == precedence and operator in RIGHT_ASSOCIATIVE
+                ):
+                    break
+                right = operands.pop()
+                operands[-1] = tree.Operator(operators.pop(), operands[-1], right)
+
+            if precedence is not None:
+                operators.append(operator)
+                self.position += 1
+            elif relation and comparison is None and operator == "RELATION":
+                comparison = self.values[self.position]
+                self.position += 1
+            elif comparison is not None:
+                return tree.Relation(comparison, operands[0], operands[1])
+            else:
+                return operands[0]
+
+    def primary(self):
+        while True:
+            kind = self.types[self.position]
+            value = self.values[self.position]
+
+            if kind == "INTEGER":
+                self.position += 1
+                return tree.IntVal(value)
+            elif kind == "NAME":
+                self.position += 1
+                if self.types[self.position] == "(":
+                    return (yield from self.call(value))
+                return tree.KeyVal(value)
+            elif kind == "FLOAT":
+                self.position += 1
+                return tree.FloatVal(value)
+            elif kind == "STRING":
+                self.position += 1
+                return tree.StringVal(value)
+            elif kind == "BOOL":
+                self.position += 1
+                return tree.BoolVal(value)
+            elif kind == "PI":
+                self.position += 1
+                return tree.Pi()
+            elif kind == "MATH_FUNCTION":
+                self.position += 1
+                self.expect("(")
+                argument = yield from self.expression()
+                self.expect(")")
+                return tree.MathFunction(value, argument)
+            elif kind == "CAST":
+                self.position += 1
+                self.expect("(")
+                statement = yield from self.nested()
+                self.expect(",")
+                type_name = self.expect("NAME")
+                self.expect(")")
+                return tree.Cast(statement, tree.TypeVal(type_name))
+
+            self.error()
+
+    def call(self, name):
+        self.position += 1
+        if self.types[self.position] == ")":
+            self.position += 1
+            return tree.Call(tree.NameVal(name), None)
+
+        arguments = [(yield from self.expression())]
+        while self.types[self.position] == ",":
+            self.position += 1
+            arguments.append((yield from self.expression()))
+        self.expect(")")
+
+        return tree.Call(tree.NameVal(name), tree.ArgsVal(arguments))
+
+
+PRIMARY = {"INTEGER", "FLOAT", "STRING", "BOOL", "PI", "MATH_FUNCTION", "CAST"}
+
+
+def parse(tokens, report=True):
+    parser = Parser(tokens, report)
+    try:
+        return tree.trampoline(parser.program())
+    except UnexpectedEnd:
+        return None
@@ -0,0 +1,104 @@
+import sys
+
+import optimizer
+import output
+
+from inference import Environment
+from lexer import tokenize
+from ply_parser import build, draw, execute, print_tokens
+from stats import phase
+
+
+PROMPT = "> "
+
+CONTINUATION = ". "
+
+
+# Every entry is compiled on its own with the passes a file gets, against an
+# environment refreshed from the live function table and global scope, so the
+# passes see the functions earlier entries defined and keep anything later
+# entries may use.
+class Session:
+    def __init__(self, front_end="ply", stats=None, verbose=False, show_tree=False, echo=False):
+        super().__init__()
+
+        self.front_end = front_end
+        self.stats = stats
+        self.verbose = verbose
+        self.show_tree = show_tree
+        self.echo = echo
+        self.pending = []
+        self.depth = 0
+        self.environment = Environment()
+
+    def compile(self, tokens):
+        stats = self.stats
+        if stats is not None:
+            stats.tokens += len(tokens)
+
+        if self.verbose:
+            print_tokens(tokens)
+
+        with phase(stats, "parse"):
+            ast = build(tokens, self.front_end)
+
+        if ast is None:
+            return None
+
+        with phase(stats, "optimize"):
+            self.environment.refresh()
+            ast = optimizer.optimize(ast, stats, self.environment)
+
+        return ast
+
+    def run(self, tokens):
+        ast = self.compile(tokens)
+        if ast is None:
+            return None
+
+        value = execute(ast, self.stats)
+        if self.echo and value is not None:
+            output.write(value)
+            output.flush()
+        if self.show_tree:
+            draw(ast, False, self.stats)
+
+        return value
+
+    # Lines are collected until every brace is closed, so a function or loop
+    # can be typed over several lines. Returns True while more input is needed.
+    def feed(self, line):
+        with phase(self.stats, "tokenize"):
+            tokens = tokenize(line)
+
+        self.depth += tokens.types.count("{") - tokens.types.count("}")
+        if self.depth > 0:
+            self.pending.append(line)
+            return True
+
+        if self.pending:
+            self.pending.append(line)
+            with phase(self.stats, "tokenize"):
+                tokens = tokenize("\n".join(self.pending))
+            self.pending = []
+
+        self.depth = 0
+        self.run(tokens)
+        return False
+
+
+def loop(session):
+    prompt = PROMPT
+    while True:
+        try:
+            line = input(prompt)
+        except EOFError:
+            break
+        if not line and prompt == PROMPT:
+            continue
+
+        prompt = CONTINUATION if session.feed(line) else PROMPT
+
+
+def start(front_end="ply", stats=None, verbose=False, show_tree=False):
+    loop(Session(front_end, stats, verbose, show_tree, echo=sys.stdin.isatty()))
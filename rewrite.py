@@ -0,0 +1,275 @@
+import hashcons
+import tree
+
+from inference import NUMERIC, Types
+from utils import convert_to, determine_type, valid_type
+
+
+# A pattern is a variable name, a number standing for a literal of the rule's
+# type, ("-", p) for unary minus or (operator, left, right). Replacements use
+# the same shapes plus ("static_cast", p, type_name).
+RULES = [
+    ("add zero", ("int",), ("+", "x", 0), "x"),
+    ("add zero", ("int",), ("+", 0, "x"), "x"),
+    ("subtract zero", NUMERIC, ("-", "x", 0), "x"),
+    ("subtract self", ("int",), ("-", "x", "x"), 0),
+    ("subtract from zero", ("int",), ("-", 0, "x"), ("-", "x")),
+    ("multiply by one", NUMERIC, ("*", "x", 1), "x"),
+    ("multiply by one", NUMERIC, ("*", 1, "x"), "x"),
+    ("multiply by zero", ("int",), ("*", "x", 0), 0),
+    ("multiply by zero", ("int",), ("*", 0, "x"), 0),
+    ("multiply by two", NUMERIC, ("*", "x", 2), ("+", "x", "x")),
+    ("multiply by two", NUMERIC, ("*", 2, "x"), ("+", "x", "x")),
+    ("divide by one", ("float",), ("/", "x", 1), "x"),
+    ("divide by one", ("int",), ("/", "x", 1), ("static_cast", "x", "float")),
+    ("divide by two", ("float",), ("/", "x", 2), ("*", "x", 0.5)),
+    ("power zero", NUMERIC, ("^", "x", 0), 1),
+    ("power one", NUMERIC, ("^", "x", 1), "x"),
+    ("power two", ("float",), ("^", "x", 2), ("*", "x", "x")),
+    ("one to power", NUMERIC, ("^", 1, "x"), 1),
+]
+
+OPERATORS = "+-*/^"
+
+PURE = (
+    tree.IntVal,
+    tree.FloatVal,
+    tree.StringVal,
+    tree.BoolVal,
+    tree.Pi,
+    tree.KeyVal,
+    tree.Operator,
+    tree.UMinus,
+    tree.Relation,
+    tree.Cast,
+    tree.MathFunction,
+    tree.TypeVal,
+)
+
+LITERALS = (tree.IntVal, tree.FloatVal, tree.StringVal, tree.BoolVal, tree.Pi)
+
+
+def literal(value):
+    if type(value) is bool:
+        return tree.BoolVal("true" if value else "false")
+    elif type(value) is int:
+        return tree.IntVal(value)
+    elif type(value) is float:
+        return tree.FloatVal(value)
+    elif type(value) is str:
+        return tree.StringVal(f'"{value}"')
+    return None
+
+
+def pure(node):
+    return all(type(child) in PURE for child in tree.walk(node))
+
+
+def equal(left, right):
+    pairs = [(left, right)]
+    while pairs:
+        left, right = pairs.pop()
+        if left is right:
+            continue
+        if type(left) is not type(right):
+            return False
+        if type(left) in LITERALS:
+            if left.serve() != right.serve():
+                return False
+            continue
+        for name in type(left).__slots__:
+            if name in left.fields:
+                continue
+            if getattr(left, name, None) != getattr(right, name, None):
+                return False
+
+        left_children = list(left.children())
+        right_children = list(right.children())
+        if len(left_children) != len(right_children):
+            return False
+        pairs.extend(zip(left_children, right_children))
+
+    return True
+
+
+def occurrences(pattern, name):
+    if type(pattern) is str:
+        return 1 if pattern == name else 0
+    if type(pattern) is tuple:
+        return sum(occurrences(part, name) for part in pattern[1:])
+    return 0
+
+
+def fold(node):
+    kind = type(node)
+    try:
+        if kind is tree.Operator:
+            left, right = node.left_part, node.right_part
+            if type(left) not in LITERALS or type(right) not in LITERALS:
+                return None
+            if determine_type(left.serve()) != determine_type(right.serve()):
+                return None
+            if determine_type(left.serve()) == "string" and node.operator != "+":
+                return None
+            if node.operator not in OPERATORS:
+                return None
+            return literal(node.serve())
+        elif kind is tree.Relation:
+            left, right = node.left, node.right
+            if type(left) not in LITERALS or type(right) not in LITERALS:
+                return None
+            if determine_type(left.serve()) != determine_type(right.serve()):
+                return None
+            return literal(node.serve())
+        elif kind is tree.UMinus:
+            if type(node.statement) in LITERALS and determine_type(node.statement.serve()) in NUMERIC:
+                return literal(node.serve())
+        elif kind is tree.MathFunction:
+            if type(node.value) in LITERALS and determine_type(node.value.serve()) in NUMERIC:
+                return literal(node.serve())
+        elif kind is tree.Cast:
+            if type(node.value) in LITERALS and valid_type(node.type_name.type_name):
+                return literal(convert_to(node.value.serve(), node.type_name.type_name))
+    except (ArithmeticError, ValueError):
+        return None
+
+    return None
+
+
+class Rewriter:
+    def __init__(self, program, rules=RULES, environment=None):
+        super().__init__()
+
+        self.types = Types(program, environment)
+        self.interner = hashcons.Interner()
+        self.simplified = {}
+        self.rules = {}
+        for rule in rules:
+            operator = rule[2][0]
+            self.rules.setdefault((operator, len(rule[2])), []).append(rule)
+        self.applied = {}
+        self.loops = 0
+
+    def count(self, name):
+        self.applied[name] = self.applied.get(name, 0) + 1
+
+    def match(self, pattern, node, type_name, bindings):
+        if type(pattern) is str:
+            if pattern in bindings:
+                return equal(bindings[pattern], node)
+            bindings[pattern] = node
+            return True
+        elif type(pattern) is not tuple:
+            expected = tree.IntVal if type_name == "int" else tree.FloatVal
+            return type(node) is expected and node.serve() == pattern
+        elif len(pattern) == 2:
+            return type(node) is tree.UMinus and self.match(pattern[1], node.statement, type_name, bindings)
+
+        operator, left, right = pattern
+        return (
+            type(node) is tree.Operator
+            and node.operator == operator
+            and self.match(left, node.left_part, type_name, bindings)
+            and self.match(right, node.right_part, type_name, bindings)
+        )
+
+    def build(self, replacement, type_name, bindings):
+        if type(replacement) is str:
+            return bindings[replacement]
+        elif type(replacement) is not tuple:
+            return literal(int(replacement) if type_name == "int" else float(replacement))
+        elif len(replacement) == 2:
+            return tree.UMinus(self.build(replacement[1], type_name, bindings))
+        elif replacement[0] == "static_cast":
+            return tree.Cast(self.build(replacement[1], type_name, bindings), tree.TypeVal(replacement[2]))
+
+        operator, left, right = replacement
+        return tree.Operator(
+            operator,
+            self.build(left, type_name, bindings),
+            self.build(right, type_name, bindings),
+        )
+
+    def apply(self, node):
+        if type(node) is tree.Operator:
+            key = (node.operator, 3)
+        elif type(node) is tree.UMinus:
+            key = ("-", 2)
+        else:
+            return None
+
+        for name, types, pattern, replacement in self.rules.get(key, ()):
+            for type_name in types:
+                bindings = {}
+                if not self.match(pattern, node, type_name, bindings):
+                    continue
+                if any(self.types.static_type(bound) != type_name for bound in bindings.values()):
+                    continue
+                if any(
+                    occurrences(pattern, variable) != occurrences(replacement, variable) and not pure(bound)
+                    for variable, bound in bindings.items()
+                ):
+                    continue
+
+                self.count(name)
+                return self.build(replacement, type_name, bindings)
+
+        return None
+
+    # Only the right side of an accumulator update in a parallel loop is
+    # simplified, so parallel.Checker still finds acc = acc + e or acc = acc * e
+    # where acc * 2 would have become acc + acc.
+    def reduction(self, node):
+        value = node.value
+        right = yield self.simplify(value.right_part)
+        if right is not value.right_part:
+            node.value = self.interner.intern(tree.Operator(value.operator, value.left_part, right))
+        return node
+
+    # A generator for tree.trampoline, so nesting depth is not limited by the
+    # recursion limit.
+    def simplify(self, node):
+        if node in self.simplified:
+            return self.simplified[node]
+
+        kind = type(node)
+        if kind is tree.For and node.parallel:
+            self.loops += 1
+            try:
+                return (yield from self.interner.rebuild(node, self.simplify))
+            finally:
+                self.loops -= 1
+        elif (
+            self.loops
+            and kind is tree.Assign
+            and type(node.value) is tree.Operator
+            and node.value.operator in ("+", "*")
+            and type(node.value.left_part) is tree.KeyVal
+            and node.value.left_part.key == node.name.name
+        ):
+            return (yield from self.reduction(node))
+
+        result = yield from self.interner.rebuild(node, self.simplify)
+        while True:
+            folded = fold(result)
+            if folded is not None:
+                self.count("constant folding")
+                result = self.interner.intern(folded)
+                break
+
+            rewritten = self.apply(result)
+            if rewritten is None:
+                break
+
+            result = yield from self.interner.rebuild(rewritten, self.simplify)
+
+        if type(node) in hashcons.SHARED:
+            self.simplified[node] = result
+            self.simplified[result] = result
+        return result
+
+
+def rewrite(program, rules=RULES, environment=None):
+    rewriter = Rewriter(program, rules, environment)
+    tree.trampoline(rewriter.simplify(program))
+    return rewriter.applied
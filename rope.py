@@ -0,0 +1,54 @@
+THRESHOLD = 1024
+
+
+# A rope is a view of the first count parts of a list that other ropes may
+# share. Appending to the newest view extends the list in place; an older view
+# copies its prefix first, so values already stored elsewhere never change.
+class Rope:
+    __slots__ = ("parts", "count", "length", "flat")
+
+    def __init__(self, parts, count, length):
+        super().__init__()
+
+        self.parts = parts
+        self.count = count
+        self.length = length
+        self.flat = None
+
+    def append(self, value):
+        parts = self.parts
+        if len(parts) != self.count:
+            parts = parts[: self.count]
+        parts.append(value)
+
+        return Rope(parts, self.count + 1, self.length + len(value))
+
+    def flatten(self):
+        if self.flat is None:
+            parts = self.parts if len(self.parts) == self.count else self.parts[: self.count]
+            self.flat = "".join(parts)
+
+        return self.flat
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return self.flatten()
+
+
+def flatten(value):
+    if type(value) is Rope:
+        return value.flatten()
+    return value
+
+
+def concat(left, right):
+    if type(right) is Rope:
+        right = right.flatten()
+    if type(left) is Rope:
+        return left.append(right)
+    if len(left) + len(right) < THRESHOLD:
+        return left + right
+
+    return Rope([left, right], 2, len(left) + len(right))
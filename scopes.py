@@ -1,3 +1,5 @@
+import output
+from rope import Rope
 from utils import determine_type, valid_type, not_keyword_or_type, Variable
 
 
@@ -58,15 +60,16 @@ class Scope:
         self.names[v_name] = Variable(v_type, v_value)
 
     def assign(self, v_name, v_value):
-        if v_name not in self.names:
+        variable = self.names.get(v_name)
+        if variable is None:
             return False
 
-        if self.names[v_name].type != determine_type(v_value):
+        if variable.type != determine_type(v_value):
             raise VariableTypeError(
-                f"value {v_value} and type {self.names[v_name][0]} missmatch"
+                f"value {v_value} and type {variable.type} missmatch"
             )
 
-        self.names[v_name] = Variable(self.names[v_name].type, v_value)
+        variable.value = v_value
 
         return True
 
@@ -79,20 +82,40 @@ class Scopes:
         super().__init__()
 
         self.scopes_list = []
+        self.free = []
+        self.created = 0
         self.add_scope()  # global scope
 
+    # Removed scopes are emptied and kept for reuse instead of building a new
+    # Scope and dict for every block entered.
     def add_scope(self):
-        self.scopes_list.append(Scope())
+        self.created += 1
+        if self.free:
+            self.scopes_list.append(self.free.pop())
+        else:
+            self.scopes_list.append(Scope())
 
     def remove_scope(self):
-        self.scopes_list.pop()
+        scope = self.scopes_list.pop()
+        scope.names.clear()
+        self.free.append(scope)
+
+    # Opens a call scope with arguments whose names and types were checked when
+    # the function was defined, so nothing is left to report.
+    def bind(self, layout, values):
+        self.add_scope()
+        names = self.scopes_list[-1].names
+        for (v_name, v_type, convert), v_value in zip(layout, values):
+            if type(v_value) is Rope:
+                v_value = v_value.flatten()
+            names[v_name] = Variable(v_type, convert(v_value))
 
     def declare(self, v_name, v_type):
         top = len(self.scopes_list) - 1
         try:
             res = self.scopes_list[top].declare(v_name, v_type)
         except (AlreadyExist, VariableTypeError) as e:
-            print(e.message)
+            output.write(e.message)
         except KeywordName:
             pass
 
@@ -103,7 +126,7 @@ class Scopes:
         try:
             res = self.scopes_list[top].define(v_name, v_value)
         except (AlreadyExist, VariableTypeError) as e:
-            print(e.message)
+            output.write(e.message)
         except KeywordName:
             pass
 
@@ -115,10 +138,10 @@ class Scopes:
                 if scope.assign(v_name, v_value):
                     return None
             except VariableTypeError as e:
-                print(e.message)
+                output.write(e.message)
                 return None
 
-        print(f"{v_name} not decleared.")
+        output.write(f"{v_name} not decleared.")
 
         return None
 
@@ -128,7 +151,7 @@ class Scopes:
             if res is not None:
                 return res.value
 
-        print(f"{v_name} not decleared.")
+        output.write(f"{v_name} not decleared.")
 
         return None
 
@@ -0,0 +1,289 @@
+import contextlib
+import http.server
+import io
+import json
+import multiprocessing
+import queue
+import resource
+import time
+from collections import OrderedDict
+
+import output
+import ply_parser
+import tree
+
+from lexer import tokenize
+from stats import Stats
+
+
+WORKERS = 4
+
+CACHE_SIZE = 64
+
+TIMEOUT = 5.0
+
+MAX_TIMEOUT = 30.0
+
+MAX_OUTPUT = 10000
+
+MEMORY = 1024
+
+MAX_MEMORY = 4096
+
+WAIT = 10.0
+
+
+# Keeps the first limit lines of program output and drops the rest.
+class Capped(output.Output):
+    def __init__(self, limit):
+        super().__init__([], "size")
+
+        self.limit = limit
+        self.lines = 0
+        self.truncated = False
+
+    def write(self, value):
+        if self.lines >= self.limit:
+            self.truncated = True
+            return
+
+        self.lines += 1
+        super().write(value)
+
+
+def compile_job(job, cache, stats):
+    if job["path"] is not None:
+        with open(job["path"], "r") as f:
+            content = f.read()
+    else:
+        content = job["source"]
+
+    key = (job["parser"], content)
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key], True
+
+    ast = ply_parser.compile_program(content, False, stats, job["parser"])
+    if ast is not None:
+        cache[key] = ast
+        if len(cache) > job["cache_size"]:
+            cache.popitem(last=False)
+
+    return ast, False
+
+
+# Runs one job in a worker with a fresh interpreter state. Diagnostics the front
+# ends print go to errors; program output is capped at max_output lines.
+def execute(job, cache):
+    stats = Stats()
+    errors = io.StringIO()
+    sink = Capped(job["max_output"])
+    status, cached = "ok", False
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    memory = job["memory"] << 20
+    if hard != resource.RLIM_INFINITY:
+        memory = min(memory, hard)
+
+    previous = output.set_sink(sink)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, hard))
+        with contextlib.redirect_stdout(errors):
+            ast, cached = compile_job(job, cache, stats)
+            if ast is None:
+                status = "syntax error"
+            else:
+                tree.reset()
+                ply_parser.execute(ast, stats)
+    except MemoryError:
+        status = "memory"
+    except Exception as e:
+        status = "error"
+        errors.write(f"{type(e).__name__}: {e}\n")
+    finally:
+        output.set_sink(previous)
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+    return {
+        "status": status,
+        "output": sink.target,
+        "truncated": sink.truncated,
+        "errors": errors.getvalue().splitlines(),
+        "cached": cached,
+        "timings": stats.as_dict(),
+    }
+
+
+def work(connection):
+    cache = OrderedDict()
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            return
+
+        connection.send(execute(job, cache))
+
+
+# Workers are forked after the parser tables are built, so each starts warm.
+# A worker that times out, runs out of memory or dies is replaced. A job that
+# finds no idle worker within wait seconds is turned away as busy.
+class Pool:
+    def __init__(self, size, wait=WAIT):
+        super().__init__()
+
+        ply_parser.build(tokenize("warm := 0"), "ply")
+
+        self.context = multiprocessing.get_context("fork")
+        self.size = size
+        self.wait = wait
+        self.idle = queue.Queue()
+        for _ in range(size):
+            self.idle.put(self.spawn())
+
+    def spawn(self):
+        connection, child = self.context.Pipe()
+        process = self.context.Process(target=work, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        return process, connection
+
+    def replace(self, worker):
+        process, connection = worker
+        process.kill()
+        process.join()
+        connection.close()
+        return self.spawn()
+
+    def run(self, job, timeout):
+        try:
+            worker = self.idle.get(timeout=self.wait)
+        except queue.Empty:
+            return {"status": "busy"}
+
+        try:
+            process, connection = worker
+            connection.send(job)
+            if not connection.poll(timeout):
+                worker = self.replace(worker)
+                return {"status": "timeout"}
+
+            result = connection.recv()
+            if result["status"] == "memory":
+                worker = self.replace(worker)
+            return result
+        except (EOFError, OSError):
+            worker = self.replace(worker)
+            return {"status": "crashed"}
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        for _ in range(self.size):
+            process, connection = self.idle.get()
+            process.kill()
+            process.join()
+            connection.close()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.reply(200, {"status": "ok", "workers": self.server.pool.size})
+        else:
+            self.reply(404, {"status": "not found"})
+
+    def do_POST(self):
+        if self.path != "/run":
+            self.reply(404, {"status": "not found"})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            self.reply(400, {"status": "bad request", "errors": ["Body is not valid JSON."]})
+            return
+
+        if not isinstance(request, dict) or ("source" in request) == ("path" in request):
+            self.reply(400, {"status": "bad request", "errors": ["Expected exactly one of source or path."]})
+            return
+
+        parser = request.get("parser", "ply")
+        if parser not in ply_parser.FRONT_ENDS:
+            self.reply(400, {"status": "bad request", "errors": [f"Unknown parser {parser}."]})
+            return
+
+        try:
+            job = {
+                "source": request.get("source"),
+                "path": request.get("path"),
+                "parser": parser,
+                "max_output": int(request.get("max_output", MAX_OUTPUT)),
+                "memory": int(request.get("memory", MEMORY)),
+                "cache_size": self.server.cache_size,
+            }
+            timeout = float(request.get("timeout", TIMEOUT))
+        except (TypeError, ValueError):
+            self.reply(400, {"status": "bad request", "errors": ["Limits must be numbers."]})
+            return
+
+        if not job["memory"] > 0 or not timeout > 0:
+            self.reply(400, {"status": "bad request", "errors": ["Memory and timeout must be positive."]})
+            return
+        job["memory"] = min(job["memory"], self.server.max_memory)
+        timeout = min(timeout, self.server.max_timeout)
+
+        start = time.perf_counter()
+        result = self.server.pool.run(job, timeout)
+        result["elapsed"] = time.perf_counter() - start
+        self.reply(503 if result["status"] == "busy" else 200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Requests may lower the memory and timeout limits but not raise them past
+# max_memory megabytes and max_timeout seconds.
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        workers=WORKERS,
+        cache_size=CACHE_SIZE,
+        max_memory=MAX_MEMORY,
+        max_timeout=MAX_TIMEOUT,
+        wait=WAIT,
+    ):
+        super().__init__(address, Handler)
+
+        self.pool = Pool(workers, wait)
+        self.cache_size = cache_size
+        self.max_memory = max_memory
+        self.max_timeout = max_timeout
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+
+
+def serve(port, workers=WORKERS, cache_size=CACHE_SIZE):
+    server = Server(("127.0.0.1", port), workers, cache_size)
+    print(f"Serving on http://127.0.0.1:{server.server_address[1]} with {workers} workers.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
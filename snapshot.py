@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+
+import astfile
+import codegen
+import output
+import repl
+import tree
+
+from lexer import tokenize
+from ply_parser import execute
+from rope import Rope
+from stats import phase
+from utils import Variable
+
+
+MAGIC = b"MWSS"
+
+VERSION = 2
+
+HEADER = struct.Struct("<4sI")
+
+# What reading a snapshot whose payload does not match its metadata can raise.
+DAMAGE = (struct.error, IndexError, KeyError, TypeError, ValueError)
+
+
+def version():
+    return f"{VERSION}/{astfile.SCHEMA}/{sys.implementation.cache_tag}"
+
+
+def digest(content, front_end):
+    return hashlib.sha256(f"{front_end}\0{content}".encode("utf-8")).hexdigest()
+
+
+def value_of(variable):
+    if type(variable.value) is Rope:
+        return variable.value.flatten()
+    return variable.value
+
+
+# The function table and every scope frame, plus whatever the prelude printed
+# so a restored run prints the same, and the declarations the session's
+# environment found in each function. Function bodies are stored as one binary
+# AST, so shared subtrees stay shared, and its hash goes in the metadata.
+# Generated code cannot be stored; functions that had tiered up are compiled
+# again on restore.
+def take(prelude, lines, environment):
+    functions = list(tree.functions.values())
+    bodies = astfile.encode(tree.Block([function["block"] for function in functions]))
+    metadata = {
+        "version": version(),
+        "prelude": prelude,
+        "payload": hashlib.sha256(bodies).hexdigest(),
+        "functions": [
+            {
+                "name": function["name"],
+                "args": function["args"],
+                "scoped": function["scoped"],
+                "calls": function["calls"],
+                "compiled": None if function["compiled"] is None else bool(function["compiled"]),
+            }
+            for function in functions
+        ],
+        "scopes": [
+            [[name, variable.type, value_of(variable)] for name, variable in scope.names.items()]
+            for scope in tree.scopes.scopes_list
+        ],
+        "declarations": environment.declarations(),
+        "output": lines,
+    }
+
+    header = json.dumps(metadata).encode("utf-8")
+    return HEADER.pack(MAGIC, len(header)) + header + bodies
+
+
+def save(path, prelude, lines, environment):
+    data = take(prelude, lines, environment)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+# The payload is checked against its hash and decoded in full before anything
+# is installed, so a damaged snapshot fails here and leaves no partial state.
+def read(path, prelude):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise astfile.FormatError("Not a snapshot file.")
+
+    magic, length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise astfile.FormatError("Not a snapshot file.")
+
+    try:
+        metadata = json.loads(data[HEADER.size : HEADER.size + length])
+        if metadata["version"] != version():
+            raise astfile.FormatError("Snapshot was written by a different interpreter version.")
+        if metadata["prelude"] != prelude:
+            raise astfile.FormatError("Snapshot was taken from a different prelude.")
+
+        payload = data[HEADER.size + length :]
+        if hashlib.sha256(payload).hexdigest() != metadata["payload"]:
+            raise astfile.FormatError("Snapshot is damaged.")
+        blocks = astfile.decode(payload, eager=True).statements
+    except DAMAGE:
+        raise astfile.FormatError("Snapshot is damaged.")
+
+    if len(blocks) != len(metadata["functions"]):
+        raise astfile.FormatError("Snapshot is damaged.")
+
+    return metadata, blocks
+
+
+def restore(path, prelude, environment):
+    metadata, blocks = read(path, prelude)
+
+    for entry, block in zip(metadata["functions"], blocks):
+        function = dict(entry, block=block)
+        if function["args"] is not None:
+            function["args"] = [tuple(argument) for argument in function["args"]]
+        if function["compiled"]:
+            try:
+                function["compiled"] = codegen.compile_function(block, function["name"])
+            except (SyntaxError, RecursionError, MemoryError, ValueError):
+                function["compiled"] = False
+        tree.define(function)
+
+    scopes = tree.scopes
+    while len(scopes.scopes_list) < len(metadata["scopes"]):
+        scopes.add_scope()
+    for scope, names in zip(scopes.scopes_list, metadata["scopes"]):
+        for name, v_type, value in names:
+            scope.names[name] = Variable(v_type, value)
+    environment.load(metadata["declarations"])
+
+    for line in metadata["output"]:
+        output.write(line)
+
+
+# Restores the prelude state from the snapshot when it was taken from the same
+# prelude by the same interpreter, and otherwise runs the prelude and writes a
+# new snapshot. Returns False when the prelude does not compile.
+def prepare(session, path, snapshot_path=None):
+    with open(path, "r") as f:
+        content = f.read()
+
+    prelude = digest(content, session.front_end)
+    if snapshot_path is not None and os.path.exists(snapshot_path):
+        try:
+            with phase(session.stats, "restore"):
+                restore(snapshot_path, prelude, session.environment)
+            output.flush()
+            return True
+        except astfile.FormatError:
+            tree.reset()
+
+    with phase(session.stats, "tokenize"):
+        tokens = tokenize(content)
+    ast = session.compile(tokens)
+    if ast is None:
+        return False
+
+    with output.capture() as lines:
+        execute(ast, session.stats)
+    for line in lines:
+        output.write(line)
+    output.flush()
+
+    if snapshot_path is not None:
+        with phase(session.stats, "snapshot"):
+            session.environment.refresh()
+            save(snapshot_path, prelude, lines, session.environment)
+
+    return True
+
+
+# The prelude and the program are compiled as separate entries against the same
+# state, the way the interactive mode compiles each line.
+def start(prelude_path, snapshot_path=None, path=None, front_end="ply", stats=None, verbose=False):
+    session = repl.Session(front_end, stats, verbose)
+    if not prepare(session, prelude_path, snapshot_path):
+        return
+
+    if path is None:
+        session.echo = sys.stdin.isatty()
+        repl.loop(session)
+        return
+
+    with open(path, "r") as f:
+        content = f.read()
+
+    with phase(stats, "tokenize"):
+        tokens = tokenize(content)
+    session.run(tokens)
@@ -0,0 +1,167 @@
+import copy
+from functools import partial
+
+import hashcons
+import tree
+
+from liveness import local_nodes
+from rewrite import LITERALS, Rewriter, literal
+from unroll import Unroller
+from utils import convert_to, valid_type
+
+
+VARIANTS = 4
+
+
+def configure(variants):
+    global VARIANTS
+    VARIANTS = variants
+
+
+def signature(function):
+    if function.args is None:
+        return None
+
+    names = [argument[0].name for argument in function.args.arguments]
+    types = [argument[1].type_name for argument in function.args.arguments]
+    if len(set(names)) != len(names) or not all(valid_type(type_name) for type_name in types):
+        return None
+    return list(zip(names, types))
+
+
+# Bodies of functions that are defined once are copied for each set of literal
+# arguments seen at a call site, with the parameters replaced by the converted
+# constants, then folded and unrolled. The parameters are still bound when the
+# variant runs, since with dynamic scoping anything the body calls may read
+# them. Call sites with the same constants share one variant.
+class Specializer:
+    def __init__(self, environment=None):
+        super().__init__()
+
+        self.environment = environment
+        self.unroller = None
+        self.rewriter = None
+        self.interner = hashcons.Interner()
+        self.variants = {}
+        self.counts = {}
+
+    def count(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    # A parameter keeps its constant only if nothing in the body can assign or
+    # shadow it, including functions the body calls.
+    def fixed(self, body, name):
+        mentions = self.unroller.liveness.function_mentions
+        for node in local_nodes(body):
+            kind = type(node)
+            if kind in (tree.Assign, tree.AssignWithType, tree.TypeDeclare) and node.name.name == name:
+                return False
+            elif kind is tree.Call and name in mentions.get(node.name.name, ()):
+                return False
+
+        return True
+
+    def constants(self, function, call):
+        parameters = signature(function)
+        if parameters is None or type(call.args) is not tree.ArgsVal:
+            return None
+        if len(call.args.arguments) != len(parameters):
+            return None
+
+        constants = {}
+        for (name, type_name), argument in zip(parameters, call.args.arguments):
+            if type(argument) not in LITERALS or not self.fixed(function.block, name):
+                continue
+            try:
+                constants[name] = convert_to(argument.serve(), type_name)
+            except (ArithmeticError, ValueError):
+                continue
+
+        return constants or None
+
+    def substitute(self, constants, node):
+        kind = type(node)
+        if kind is tree.KeyVal and node.key in constants:
+            return self.interner.intern(literal(constants[node.key]))
+        elif kind is tree.Function:
+            return node
+        elif kind in hashcons.SHARED:
+            return (yield from self.interner.rebuild(node, partial(self.substitute, constants)))
+
+        node = copy.copy(node)
+        yield from node.map_nested(partial(self.substitute, constants))
+        return node
+
+    # A branch on a folded condition either always runs its action, in its own
+    # scope when it declares something, which is what UnrolledFor does with a
+    # block, or is an empty statement.
+    def prune(self, node):
+        if type(node) in hashcons.SHARED:
+            return node
+
+        yield from node.map_nested(self.prune)
+        if type(node) is tree.If and type(node.condition) is tree.BoolVal:
+            self.count("pruned branches")
+            if not node.condition.value:
+                return tree.Block([])
+            return tree.UnrolledFor(node.action) if tree.declares(node) else node.action
+        return node
+
+    def specialize(self, function, constants):
+        block = tree.trampoline(self.substitute(constants, function.block))
+        tree.trampoline(self.rewriter.simplify(block))
+        block = tree.trampoline(self.prune(block))
+        block = tree.trampoline(self.unroller.visit(block))
+        tree.trampoline(self.rewriter.simplify(block))
+
+        key = ", ".join(f"{name}={value!r}" for name, value in constants.items())
+        return {
+            "name": f"{function.name.name}[{key}]",
+            "args": signature(function),
+            "block": block,
+            "origin": function.block,
+            "calls": 0,
+            "compiled": None,
+        }
+
+    def variant(self, function, call):
+        constants = self.constants(function, call)
+        if constants is None:
+            return None
+
+        key = (function, tuple(sorted(constants.items())))
+        if key not in self.variants:
+            if sum(1 for known, _ in self.variants if known is function) >= VARIANTS:
+                return None
+            self.variants[key] = self.specialize(function, constants)
+            self.count("function variants")
+
+        self.count("specialized calls")
+        return self.variants[key]
+
+    def visit(self, program):
+        calls = [node for node in tree.walk(program) if type(node) is tree.Call and node.args is not None]
+        if not calls:
+            return
+
+        self.unroller = Unroller(program, self.environment)
+        self.rewriter = Rewriter(program, environment=self.environment)
+        definitions = self.unroller.liveness.functions
+        for call in calls:
+            functions = definitions.get(call.name.name, ())
+            if len(functions) == 1:
+                call.variant = self.variant(functions[0], call)
+
+
+def specialize(program, environment=None):
+    if not VARIANTS:
+        return {}
+
+    specializer = Specializer(environment)
+    specializer.visit(program)
+    if specializer.unroller is not None:
+        for counts in (specializer.unroller.unrolled, specializer.rewriter.applied):
+            for name, count in counts.items():
+                specializer.counts[name] = specializer.counts.get(name, 0) + count
+
+    return specializer.counts
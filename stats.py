@@ -0,0 +1,99 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+def size(count):
+    return f"{count / 1024:.1f} KiB"
+
+
+class Stats:
+    def __init__(self, allocations=False):
+        super().__init__()
+
+        self.allocations = allocations
+        self.phases = {}
+        self.tokens = 0
+        self.nodes_before = 0
+        self.nodes_after = 0
+        self.unique_nodes = 0
+        self.scopes_created = 0
+        self.calls = 0
+        self.eliminated = {}
+        self.rewrites = {}
+        self.tier_ups = []
+
+    # With allocations on, tracemalloc runs from the first phase on: peak is
+    # the most a phase allocated above what was traced when it began, and
+    # retained what it left allocated at its end. Tracing slows every phase it
+    # covers, so times taken with allocations on run long.
+    @contextmanager
+    def phase(self, name):
+        if self.allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            totals = self.phases.setdefault(name, {"time": 0.0})
+            totals["time"] += elapsed
+            if self.allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                allocated = totals.setdefault("allocations", {"peak": 0, "retained": 0})
+                allocated["peak"] = max(allocated["peak"], peak - traced)
+                allocated["retained"] += current - traced
+
+    def as_dict(self):
+        return {
+            "phases": self.phases,
+            "tokens": self.tokens,
+            "nodes_before": self.nodes_before,
+            "nodes_after": self.nodes_after,
+            "unique_nodes": self.unique_nodes,
+            "scopes_created": self.scopes_created,
+            "calls": self.calls,
+            "eliminated": self.eliminated,
+            "rewrites": self.rewrites,
+            "tier_ups": self.tier_ups,
+        }
+
+    def to_json(self):
+        return json.dumps(self.as_dict())
+
+    def report(self):
+        lines = ["-------------------------TIMINGS---------------------------"]
+        for name, phase in self.phases.items():
+            line = f"{name:<12}{phase['time'] * 1000:>10.3f} ms"
+            if "allocations" in phase:
+                allocated = phase["allocations"]
+                line += f"  peak {size(allocated['peak']):>12}  retained {size(allocated['retained']):>12}"
+            lines.append(line)
+        lines.append(f"tokens        {self.tokens}")
+        lines.append(f"nodes         {self.nodes_before} -> {self.nodes_after} ({self.unique_nodes} unique)")
+        lines.append(f"scopes        {self.scopes_created}")
+        lines.append(f"calls         {self.calls}")
+        for kind, count in self.eliminated.items():
+            lines.append(f"eliminated    {count} {kind}")
+        for rule, count in self.rewrites.items():
+            lines.append(f"rewritten     {count} {rule}")
+        for event in self.tier_ups:
+            result = "tiered up" if event["compiled"] else "failed to tier up"
+            lines.append(
+                f"{result:<14}{event['kind']} {event['name']} after {event['after']}"
+                f" ({event['time'] * 1000:.3f} ms)"
+            )
+        lines.append("-----------------------------------------------------------")
+
+        return "\n".join(lines)
+
+
+def phase(stats, name):
+    if stats is None:
+        return nullcontext()
+    return stats.phase(name)
+
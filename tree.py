@@ -4,8 +4,12 @@ from enum import Enum
 import math
 import copy
 
+import codegen
+import output
+import parallel
+from rope import Rope, concat
 from scopes import Scopes
-from utils import determine_type, convert_to, valid_type, evaluate, pi, type_to_string
+from utils import determine_type, convert_to, valid_type, evaluate, pi, type_to_string, CONVERTERS, KEYWORDS, TYPES
 
 functions = {}
 
@@ -13,12 +17,11 @@ function_scopes = {}
 
 nodes_count = 0
 
-scopes = Scopes()
+calls_count = 0
 
+temporaries = {}
 
-class OptimizeMethod:
-    LEFT = 1
-    RIGHT = 2
+scopes = Scopes()
 
 
 def node_id():
@@ -28,7 +31,235 @@ def node_id():
     return id
 
 
+def reset():
+    global scopes, calls_count
+    for function in functions.values():
+        function["stale"] = True
+    functions.clear()
+    function_scopes.clear()
+    temporaries.clear()
+    scopes = Scopes()
+    calls_count = 0
+
+
+def walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(node.children())))
+
+
+# Runs a recursive pass written as generators: each one yields the generator of
+# a nested call and is sent its result back. The nesting lives on a list, so it
+# is bounded by memory instead of the Python recursion limit.
+def trampoline(generator):
+    stack = [generator]
+    value = None
+    while True:
+        try:
+            call = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+            value = stop.value
+        else:
+            stack.append(call)
+            value = None
+
+
+def relate(operator, left, right):
+    if type(left) is Rope:
+        left = left.flatten()
+    if type(right) is Rope:
+        right = right.flatten()
+
+    if type(left) != type(right):
+        output.write(f"Relation values types missmatch.")
+        return None
+
+    if operator == ">":
+        return left > right
+    elif operator == "<":
+        return left < right
+    elif operator == ">=":
+        return left >= right
+    elif operator == "<=":
+        return left <= right
+    elif operator == "==":
+        return left == right
+    elif operator == "!=":
+        return left != right
+    else:
+        return False
+
+
+def operate(operator, left_part, right_part):
+    if type(left_part) != type(right_part) and determine_type(left_part) != determine_type(right_part):
+        output.write(
+            f"Operator values types missmatch {type_to_string(left_part)}, {type_to_string(right_part)}."
+        )
+        return None
+
+    both_type = determine_type(left_part)
+
+    if operator == "+":
+        if both_type == "string":
+            return concat(left_part, right_part)
+        return left_part + right_part
+
+    if both_type == "str":
+        output.write(f"{operator} is not available for {both_type}")
+        return None
+
+    if operator == "-":
+        return left_part - right_part
+    elif operator == "*":
+        return left_part * right_part
+    elif operator == "/":
+        return left_part / right_part
+    elif operator == "^":
+        return convert_to(math.pow(left_part, right_part), both_type)
+    else:
+        output.write(f"Unsupported operator {operator}.")
+        return None
+
+
+def enter(name):
+    global calls_count
+    calls_count += 1
+
+    if name not in functions:
+        output.write(f"Function {name} not defined!")
+        return False
+    return True
+
+
+# Checks the arguments and opens the function scope with them defined.
+# Returns the function, or None when the call does not happen.
+def bind(name, args_val):
+    function = functions[name]
+
+    if function["args"] is None:
+        if args_val is not None:
+            output.write(f"Arguments count missmatch in function {name}.")
+            return None
+
+        if function["scoped"]:
+            scopes.add_scope()
+        return function
+
+    if len(args_val) != len(function["args"]):
+        output.write(f"Arguments count missmatch in function {name}.")
+        return None
+
+    scopes.add_scope()
+    for (arg_name, arg_type), arg_value in zip(function["args"], args_val):
+        scopes.define(arg_name, convert_to(arg_value, arg_type))
+
+    return function
+
+
+# Names and types of the arguments with the converter of each type, checked
+# once when the function is defined. None when binding them would report an
+# error on every call.
+def layout(args):
+    if args is None:
+        return None
+
+    result = []
+    for arg_name, arg_type in args:
+        lowered = arg_name.lower()
+        if lowered in KEYWORDS or lowered in TYPES or arg_type not in CONVERTERS:
+            return None
+        if any(arg_name == name for name, _, _ in result):
+            return None
+        result.append((arg_name, arg_type, CONVERTERS[arg_type]))
+
+    return result
+
+
+# Call sites cache the function they resolved until a function with the same
+# name is defined again, which marks the old one stale.
+def define(function):
+    previous = functions.get(function["name"])
+    if previous is not None:
+        previous["stale"] = True
+
+    function["layout"] = layout(function["args"])
+    function["stale"] = False
+    functions[function["name"]] = function
+
+
+# Whether calls with these arguments can skip the checks in bind.
+def cacheable(function, args):
+    if function["args"] is None:
+        return args is None
+    return (
+        function["layout"] is not None
+        and type(args) is ArgsVal
+        and len(args.arguments) == len(function["layout"])
+    )
+
+
+def bind_cached(function, args_val):
+    if args_val is not None:
+        scopes.bind(function["layout"], args_val)
+    elif function["scoped"]:
+        scopes.add_scope()
+
+
+def invoke(name, args_val):
+    function = bind(name, args_val)
+    if function is None:
+        return None
+
+    res = run(function)
+    if function["scoped"]:
+        scopes.remove_scope()
+
+    return res
+
+
+def run(function):
+    function["calls"] += 1
+    if function["compiled"] is None and function["calls"] == codegen.THRESHOLD:
+        codegen.tier_up_function(function)
+
+    if function["compiled"]:
+        return function["compiled"]()
+    return function["block"].serve()
+
+
+# Whether running the children of node can declare a variable in the scope it
+# opens. Statements that open their own scope, and function definitions, keep
+# their declarations out of it.
+def declares(node):
+    stack = list(node.children())
+    while stack:
+        node = stack.pop()
+        kind = type(node)
+        if kind is TypeDeclare or kind is AssignWithType:
+            return True
+        if kind not in OPENERS:
+            stack.extend(node.children())
+
+    return False
+
+
+# A block, branch or loop that declares nothing runs in the enclosing scope.
+# Decided on first use, after the optimizer passes have rewritten the tree.
+def opens(node):
+    scoped = node.scoped
+    if scoped is None:
+        scoped = node.scoped = declares(node)
+    return scoped
+
+
 class Node(ABC):
+    __slots__ = ("draw_id",)
+
     @abstractmethod
     def serve(self):
         pass
@@ -41,16 +272,74 @@ class Node(ABC):
     def draw(self):
         pass
 
+    fields = ()
+
+    def children(self):
+        for field in self.fields:
+            value = getattr(self, field)
+            if type(value) is list:
+                for item in value:
+                    if type(item) is tuple:
+                        yield from item
+                    else:
+                        yield item
+            elif value is not None:
+                yield value
+
+    def map_children(self, function):
+        for field in self.fields:
+            value = getattr(self, field)
+            if type(value) is list:
+                setattr(
+                    self,
+                    field,
+                    [
+                        tuple(function(part) for part in item) if type(item) is tuple else function(item)
+                        for item in value
+                    ],
+                )
+            elif value is not None:
+                setattr(self, field, function(value))
+
+    # map_children for a pass run by trampoline: yields the call for each child
+    # and keeps the result it is sent.
+    def map_nested(self, function):
+        for field in self.fields:
+            value = getattr(self, field)
+            if type(value) is list:
+                mapped = []
+                for item in value:
+                    if type(item) is tuple:
+                        parts = []
+                        for part in item:
+                            parts.append((yield function(part)))
+                        mapped.append(tuple(parts))
+                    else:
+                        mapped.append((yield function(item)))
+                setattr(self, field, mapped)
+            elif value is not None:
+                setattr(self, field, (yield function(value)))
+
+    @property
+    def id(self):
+        try:
+            return self.draw_id
+        except AttributeError:
+            self.draw_id = node_id()
+            return self.draw_id
+
     def __str__(self):
-        return node_id()
+        return self.id
 
 
 class Program(Node):
+    fields = ("block",)
+    __slots__ = fields
+
     def __init__(self, block):
         super().__init__()
 
         self.block = block
-        self.id = str(self)
 
     def serve(self):
         return self.block.serve()
@@ -65,12 +354,13 @@ class Program(Node):
 
 
 class Block(Node):
+    fields = ("statements",)
+    __slots__ = fields
+
     def __init__(self, statements):
         super().__init__()
 
-        self.used_symboles = set()
         self.statements = statements
-        self.id = str(self)
 
     def serve(self):
         value = None
@@ -80,37 +370,8 @@ class Block(Node):
 
         return value
 
-    def optimize(self, used_symboles=None, optimize_method=None):
-        new_statements = []
-        for statement in self.statements:
-            new_statements.append(
-                statement.optimize(self.used_symboles, OptimizeMethod.LEFT)
-            )
-
-        dead_code_free = []
-        for statement in new_statements:
-            if (
-                type(statement) == AssignWithType
-                or type(statement) == Assign
-                or type(statement) == TypeDeclare
-            ):
-                name = statement.name.serve()
-                if name not in self.used_symboles:
-                    continue
-            elif type(statement) == Function:
-                name = statement.name.serve()
-                if name not in self.used_symboles:
-                    continue
-            elif type(statement) == Comment:
-                continue
-
-            dead_code_free.append(statement)
-
-        self.statements = dead_code_free
-
-        if used_symboles is not None:
-            used_symboles.update(self.used_symboles)
-
+    def optimize(self):
+        self.statements = [statement.optimize() for statement in self.statements]
         return self
 
     def draw(self, graph, parent_id):
@@ -125,18 +386,24 @@ class Block(Node):
 
 
 class InstructionBlock(Node):
+    fields = ("block",)
+    __slots__ = fields + ("scoped",)
+
     def __init__(self, block):
         self.block = block
-
-        self.id = str(self)
+        self.scoped = None
 
     def serve(self):
+        if not opens(self):
+            self.block.serve()
+            return
+
         scopes.add_scope()
         self.block.serve()
         scopes.remove_scope()
 
-    def optimize(self, used_symboles, optimize_method):
-        self.block.optimize(used_symboles, OptimizeMethod.LEFT)
+    def optimize(self):
+        self.block.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -147,17 +414,19 @@ class InstructionBlock(Node):
 
 
 class UMinus(Node):
+    fields = ("statement",)
+    __slots__ = fields
+
     def __init__(self, statement):
         super().__init__()
 
         self.statement = statement
-        self.id = str(self)
 
     def serve(self):
         return -self.statement.serve()
 
-    def optimize(self, used_symboles, optimize_method):
-        self.statement = self.statement.optimize(used_symboles, OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.statement = self.statement.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -168,20 +437,26 @@ class UMinus(Node):
 
 
 class If(Node):
+    fields = ("condition", "action")
+    __slots__ = fields + ("scoped",)
+
     def __init__(self, condition, action):
         super().__init__()
 
         self.condition = condition
         self.action = action
-        self.id = str(self)
+        self.scoped = None
 
     def serve(self):
         condition_value = self.condition.serve()
         if type(condition_value) is not bool:
-            print(f"Condition type missmatch, got {type_to_string(condition_value)}.")
+            output.write(f"Condition type missmatch, got {type_to_string(condition_value)}.")
             return None
 
         if condition_value:
+            if not opens(self):
+                return self.action.serve()
+
             scopes.add_scope()
             value = self.action.serve()
             scopes.remove_scope()
@@ -190,9 +465,9 @@ class If(Node):
         else:
             return None
 
-    def optimize(self, used_symboles, optimize_method):
-        self.condition.optimize(used_symboles, OptimizeMethod.RIGHT)
-        self.action = self.action.optimize(used_symboles, OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.condition.optimize()
+        self.action = self.action.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -204,34 +479,49 @@ class If(Node):
 
 
 class While(Node):
+    fields = ("condition", "block")
+    __slots__ = fields + ("backedges", "compiled", "scoped")
+
     def __init__(self, condition, block):
         super().__init__()
 
         self.condition = condition
         self.block = block
-        self.id = str(self)
+        self.backedges = 0
+        self.compiled = None
+        self.scoped = None
 
     def serve(self):
+        if self.compiled:
+            return self.compiled(None, False)
+
         value = None
 
-        scopes.add_scope()
+        scoped = opens(self)
+        if scoped:
+            scopes.add_scope()
 
         condition_value = self.condition.serve()
         if type(condition_value) is not bool:
-            print(f"Invalid syntax: condition is not a bool type.")
+            output.write(f"Invalid syntax: condition is not a bool type.")
             return value
 
         while condition_value:
             value = self.block.serve()
 
+            self.backedges += 1
+            if self.backedges == codegen.THRESHOLD and codegen.tier_up_loop(self):
+                return self.compiled(value, True)
+
             condition_value = self.condition.serve()
 
-        scopes.remove_scope()
+        if scoped:
+            scopes.remove_scope()
 
         return value
 
-    def optimize(self, used_symboles=None, optimize_method=None):
-        self.block = self.block.optimize(used_symboles)
+    def optimize(self):
+        self.block = self.block.optimize()
 
         return self
 
@@ -244,43 +534,62 @@ class While(Node):
 
 
 class For(Node):
-    def __init__(self, init, condition, step, block):
+    fields = ("init", "condition", "step", "block")
+    __slots__ = fields + ("parallel", "backedges", "compiled", "scoped", "plan")
+
+    def __init__(self, init, condition, step, block, parallel=False):
         super().__init__()
 
         self.init = init
         self.condition = condition
         self.step = step
         self.block = block
-        self.id = str(self)
+        self.parallel = parallel
+        self.backedges = 0
+        self.compiled = None
+        self.scoped = None
+        self.plan = None
 
     def serve(self):
+        if self.compiled:
+            return self.compiled(None, False)
+        if self.parallel and parallel.accepts(self):
+            return parallel.run(self)
+
         value = None
 
-        scopes.add_scope()
+        scoped = opens(self)
+        if scoped:
+            scopes.add_scope()
 
         self.init.serve()
 
         condition_value = self.condition.serve()
         if type(condition_value) is not bool:
-            print(f"Invalid syntax: condition is not a bool type.")
+            output.write(f"Invalid syntax: condition is not a bool type.")
             return value
 
         while condition_value:
             self.step.serve()
             value = self.block.serve()
 
+            self.backedges += 1
+            if self.backedges == codegen.THRESHOLD and codegen.tier_up_loop(self):
+                return self.compiled(value, True)
+
             condition_value = self.condition.serve()
 
-        scopes.remove_scope()
+        if scoped:
+            scopes.remove_scope()
 
         return value
 
-    def optimize(self, used_symboles, optimize_method):
-        self.block = self.block.optimize(used_symboles)
+    def optimize(self):
+        self.block = self.block.optimize()
         return self
 
     def draw(self, graph, parent_id):
-        graph.node(self.id, "For")
+        graph.node(self.id, "Parallel for" if self.parallel else "For")
         graph.edge(parent_id, self.id)
 
         self.init.draw(graph, self.id)
@@ -289,41 +598,54 @@ class For(Node):
         self.block.draw(graph, self.id)
 
 
+class UnrolledFor(Node):
+    fields = ("block",)
+    __slots__ = fields + ("scoped",)
+
+    def __init__(self, block):
+        super().__init__()
+
+        self.block = block
+        self.scoped = None
+
+    def serve(self):
+        if not opens(self):
+            return self.block.serve()
+
+        scopes.add_scope()
+        value = self.block.serve()
+        scopes.remove_scope()
+
+        return value
+
+    def optimize(self):
+        self.block = self.block.optimize()
+        return self
+
+    def draw(self, graph, parent_id):
+        graph.node(self.id, "Unrolled for")
+        graph.edge(parent_id, self.id)
+
+        self.block.draw(graph, self.id)
+
+
 class Relation(Node):
+    fields = ("left", "right")
+    __slots__ = fields + ("operator",)
+
     def __init__(self, operator, left, right):
         super().__init__()
 
         self.operator = operator
         self.left = left
         self.right = right
-        self.id = str(self)
 
     def serve(self):
-        left = self.left.serve()
-        right = self.right.serve()
-
-        if type(left) != type(right):
-            print(f"Relation values types missmatch.")
-            return None
+        return relate(self.operator, self.left.serve(), self.right.serve())
 
-        if self.operator == ">":
-            return left > right
-        elif self.operator == "<":
-            return left < right
-        elif self.operator == ">=":
-            return left >= right
-        elif self.operator == "<=":
-            return left <= right
-        elif self.operator == "==":
-            return left == right
-        elif self.operator == "!=":
-            return left != right
-        else:
-            return False
-
-    def optimize(self, used_symboles, optimize_method):
-        self.left = self.left.optimize(used_symboles, OptimizeMethod.RIGHT)
-        self.right = self.right.optimize(used_symboles, OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.left = self.left.optimize()
+        self.right = self.right.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -337,6 +659,9 @@ class Relation(Node):
 
 
 class Operator(Node):
+    fields = ("left_part", "right_part")
+    __slots__ = fields + ("operator", "optimized")
+
     def __init__(self, operator, left_part, right_part):
         super().__init__()
 
@@ -344,127 +669,13 @@ class Operator(Node):
         self.left_part = left_part
         self.right_part = right_part
         self.optimized = None
-        self.id = str(self)
 
     def serve(self):
-        left_part = self.left_part.serve()
-        right_part = self.right_part.serve()
-
-        if type(left_part) != type(right_part):
-            print(
-                f"Operator values types missmatch {type_to_string(left_part)}, {type_to_string(right_part)}."
-            )
-            return None
-
-        both_type = determine_type(left_part)
-
-        if self.operator == "+":
-            return left_part + right_part
-
-        if both_type == "str":
-            print(f"{self.operator} is not available for {both_type}")
-            return None
-
-        if self.operator == "-":
-            return left_part - right_part
-        elif self.operator == "*":
-            return left_part * right_part
-        elif self.operator == "/":
-            return left_part / right_part
-        elif self.operator == "^":
-            return convert_to(math.pow(left_part, right_part), both_type)
-        else:
-            print(f"Unsupported operator {self.operator}.")
-            return None
-
-    def optimize(self, used_symboles, optimize_method):
-        self.left_part = self.left_part.optimize(used_symboles, OptimizeMethod.RIGHT)
-        self.right_part = self.right_part.optimize(used_symboles, OptimizeMethod.RIGHT)
-
-        if (
-            type(self.left_part) == IntVal or type(self.left_part) == FloatVal
-        ) and type(self.right_part) == KeyVal:
-            left_part = self.left_part.serve()
-
-            if self.operator == "+":
-                if left_part == 0:
-                    return self.right_part
-
-            if self.operator == "*":
-                if left_part == 0:
-                    return IntVal(0)
-                elif left_part == 1:
-                    return self.right_part
-                elif left_part == 2:
-                    return Operator("+", self.right_part, self.right_part)
-
-            if self.operator == "^":
-                if left_part == 0 or left_part == 1:
-                    return self.left_part
-
-        if type(self.left_part) == KeyVal and (
-            type(self.right_part) == IntVal or type(self.right_part) == FloatVal
-        ):
-            right_part = self.right_part.serve()
-            if self.operator == "+":
-                if right_part == 0:
-                    return self.left_part
-
-            if self.operator == "-":
-                if right_part == 0:
-                    return self.left_part
-
-            if self.operator == "*":
-                if right_part == 0:
-                    return IntVal(0)
-                elif right_part == 1:
-                    return self.left_part
-                elif right_part == 2:
-                    return Operator("+", self.left_part, self.left_part)
-
-            if self.operator == "/":
-                if right_part == 1:
-                    return self.left_part
-                elif right_part == 2:
-                    return Operator("*", self.left_part, FloatVal(0.5))
-
-            if self.operator == "^":
-                if right_part == 0:
-                    return IntVal(1)
-                elif right_part == 1:
-                    return self.left_part
-                elif right_part == 2:
-                    return Operator("*", self.left_part, self.left_part)
-
-        if type(self.left_part) == IntVal and type(self.right_part) == IntVal:
-            left_part = self.left_part.serve()
-            right_part = self.right_part.serve()
-
-            if self.operator == "+":
-                return IntVal(left_part + right_part)
-
-            if self.operator == "-":
-                return IntVal(left_part - right_part)
-
-            if self.operator == "*":
-                return IntVal(left_part * right_part)
-
-        if type(self.left_part) == FloatVal and type(self.right_part) == FloatVal:
-            left_part = self.left_part.serve()
-            right_part = self.right_part.serve()
-
-            if self.operator == "+":
-                return FloatVal(left_part + right_part)
-
-            if self.operator == "-":
-                return FloatVal(left_part - right_part)
-
-            if self.operator == "*":
-                return FloatVal(left_part * right_part)
-
-            if self.operator == "/":
-                return FloatVal(left_part / right_part)
+        return operate(self.operator, self.left_part.serve(), self.right_part.serve())
 
+    def optimize(self):
+        self.left_part = self.left_part.optimize()
+        self.right_part = self.right_part.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -481,19 +692,21 @@ class Operator(Node):
 
 
 class Print(Node):
+    fields = ("statement",)
+    __slots__ = fields
+
     def __init__(self, statement):
         super().__init__()
 
         self.statement = statement
-        self.id = str(self)
 
     def serve(self):
         value = self.statement.serve()
-        print(value)
+        output.write(value)
         return None
 
-    def optimize(self, used_symboles=None, optimize_method=None):
-        self.statement = self.statement.optimize(used_symboles, OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.statement = self.statement.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -504,12 +717,14 @@ class Print(Node):
 
 
 class Assign(Node):
+    fields = ("name", "value")
+    __slots__ = fields
+
     def __init__(self, name, value):
         super().__init__()
 
         self.name = name
         self.value = value
-        self.id = str(self)
 
     def serve(self):
         value = self.value.serve()
@@ -519,8 +734,8 @@ class Assign(Node):
 
         return None
 
-    def optimize(self, used_symboles, optimize_method=None):
-        self.value = self.value.optimize(used_symboles, OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.value = self.value.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -532,12 +747,14 @@ class Assign(Node):
 
 
 class TypeDeclare(Node):
+    fields = ("name", "type_name")
+    __slots__ = fields
+
     def __init__(self, name, type_name):
         super().__init__()
 
         self.name = name
         self.type_name = type_name
-        self.id = str(self)
 
     def serve(self):
         name = self.name.serve()
@@ -547,7 +764,7 @@ class TypeDeclare(Node):
 
         return None
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -559,12 +776,14 @@ class TypeDeclare(Node):
 
 
 class AssignWithType(Node):
+    fields = ("name", "value")
+    __slots__ = fields
+
     def __init__(self, name, value):
         super().__init__()
 
         self.name = name
         self.value = value
-        self.id = str(self)
 
     def serve(self):
         name = self.name.serve()
@@ -574,8 +793,8 @@ class AssignWithType(Node):
 
         return None
 
-    def optimize(self, used_symboles, optimize_method=None):
-        self.value = self.value.optimize(used_symboles, OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.value = self.value.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -587,12 +806,14 @@ class AssignWithType(Node):
 
 
 class Cast(Node):
+    fields = ("value", "type_name")
+    __slots__ = fields
+
     def __init__(self, value, type_name):
         super().__init__()
 
         self.value = value
         self.type_name = type_name
-        self.id = str(self)
 
     def serve(self):
         type_name = self.type_name.serve()
@@ -605,8 +826,8 @@ class Cast(Node):
 
         return new_val
 
-    def optimize(self, used_symboles, optimize_method=None):
-        self.value = self.value.optimize(used_symboles, OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.value = self.value.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -618,11 +839,13 @@ class Cast(Node):
 
 
 class Args(Node):
+    fields = ("arguments",)
+    __slots__ = fields
+
     def __init__(self, arguments):
         super().__init__()
 
         self.arguments = arguments
-        self.id = str(self)
 
     def serve(self):
         parsed_arguments = []
@@ -631,14 +854,14 @@ class Args(Node):
             argument_type = argument[1].serve()
 
             if argument_name is None or argument_type is None:
-                print(f"Bad argument declaration.")
+                output.write(f"Bad argument declaration.")
                 return None
 
             parsed_arguments.append((argument_name, argument_type))
 
         return parsed_arguments
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -657,11 +880,13 @@ class Args(Node):
 
 
 class ArgsVal(Node):
+    fields = ("arguments",)
+    __slots__ = fields
+
     def __init__(self, arguments):
         super().__init__()
 
         self.arguments = arguments
-        self.id = str(self)
 
     def serve(self):
         values = []
@@ -671,7 +896,7 @@ class ArgsVal(Node):
 
         return values
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         new_arguments = []
 
         for argument in self.arguments:
@@ -692,27 +917,38 @@ class ArgsVal(Node):
 
 
 class Function(Node):
+    fields = ("name", "args", "block")
+    __slots__ = fields
+
     def __init__(self, name, args, block):
         super().__init__()
 
         self.name = name
         self.args = args
         self.block = block
-        self.id = str(self)
 
     def serve(self):
         name = self.name.serve()
 
         if not scopes.available_name(name):
-            print(f"{name} already exist.")
+            output.write(f"{name} already exist.")
         else:
             args = self.args.serve() if self.args is not None else None
 
-            functions[name] = {"args": args, "block": self.block}
+            define(
+                {
+                    "name": name,
+                    "args": args,
+                    "block": self.block,
+                    "scoped": args is not None or declares(self.block),
+                    "calls": 0,
+                    "compiled": None,
+                }
+            )
             return None
 
-    def optimize(self, used_symboles, optimize_method=None):
-        self.block = self.block.optimize(used_symboles)
+    def optimize(self):
+        self.block = self.block.optimize()
         return self
 
     def draw(self, graph, parent_id):
@@ -726,66 +962,63 @@ class Function(Node):
 
 
 class Call(Node):
+    fields = ("name", "args")
+    __slots__ = fields + ("target", "variant")
+
     def __init__(self, name, args):
         super().__init__()
 
         self.name = name
         self.args = args
-        self.id = str(self)
+        self.target = None
+        self.variant = None
 
     def serve(self):
-        name = self.name.serve()
-        if name not in functions:
-            print(f"Function {name} not defined!")
+        function = self.lookup()
+        if function is None:
             return None
-        else:
-            function = functions[name]
-
-            args_val = self.args.serve() if self.args is not None else None
-
-            if function["args"] is None:
-                if args_val is not None:
-                    print(f"Arguments count missmatch in function {name}.")
-                    return None
-                else:
-                    scopes.add_scope()
-                    res = function["block"].serve()
-                    scopes.remove_scope()
-
-                    return res
-            else:
-                if args_val is not None and function["args"] is None:
-                    print(f"Too many arguments in function {name}.")
-                    return None
-                if len(args_val) != len(function["args"]):
-                    print(f"Arguments count missmatch in function {name}.")
-                    return None
-                else:
-                    scopes.add_scope()
-                    valid_args = True
-                    res = None
-
-                    for i in range(len(args_val)):
-                        arg_name = function["args"][i][0]
-                        arg_type = function["args"][i][1]
-                        arg_value = args_val[i]
-                        given_arg_type = determine_type(arg_value)
-
-                        arg_value = convert_to(arg_value, arg_type)
-
-                        scopes.define(arg_name, arg_value)
-
-                    if valid_args:
-                        res = function["block"].serve()
-
-                    scopes.remove_scope()
-
-                    return res
-
-    def optimize(self, used_symboles, optimize_method=None):
+
+        args_val = self.args.serve() if self.args is not None else None
+        return self.apply(function, args_val)
+
+    # Counts the call and returns the function, or None when it is not defined.
+    def lookup(self):
+        global calls_count
+        function = self.target
+        if function is not None and not function["stale"]:
+            calls_count += 1
+            return function
+
         name = self.name.serve()
-        used_symboles.add(name)
+        if not enter(name):
+            return None
+
+        function = functions[name]
+        self.target = function if cacheable(function, self.args) else None
+        return function
+
+    # Evaluating the arguments may have defined the function again, in which
+    # case the call goes through the checks in bind.
+    def apply(self, function, args_val):
+        if function is not self.target or function["stale"]:
+            return invoke(function["name"], args_val)
+
+        bind_cached(function, args_val)
+        res = run(self.body(function))
+        if function["scoped"]:
+            scopes.remove_scope()
 
+        return res
+
+    # The variant built for this call's constant arguments, while the function
+    # it was built from is the one being called.
+    def body(self, function):
+        variant = self.variant
+        if variant is not None and variant["origin"] is function["block"]:
+            return variant
+        return function
+
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -798,19 +1031,20 @@ class Call(Node):
 
 
 class MathFunction(Node):
+    fields = ("value",)
+    __slots__ = fields + ("function",)
+
     def __init__(self, function, value):
         self.function = function
         self.value = value
 
-        self.id = str(self)
-
     def serve(self):
         value = self.value.serve()
 
         return round(evaluate(self.function, value), 5)
 
-    def optimize(self, used_symboles=None, optimize_method=None):
-        self.value.optimize(used_symboles, optimize_method=OptimizeMethod.RIGHT)
+    def optimize(self):
+        self.value.optimize()
 
         return self
 
@@ -825,16 +1059,17 @@ class MathFunction(Node):
 
 
 class FloatVal(Node):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
 
         self.value = value
-        self.id = str(self)
 
     def serve(self):
         return float(self.value)
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -845,16 +1080,17 @@ class FloatVal(Node):
 
 
 class IntVal(Node):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
 
         self.value = value
-        self.id = str(self)
 
     def serve(self):
         return int(self.value)
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -865,16 +1101,17 @@ class IntVal(Node):
 
 
 class StringVal(Node):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
 
         self.value = value[1:-1]
-        self.id = str(self)
 
     def serve(self):
         return self.value
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -885,16 +1122,17 @@ class StringVal(Node):
 
 
 class NameVal(Node):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         super().__init__()
 
         self.name = name
-        self.id = str(self)
 
     def serve(self):
         return self.name
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -905,18 +1143,17 @@ class NameVal(Node):
 
 
 class KeyVal(Node):
+    __slots__ = ("key",)
+
     def __init__(self, key):
         super().__init__()
 
         self.key = key
-        self.id = str(self)
 
     def serve(self):
         return scopes.get(self.key)
 
-    def optimize(self, used_symboles, optimize_method):
-        if optimize_method == OptimizeMethod.RIGHT:
-            used_symboles.add(self.key)
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -927,21 +1164,22 @@ class KeyVal(Node):
 
 
 class TypeVal(Node):
+    __slots__ = ("type_name",)
+
     def __init__(self, type_name):
         super().__init__()
 
         self.type_name = type_name
-        self.id = str(self)
 
     def serve(self):
         if valid_type(self.type_name):
             return self.type_name
         else:
-            print(f"{self.type_name} is not valid type!")
+            output.write(f"{self.type_name} is not valid type!")
 
         return None
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -953,16 +1191,17 @@ class TypeVal(Node):
 
 
 class BoolVal(Node):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
 
         self.value = True if value == "true" else False
-        self.id = str(self)
 
     def serve(self):
         return self.value
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -974,13 +1213,12 @@ class BoolVal(Node):
 
 
 class Pi(Node):
-    def __init__(self):
-        self.id = str(self)
+    __slots__ = ()
 
     def serve(self):
         return pi
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
@@ -989,16 +1227,68 @@ class Pi(Node):
 
 
 class Comment(Node):
+    __slots__ = ("content",)
+
     def __init__(self, content):
         self.content = content
 
-        self.id = str(self)
-
     def serve(self):
         pass
 
-    def optimize(self, used_symboles=None, optimize_method=None):
+    def optimize(self):
         return self
 
     def draw(self, graph, parent_id):
         pass
+
+
+class CommonStore(Node):
+    fields = ("expression",)
+    __slots__ = fields + ("slot",)
+
+    def __init__(self, slot, expression):
+        super().__init__()
+
+        self.slot = slot
+        self.expression = expression
+
+    def serve(self):
+        value = self.expression.serve()
+        temporaries[self.slot] = value
+        return value
+
+    def optimize(self):
+        return self
+
+    def draw(self, graph, parent_id):
+        graph.node(self.id, f"Store t{self.slot}")
+        graph.edge(parent_id, self.id)
+
+        self.expression.draw(graph, self.id)
+
+
+class CommonLoad(Node):
+    fields = ("expression",)
+    __slots__ = fields + ("slot",)
+
+    def __init__(self, slot, expression):
+        super().__init__()
+
+        self.slot = slot
+        self.expression = expression
+
+    def serve(self):
+        value = temporaries.get(self.slot)
+        if value is None:
+            return self.expression.serve()
+        return value
+
+    def optimize(self):
+        return self
+
+    def draw(self, graph, parent_id):
+        graph.node(self.id, f"Load t{self.slot}")
+        graph.edge(parent_id, self.id)
+
+
+OPENERS = {InstructionBlock, If, While, For, UnrolledFor, Function}
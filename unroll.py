@@ -0,0 +1,197 @@
+import copy
+from functools import partial
+
+import hashcons
+import tree
+
+from liveness import Liveness
+
+
+LIMIT = 8
+
+FACTOR = 4
+
+BUDGET = 512
+
+FLIPPED = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "==": "==", "!=": "!="}
+
+
+def configure(limit, factor):
+    global LIMIT, FACTOR
+    LIMIT = limit
+    FACTOR = factor
+
+
+def constant(node):
+    if type(node) is tree.IntVal:
+        return node.serve()
+    return None
+
+
+def variable(node, name):
+    return type(node) is tree.KeyVal and node.key == name
+
+
+def compare(operator, left, right):
+    if operator == "<":
+        return left < right
+    elif operator == ">":
+        return left > right
+    elif operator == "<=":
+        return left <= right
+    elif operator == ">=":
+        return left >= right
+    elif operator == "==":
+        return left == right
+    return left != right
+
+
+# The condition is checked before the first iteration and after every step,
+# so the count is the first j for which start + j * delta fails it, or None
+# when the loop never stops.
+def trip_count(start, operator, bound, delta):
+    if not compare(operator, start, bound):
+        return 0
+    elif delta == 0:
+        return None
+    elif operator == "==":
+        return 1
+    elif operator == "!=":
+        if (bound - start) % delta or (bound - start) // delta < 0:
+            return None
+        return (bound - start) // delta
+    elif operator in ("<", "<="):
+        if delta < 0:
+            return None
+        return -((start - bound) // delta) if operator == "<" else (bound - start) // delta + 1
+
+    if delta > 0:
+        return None
+    return -((bound - start) // -delta) if operator == ">" else (start - bound) // -delta + 1
+
+
+def induction(loop):
+    init, condition, step = loop.init, loop.condition, loop.step
+    if type(init) is not tree.AssignWithType or constant(init.value) is None:
+        return None
+    name = init.name.name
+    start = constant(init.value)
+
+    if type(condition) is not tree.Relation:
+        return None
+    if variable(condition.left, name) and constant(condition.right) is not None:
+        operator, bound = condition.operator, constant(condition.right)
+    elif variable(condition.right, name) and constant(condition.left) is not None:
+        operator, bound = FLIPPED.get(condition.operator), constant(condition.left)
+    else:
+        return None
+    if operator not in FLIPPED:
+        return None
+
+    if type(step) is not tree.Assign or step.name.name != name or type(step.value) is not tree.Operator:
+        return None
+    left, right = step.value.left_part, step.value.right_part
+    if step.value.operator == "+" and variable(left, name) and constant(right) is not None:
+        delta = constant(right)
+    elif step.value.operator == "+" and variable(right, name) and constant(left) is not None:
+        delta = constant(left)
+    elif step.value.operator == "-" and variable(left, name) and constant(right) is not None:
+        delta = -constant(right)
+    else:
+        return None
+
+    return name, start, delta, trip_count(start, operator, bound, delta)
+
+
+class Unroller:
+    def __init__(self, program, environment=None):
+        super().__init__()
+
+        self.liveness = Liveness(program, environment=environment)
+        self.interner = hashcons.Interner()
+        self.unrolled = {}
+
+    def count(self, name):
+        self.unrolled[name] = self.unrolled.get(name, 0) + 1
+
+    # The body may not rebind the induction variable, directly or through a
+    # call, since the trip count and the substituted constants assume the step
+    # is the only write to it.
+    def safe(self, body, name):
+        for node in tree.walk(body):
+            kind = type(node)
+            if kind is tree.Function:
+                return False
+            elif kind is tree.Call and name in self.liveness.function_mentions.get(node.name.name, ()):
+                return False
+            elif kind in (tree.Assign, tree.AssignWithType, tree.TypeDeclare) and node.name.name == name:
+                return False
+
+        return True
+
+    def substitute(self, name, value, node):
+        return tree.trampoline(self.replace(name, value, node))
+
+    def replace(self, name, value, node):
+        kind = type(node)
+        if kind is tree.KeyVal and node.key == name:
+            return self.interner.intern(tree.IntVal(value))
+        elif kind in hashcons.SHARED:
+            return (yield from self.interner.rebuild(node, partial(self.replace, name, value)))
+
+        node = copy.copy(node)
+        yield from node.map_nested(partial(self.replace, name, value))
+        return node
+
+    # Parallel loops are left whole for their workers.
+    def unroll(self, loop):
+        if loop.parallel:
+            return loop
+
+        loop_induction = induction(loop)
+        if loop_induction is None:
+            return loop
+        name, start, delta, trips = loop_induction
+        if trips is None or not self.safe(loop.block, name):
+            return loop
+
+        size = sum(1 for _ in tree.walk(loop.block)) + sum(1 for _ in tree.walk(loop.step))
+        if trips <= LIMIT and trips * size <= BUDGET:
+            statements = [loop.init]
+            value = start
+            for _ in range(trips):
+                statements.append(self.substitute(name, value, loop.step))
+                value += delta
+                statements.extend(self.substitute(name, value, loop.block).statements)
+
+            self.count("unrolled loops")
+            return tree.UnrolledFor(tree.Block(statements))
+
+        factor = next((factor for factor in range(FACTOR, 1, -1) if trips % factor == 0), 1)
+        if trips <= LIMIT or factor == 1 or factor * size > BUDGET:
+            return loop
+
+        statements = list(self.substitute(None, None, loop.block).statements)
+        for _ in range(factor - 1):
+            statements.append(self.substitute(None, None, loop.step))
+            statements.extend(self.substitute(None, None, loop.block).statements)
+
+        loop.block = tree.Block(statements)
+        self.count("partially unrolled loops")
+        return loop
+
+    # A generator for tree.trampoline, like the passes it runs beside.
+    def visit(self, node):
+        if type(node) in hashcons.SHARED:
+            return node
+
+        yield from node.map_nested(self.visit)
+        if type(node) is tree.For:
+            return self.unroll(node)
+        return node
+
+
+def unroll(program, environment=None):
+    unroller = Unroller(program, environment)
+    tree.trampoline(unroller.visit(program))
+    return unroller.unrolled
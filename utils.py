@@ -1,14 +1,26 @@
 import math
-from collections import namedtuple
+import output
 
+from rope import Rope
+
+
+# Assignments update the value in place, so a variable is one record for as
+# long as its scope lives.
+class Variable:
+    __slots__ = ("type", "value")
+
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
 
-Variable = namedtuple("Variable", ["type", "value"])
 
 TYPES = ["int", "float", "string", "bool"]
+CONVERTERS = {"int": int, "float": float, "string": str, "bool": bool}
 KEYWORDS = [
     "while",
     "if",
     "for",
+    "parallel",
     "print",
     "static_cast",
     "sin",
@@ -39,7 +51,7 @@ def determine_type(value):
         return TYPES[0]
     elif type(value) is float:
         return TYPES[1]
-    elif type(value) is str:
+    elif type(value) is str or type(value) is Rope:
         return TYPES[2]
     elif type(value) is bool:
         return TYPES[3]
@@ -49,17 +61,20 @@ def determine_type(value):
 
 def not_keyword_or_type(name):
     if name.lower() in KEYWORDS:
-        print(f"{name} is a keyword.")
+        output.write(f"{name} is a keyword.")
         return False
 
     if name.lower() in TYPES:
-        print(f"{name} is a type.")
+        output.write(f"{name} is a type.")
         return False
 
     return True
 
 
 def convert_to(value, type_name):
+    if type(value) is Rope:
+        value = value.flatten()
+
     if type_name == TYPES[0]:
         return int(value)
     elif type_name == TYPES[1]:
@@ -82,7 +97,7 @@ def type_to_string(var):
         return "IntVal"
     elif type_of_var == float.__name__:
         return "FloatVal"
-    elif type_of_var == str.__name__:
+    elif type_of_var == str.__name__ or type_of_var == Rope.__name__:
         return "StringVal"
     elif type_of_var == bool.__name__:
         return "BoolVal"